@@ -168,7 +168,16 @@ const updateApprovalNotificationBadge = async () => {
 
 const wireLogout = () => {
   document.querySelectorAll("[data-logout]").forEach((button) => {
-    button.addEventListener("click", () => {
+    button.addEventListener("click", async () => {
+      try {
+        // Revoke the token server-side; the session is cleared regardless
+        await fetch(`${API_BASE}/api/auth/logout`, {
+          method: "POST",
+          headers: window.getAuthHeaders(),
+        });
+      } catch (error) {
+        /* ignore */
+      }
       sessionStorage.removeItem("currentUser");
       sessionStorage.removeItem("authToken");
       window.location.replace("index.html");
@@ -2,15 +2,24 @@
 Bank AD login via SOAP. Validates username/password against bank SSO endpoint.
 Configure via env: AD_SOAP_ENDPOINT, AD_SOAP_ACTION, AD_VERIFY_SSL, AD_TIMEOUT
 AD_SKIP=true: bypass AD (for local dev when endpoint unreachable) - validates against DB only.
+
+Calls go through one keep-alive session per endpoint (AD_POOL_SIZE connections), remember
+which SOAP version the endpoint answers, and sit behind a circuit breaker: after
+AD_BREAKER_FAILURES consecutive transport failures logins fail fast with ADUnavailableError
+for AD_BREAKER_RESET seconds, then a single probe call decides whether to close it again.
 """
 
 import html as html_escape
 import logging
 import os
 import re
+import threading
+import time
 import xml.etree.ElementTree as ET
+from collections import deque
 
 import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
@@ -21,22 +30,216 @@ SOAP_ENDPOINT = os.environ.get(
 SOAP_ACTION = os.environ.get("AD_SOAP_ACTION", "http://tempuri.org/userAttributes")
 VERIFY_SSL = os.environ.get("AD_VERIFY_SSL", "false").lower() in ("true", "1", "yes")
 TIMEOUT_SEC = int(os.environ.get("AD_TIMEOUT", "30"))
+CONNECT_TIMEOUT_SEC = float(os.environ.get("AD_CONNECT_TIMEOUT", "5"))
+POOL_SIZE = int(os.environ.get("AD_POOL_SIZE", "10"))
+BREAKER_FAILURES = int(os.environ.get("AD_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SEC = float(os.environ.get("AD_BREAKER_RESET", "30"))
 AD_SKIP = os.environ.get("AD_SKIP", "false").lower() in ("true", "1", "yes")
 AD_DEBUG = os.environ.get("AD_DEBUG", "false").lower() in ("true", "1", "yes")
 
+# Statuses that mean "wrong SOAP version", so the other envelope is tried
+VERSION_MISMATCH_STATUSES = (415, 405, 500)
+# Statuses that mean the endpoint itself is down (count towards opening the breaker)
+UNAVAILABLE_STATUSES = (0, 502, 503, 504)
+LATENCY_SAMPLES = 200
 
-def _send_soap(envelope: str, headers: dict):
-    try:
-        resp = requests.post(
-            SOAP_ENDPOINT,
-            data=envelope.encode("utf-8"),
-            headers=headers,
-            timeout=TIMEOUT_SEC,
-            verify=VERIFY_SSL,
+_ENVELOPES = {
+    "1.1": (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<soap:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n'
+        ' xmlns:xsd="http://www.w3.org/2001/XMLSchema"\n'
+        ' xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">\n'
+        "  <soap:Body>\n"
+        '    <userAttributes xmlns="http://tempuri.org/">\n'
+        "      <username>{username}</username>\n"
+        "      <password>{password}</password>\n"
+        "    </userAttributes>\n"
+        "  </soap:Body>\n"
+        "</soap:Envelope>"
+    ),
+    "1.2": (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<soap12:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n'
+        ' xmlns:xsd="http://www.w3.org/2001/XMLSchema"\n'
+        ' xmlns:soap12="http://www.w3.org/2003/05/soap-envelope">\n'
+        "  <soap12:Body>\n"
+        '    <userAttributes xmlns="http://tempuri.org/">\n'
+        "      <username>{username}</username>\n"
+        "      <password>{password}</password>\n"
+        "    </userAttributes>\n"
+        "  </soap12:Body>\n"
+        "</soap12:Envelope>"
+    ),
+}
+
+
+class ADUnavailableError(Exception):
+    """The AD endpoint can't be reached (or the circuit breaker is open)."""
+
+
+class CircuitBreaker:
+    """CLOSED -> OPEN after `failures` consecutive failures; one HALF_OPEN probe after `reset_sec`."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_sec: float = BREAKER_RESET_SEC):
+        self._threshold = failures
+        self._reset_sec = reset_sec
+        self._lock = threading.Lock()
+        self.state = "CLOSED"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "CLOSED":
+                return True
+            now = time.monotonic()
+            if self.state == "OPEN" and now - self._opened_at >= self._reset_sec:
+                self.state = "HALF_OPEN"
+                self._probe_started = None
+            # A probe that never reported back doesn't block the next one forever
+            if self.state == "HALF_OPEN" and (
+                self._probe_started is None or now - self._probe_started >= self._reset_sec
+            ):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "CLOSED"
+            self.failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "HALF_OPEN" or self.failures >= self._threshold:
+                if self.state != "OPEN":
+                    logger.warning("AD circuit breaker open after %s failures", self.failures)
+                self.state = "OPEN"
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+
+class ADClient:
+    def __init__(self, endpoint: str = SOAP_ENDPOINT, soap_action: str = SOAP_ACTION):
+        self.endpoint = endpoint
+        self.soap_action = soap_action
+        self.breaker = CircuitBreaker()
+        # Version the endpoint last answered; tried first
+        self.preferred_version = "1.1"
+        self._session = requests.Session()
+        self._session.verify = VERIFY_SSL
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = {"calls": 0, "authenticated": 0, "rejected": 0, "unavailable": 0, "short_circuited": 0}
+
+    def _headers(self, version: str) -> dict:
+        if version == "1.2":
+            return {"Content-Type": f'application/soap+xml; charset=utf-8; action="{self.soap_action}"'}
+        return {"Content-Type": "text/xml; charset=utf-8", "SOAPAction": self.soap_action}
+
+    def _send_soap(self, version: str, username: str, password: str):
+        envelope = _ENVELOPES[version].format(
+            username=html_escape.escape(username),
+            password=html_escape.escape(password),
         )
-        return (resp.ok, resp.status_code, resp.text or "")
-    except requests.RequestException as e:
-        return (False, 0, str(e))
+        started = time.perf_counter()
+        try:
+            resp = self._session.post(
+                self.endpoint,
+                data=envelope.encode("utf-8"),
+                headers=self._headers(version),
+                timeout=(CONNECT_TIMEOUT_SEC, TIMEOUT_SEC),
+            )
+            return (resp.status_code, resp.text or "")
+        except requests.RequestException as e:
+            return (0, str(e))
+        finally:
+            with self._lock:
+                self._latencies_ms.append((time.perf_counter() - started) * 1000)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def validate(self, username: str, password: str) -> bool:
+        """True if AD accepts the credentials; raises ADUnavailableError if it can't be asked."""
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise ADUnavailableError("AD login service unavailable (circuit open)")
+        self._count("calls")
+
+        version = self.preferred_version
+        status, xml_text = self._send_soap(version, username, password)
+        result = _interpret_login_success(xml_text, status)
+
+        if not result and status in VERSION_MISMATCH_STATUSES:
+            other = "1.2" if version == "1.1" else "1.1"
+            status2, xml_text2 = self._send_soap(other, username, password)
+            if 200 <= status2 < 300 and self.preferred_version != other:
+                logger.info("AD endpoint answers SOAP %s; using it first from now on", other)
+                self.preferred_version = other
+            status, xml_text = status2, xml_text2
+            result = _interpret_login_success(xml_text, status)
+
+        if AD_DEBUG and xml_text:
+            logger.info("AD_DEBUG: http_status=%s, result=%s, response=%s", status, result, xml_text[:1000])
+
+        if status in UNAVAILABLE_STATUSES:
+            self.breaker.record_failure()
+            self._count("unavailable")
+            logger.warning("AD endpoint unavailable: http_status=%s, detail=%s", status, (xml_text or "")[:400])
+            raise ADUnavailableError("AD login service unavailable")
+        self.breaker.record_success()
+
+        if not result:
+            self._count("rejected")
+            logger.warning("AD login failed: http_status=%s, response_snippet=%s", status, (xml_text or "")[:400])
+        else:
+            self._count("authenticated")
+        return result
+
+    def metrics(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies_ms)
+            counters = dict(self._counters)
+        latency = {"samples": len(latencies)}
+        if latencies:
+            latency.update(
+                avg_ms=round(sum(latencies) / len(latencies), 1),
+                p95_ms=round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+                max_ms=round(latencies[-1], 1),
+            )
+        return {
+            "endpoint": self.endpoint,
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "soap_version": self.preferred_version,
+            "latency": latency,
+            **counters,
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _default_client() -> ADClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ADClient()
+    return _client
+
+
+def ad_metrics() -> dict:
+    return _default_client().metrics()
 
 
 def _interpret_login_success(xml_text: str, http_status: int) -> bool:
@@ -119,7 +322,8 @@ def _interpret_login_success(xml_text: str, http_status: int) -> bool:
 def validate_ad_credentials(username: str, password: str) -> bool:
     """
     Validate username/password against Bank AD SOAP endpoint.
-    Returns True if AD authentication succeeds, False otherwise.
+    Returns True if AD authentication succeeds, False otherwise; raises ADUnavailableError
+    when the endpoint can't be reached.
     Set AD_SKIP=true to bypass AD (local dev only - accepts any non-empty password).
     """
     username = (username or "").strip()
@@ -132,60 +336,4 @@ def validate_ad_credentials(username: str, password: str) -> bool:
         logger.warning("AD_SKIP enabled - bypassing Bank AD validation (local dev only)")
         return True
 
-    soap12_env = (
-        '<?xml version="1.0" encoding="utf-8"?>\n'
-        '<soap12:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n'
-        ' xmlns:xsd="http://www.w3.org/2001/XMLSchema"\n'
-        ' xmlns:soap12="http://www.w3.org/2003/05/soap-envelope">\n'
-        "  <soap12:Body>\n"
-        '    <userAttributes xmlns="http://tempuri.org/">\n'
-        "      <username>{username}</username>\n"
-        "      <password>{password}</password>\n"
-        "    </userAttributes>\n"
-        "  </soap12:Body>\n"
-        "</soap12:Envelope>"
-    ).format(
-        username=html_escape.escape(username),
-        password=html_escape.escape(password),
-    )
-
-    soap11_env = (
-        '<?xml version="1.0" encoding="utf-8"?>\n'
-        '<soap:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n'
-        ' xmlns:xsd="http://www.w3.org/2001/XMLSchema"\n'
-        ' xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">\n'
-        "  <soap:Body>\n"
-        '    <userAttributes xmlns="http://tempuri.org/">\n'
-        "      <username>{username}</username>\n"
-        "      <password>{password}</password>\n"
-        "    </userAttributes>\n"
-        "  </soap:Body>\n"
-        "</soap:Envelope>"
-    ).format(
-        username=html_escape.escape(username),
-        password=html_escape.escape(password),
-    )
-
-    headers_11 = {
-        "Content-Type": "text/xml; charset=utf-8",
-        "SOAPAction": SOAP_ACTION,
-    }
-    headers_12 = {
-        "Content-Type": f'application/soap+xml; charset=utf-8; action="{SOAP_ACTION}"'
-    }
-
-    ok, status, xml_text = _send_soap(soap11_env, headers_11)
-    result = _interpret_login_success(xml_text, status)
-
-    if not result and status in (415, 405, 500) and status != 0:
-        ok2, status2, xml_text2 = _send_soap(soap12_env, headers_12)
-        status, xml_text = status2, xml_text2
-        result = _interpret_login_success(xml_text, status)
-
-    if AD_DEBUG and xml_text:
-        logger.info("AD_DEBUG: http_status=%s, result=%s, response=%s", status, result, xml_text[:1000])
-
-    if not result and status and xml_text:
-        logger.warning("AD login failed: http_status=%s, response_snippet=%s", status, (xml_text or "")[:400])
-
-    return result
+    return _default_client().validate(username, password)
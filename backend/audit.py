@@ -1,7 +1,47 @@
+"""
+Audit trail.
+
+log_audit(db, ...) adds the entry to the caller's session, so it commits (or rolls back)
+together with the business write it describes. Use it for every state-changing action.
+
+enqueue_audit(...) is for read-only endpoints (lists, previews, downloads): the entry is
+queued in-process and written by a background thread in batched inserts, flushed when
+AUDIT_FLUSH_BATCH entries are waiting or every AUDIT_FLUSH_INTERVAL seconds, and drained
+on shutdown. A full queue falls back to a direct write rather than dropping entries;
+AUDIT_ASYNC=false writes every entry directly.
+
+audit_log is partitioned by month on changed_at; filter_audit_query() builds the searches
+(routes_audit, the audit-logs report) so a date range prunes to the matching partitions.
+"""
+
+import atexit
 import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
 
+from sqlalchemy import insert
+
+import data_version
+from db import SessionLocal
 from models import AuditLog
 
+logger = logging.getLogger(__name__)
+
+AUDIT_ASYNC = os.getenv("AUDIT_ASYNC", "true").lower() != "false"
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+AUDIT_FLUSH_BATCH = int(os.getenv("AUDIT_FLUSH_BATCH", "200"))
+AUDIT_FLUSH_INTERVAL_SEC = float(os.getenv("AUDIT_FLUSH_INTERVAL", "2"))
+FLUSH_RETRIES = 3
+
+# Actions that only record a read; they don't move the data version
+READ_ACTIONS = ("VIEW", "PREVIEW", "DOWNLOAD", "JOB_SUBMIT", "ME")
+# Search order, newest first
+AUDIT_LOG_KEY = [AuditLog.changed_at, AuditLog.audit_id]
+
 
 def _to_number(value):
     if value is None:
@@ -30,4 +70,146 @@ def log_audit(db, entity_type, entity_id, action, old_data, new_data, changed_by
         changed_by=changed_by,
     )
     db.add(entry)
+    if entity_type in data_version.DATA_ENTITY_TYPES and action not in READ_ACTIONS:
+        data_version.mark_changed(db)
     return entry
+
+
+def filter_audit_query(
+    query,
+    entity_type=None,
+    entity_id=None,
+    action=None,
+    changed_by=None,
+    changed_from=None,
+    changed_before=None,
+):
+    """Search filters on an AuditLog query; changed_from is inclusive, changed_before exclusive."""
+    if entity_type:
+        query = query.filter(AuditLog.entity_type == entity_type)
+    if entity_id is not None:
+        query = query.filter(AuditLog.entity_id == entity_id)
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if changed_by:
+        query = query.filter(AuditLog.changed_by == changed_by)
+    if changed_from is not None:
+        query = query.filter(AuditLog.changed_at >= changed_from)
+    if changed_before is not None:
+        query = query.filter(AuditLog.changed_at < changed_before)
+    return query
+
+
+class _AuditWriter:
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=AUDIT_QUEUE_MAX)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, row: dict):
+        if not AUDIT_ASYNC or self._stop.is_set():
+            _write([row])
+            return
+        self._start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logger.warning("Audit queue full; writing entry synchronously")
+            _write([row])
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+        self._drain()
+
+    def _collect(self) -> list:
+        """Entries until the batch is full or the flush interval passes."""
+        batch = []
+        deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL_SEC
+        while len(batch) < AUDIT_FLUSH_BATCH and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        while True:
+            batch = []
+            while len(batch) < AUDIT_FLUSH_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch: list):
+        for attempt in range(1, FLUSH_RETRIES + 1):
+            try:
+                _write(batch)
+                return
+            except Exception:
+                logger.exception("Audit flush of %s entries failed (attempt %s)", len(batch), attempt)
+                if attempt < FLUSH_RETRIES:
+                    time.sleep(attempt)
+        # Last resort: keep the entries in the application log
+        for row in batch:
+            logger.error("Unwritten audit entry: %s", json.dumps(row, default=str))
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop accepting queued entries and write out everything pending."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        else:
+            self._drain()
+
+
+def _write(rows: list):
+    session = SessionLocal()
+    try:
+        session.execute(insert(AuditLog), rows)
+        session.commit()
+    finally:
+        session.close()
+
+
+_writer = _AuditWriter()
+# Scripts and tests; the API also drains from its shutdown hook
+atexit.register(lambda: _writer.shutdown())
+
+
+def enqueue_audit(entity_type, entity_id, action, old_data, new_data, changed_by):
+    """Record a read-only action off the request path (see module docstring)."""
+    _writer.put(
+        {
+            "entity_type": entity_type,
+            "entity_id": _to_number(entity_id),
+            "action": action,
+            "old_data": _to_text(old_data),
+            "new_data": _to_text(new_data),
+            "changed_by": changed_by,
+            # Event time, not flush time
+            "changed_at": datetime.now(),
+        }
+    )
+
+
+def shutdown_audit_writer(timeout: float = 10.0):
+    _writer.shutdown(timeout)
@@ -0,0 +1,134 @@
+"""
+Audit log retention. audit_log is interval-partitioned by month on changed_at (see
+db/schema.sql), so months past retention are removed by dropping their partitions rather
+than deleting rows. Each month is first written to
+AUDIT_ARCHIVE_DIR/audit_log_<YYYYMM>.jsonl.gz, and a partition is only dropped once its
+archive file is complete.
+
+Databases where db/migrations/audit_log_partitioning.sql has not been run fall back to one
+DELETE per month, archived the same way. Run via `manage.py audit-retention`.
+"""
+
+import gzip
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+
+from audit import log_audit
+from db import SessionLocal
+from db_partitions import add_months, month_key_of, retention_cutoff, table_partitions
+from models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "12"))
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "audit_archive"
+)
+ARCHIVE_FETCH_ROWS = 5000
+COLUMNS = ("audit_id", "entity_type", "entity_id", "action", "old_data", "new_data", "changed_by", "changed_at")
+
+
+def _archive(db, month_key: str, sql: str, params: dict, archive_dir: str) -> tuple[int, str]:
+    """Write the rows selected by sql to the month's archive file; returns (rows, path)."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"audit_log_{month_key}.jsonl.gz")
+    fd, work_path = tempfile.mkstemp(prefix=f".audit_log_{month_key}-", dir=archive_dir)
+    count = 0
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as handle:
+            result = db.execute(text(sql).execution_options(yield_per=ARCHIVE_FETCH_ROWS), params)
+            for row in result:
+                handle.write((json.dumps(dict(zip(COLUMNS, row)), default=str) + "\n").encode("utf-8"))
+                count += 1
+        os.replace(work_path, path)
+    except BaseException:
+        os.remove(work_path)
+        raise
+    return count, path
+
+
+def apply_retention(
+    keep_months: int = AUDIT_RETENTION_MONTHS,
+    archive: bool = True,
+    dry_run: bool = False,
+    archive_dir: str | None = None,
+    run_by: str = "SYSTEM",
+) -> list[dict]:
+    """
+    Archive (unless archive=False) and remove audit entries older than the retention
+    window, one month at a time. dry_run only lists the months that would go.
+    """
+    cutoff = retention_cutoff(keep_months)
+    archive_dir = archive_dir or AUDIT_ARCHIVE_DIR
+    columns = ", ".join(COLUMNS)
+    results = []
+    db = SessionLocal()
+    try:
+        partitions = table_partitions(db, "audit_log")
+        if partitions is not None:
+            for name, high_value, is_interval in partitions:
+                if high_value > cutoff:
+                    break
+                month_key = month_key_of(high_value - timedelta(days=1))
+                if not is_interval:
+                    # The range partition anchoring the interval can't be dropped
+                    logger.info("Keeping range partition %s of audit_log", name)
+                    continue
+                entry = {"month_key": month_key, "partition": name, "method": "DROP_PARTITION"}
+                if not dry_run:
+                    if archive:
+                        entry["rows"], entry["archive"] = _archive(
+                            db,
+                            month_key,
+                            f'SELECT {columns} FROM audit_log PARTITION ("{name}") ORDER BY audit_id',
+                            {},
+                            archive_dir,
+                        )
+                    db.execute(text(f'ALTER TABLE audit_log DROP PARTITION "{name}" UPDATE GLOBAL INDEXES'))
+                    logger.info("Dropped audit_log partition %s (%s)", name, month_key)
+                results.append(entry)
+        else:
+            oldest = db.query(func.min(AuditLog.changed_at)).filter(AuditLog.changed_at < cutoff).scalar()
+            month_start = oldest.date().replace(day=1) if isinstance(oldest, datetime) else None
+            while month_start is not None and month_start < cutoff:
+                month_end = add_months(month_start, 1)
+                month_key = month_key_of(month_start)
+                entry = {"month_key": month_key, "method": "DELETE"}
+                if not dry_run:
+                    if archive:
+                        entry["rows"], entry["archive"] = _archive(
+                            db,
+                            month_key,
+                            f"SELECT {columns} FROM audit_log "
+                            "WHERE changed_at >= :month_start AND changed_at < :month_end ORDER BY audit_id",
+                            {"month_start": month_start, "month_end": month_end},
+                            archive_dir,
+                        )
+                    entry["rows"] = (
+                        db.query(AuditLog)
+                        .filter(AuditLog.changed_at >= month_start, AuditLog.changed_at < month_end)
+                        .delete(synchronize_session=False)
+                    )
+                    db.commit()
+                    logger.info("Deleted %s audit_log rows for %s", entry["rows"], month_key)
+                results.append(entry)
+                month_start = month_end
+        if results and not dry_run:
+            log_audit(
+                db,
+                "AUDIT_LOG",
+                None,
+                "RETENTION",
+                None,
+                {"cutoff": cutoff, "months": [entry["month_key"] for entry in results], "archived": archive},
+                run_by,
+            )
+            db.commit()
+    finally:
+        db.close()
+    return results
@@ -1,5 +1,7 @@
 import logging
 import os
+import threading
+import time
 import uuid
 from dataclasses import dataclass
 
@@ -8,6 +10,7 @@ from sqlalchemy.orm import Session
 
 from db import SessionLocal
 from models import UserAccount
+from token_store import TokenSweeper, create_store
 
 
 @dataclass
@@ -17,7 +20,17 @@ class AuthUser:
     role: str
 
 
-_TOKEN_STORE: dict[str, AuthUser] = {}
+# Bearer token -> user; memory or shared DB backend (see token_store)
+_token_store = create_store()
+_token_sweeper = TokenSweeper(_token_store)
+
+# Active users' current role, so authorization needs no query per request. Entries live
+# ACTIVE_USER_TTL seconds; routes_users invalidates on deactivation and role changes
+# (other worker processes pick those up when the entry expires).
+ACTIVE_USER_TTL_SEC = float(os.getenv("ACTIVE_USER_TTL", "30"))
+_active_roles: dict[str, tuple[str, float]] = {}
+_active_lock = threading.Lock()
+_active_generation = 0
 
 # Dummy users for local dev when AD unavailable. Only used when AD_SKIP=true.
 # Format: (employee_id, password, full_name, role_code)
@@ -57,10 +70,16 @@ def authenticate(db: Session, employee_id: str, password: str) -> AuthUser | Non
     if not user:
         return None
 
-    try:
-        from ad_login import validate_ad_credentials
+    from ad_login import ADUnavailableError, validate_ad_credentials
 
+    try:
         ad_ok = validate_ad_credentials(employee_id, password)
+    except ADUnavailableError as e:
+        logging.getLogger(__name__).warning("AD unavailable: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Login service is unavailable. Try again shortly.",
+        )
     except Exception as e:
         logging.getLogger(__name__).warning("AD validation error: %s", e)
         ad_ok = False
@@ -73,34 +92,76 @@ def authenticate(db: Session, employee_id: str, password: str) -> AuthUser | Non
 
 def issue_token(user: AuthUser) -> str:
     token = str(uuid.uuid4())
-    _TOKEN_STORE[token] = user
+    _token_store.put(token, {"employee_id": user.employee_id, "name": user.name, "role": user.role})
+    _token_sweeper.start()
     return token
 
 
-def get_current_user(request: Request) -> AuthUser:
+def revoke_token(token: str):
+    _token_store.delete(token)
+
+
+def token_stats() -> dict:
+    return _token_store.stats()
+
+
+def bearer_token(request: Request) -> str:
     header = request.headers.get("Authorization")
     if not header or not header.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing token")
-    token = header.replace("Bearer ", "").strip()
-    user = _TOKEN_STORE.get(token)
-    if not user:
+    return header.replace("Bearer ", "").strip()
+
+
+def get_current_user(request: Request) -> AuthUser:
+    token = bearer_token(request)
+    stored = _token_store.get(token)
+    if not stored:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    user = AuthUser(**stored)
     if user.employee_id in _DUMMY_IDS:
         return user
+    if _active_role(user.employee_id) != user.role:
+        # Deactivated, or the role changed since login
+        _token_store.delete(token)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return user
+
+
+def _active_role(employee_id: str) -> str | None:
+    """Role of an ACTIVE user (None if inactive or unknown), cached for ACTIVE_USER_TTL."""
+    now = time.monotonic()
+    cached = _active_roles.get(employee_id)
+    if cached and cached[1] > now:
+        return cached[0]
+    generation = _active_generation
     db = SessionLocal()
     try:
-        active = (
-            db.query(UserAccount)
-            .filter(UserAccount.employee_id == user.employee_id)
+        row = (
+            db.query(UserAccount.role_code)
+            .filter(UserAccount.employee_id == employee_id)
             .filter(UserAccount.status == "ACTIVE")
             .first()
         )
-        if not active:
-            _TOKEN_STORE.pop(token, None)
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return user
     finally:
         db.close()
+    role = row[0] if row else None
+    with _active_lock:
+        # Don't cache a value read before a concurrent invalidation
+        if role is not None and generation == _active_generation:
+            _active_roles[employee_id] = (role, now + ACTIVE_USER_TTL_SEC)
+    return role
+
+
+def invalidate_user(employee_id: str):
+    """
+    Drop the cached access and the tokens of employee_id; call after committing a status or
+    role change.
+    """
+    global _active_generation
+    with _active_lock:
+        _active_generation += 1
+        _active_roles.pop(employee_id, None)
+    _token_store.delete_user(employee_id)
 
 
 def require_roles(*roles: str):
@@ -0,0 +1,87 @@
+"""
+Excel export benchmark: report_export.write_xlsx against the old DataFrame + ExcelWriter
+path, on synthetic pickup-report rows. Each writer runs in its own process so peak RSS
+is measured cleanly. Run from backend/:
+
+    python benchmarks/bench_xlsx_export.py --rows 500000
+"""
+
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _rows(count):
+    start = date(2024, 1, 1)
+    for i in range(count):
+        yield {
+            "Vendor Name": "Benchmark Vendor",
+            "Bank Store Code": f"ST{i % 5000:05d}",
+            "Store Name": f"Store {i % 5000}",
+            "Vendor Store Code": f"VS{i % 5000:05d}",
+            "Pickup Date": str(start + timedelta(days=i % 90)),
+            "Pickup Amount": f"{(i * 37) % 250000}.00",
+            "Pickup Type": "BEAT" if i % 3 else "CALL",
+            "Account No": f"{10000000000 + i}",
+            "Customer ID": f"CUST{i % 800:04d}",
+        }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_streaming(count):
+    from report_export import write_xlsx
+
+    spool, _ = write_xlsx(_rows(count), sheet_name="Vendor Pickups")
+    spool.seek(0, os.SEEK_END)
+    size = spool.tell()
+    spool.close()
+    return size
+
+
+def _run_pandas(count):
+    import pandas as pd
+
+    df = pd.DataFrame(list(_rows(count)))
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Vendor Pickups")
+    return len(output.getvalue())
+
+
+def _single(mode, count):
+    started = time.perf_counter()
+    size = _run_streaming(count) if mode == "streaming" else _run_pandas(count)
+    elapsed = time.perf_counter() - started
+    print(f"{mode:<10} rows={count:<8} seconds={elapsed:8.2f} peak_rss_mb={_peak_rss_mb():8.1f} bytes={size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--mode", choices=("streaming", "pandas", "both"), default="both")
+    args = parser.parse_args()
+
+    if args.mode != "both":
+        _single(args.mode, args.rows)
+        return
+    for mode in ("streaming", "pandas"):
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--rows", str(args.rows), "--mode", mode],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
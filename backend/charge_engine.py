@@ -0,0 +1,757 @@
+"""
+Charge engine shared by the single-month compute endpoints, the multi-month batch
+endpoint and the manage.py CLI.
+
+Computation is split in three steps so each can be reused on its own:
+  1. ChargeRules    - one in-memory snapshot of the charge master tables, answering
+                      the same point-in-time lookups the endpoints used to query per row.
+  2. aggregate_*    - grouped queries over the month's pickup rollups (see rollups.py)
+                      giving per-vendor pickup counts and customer x vendor remittance totals.
+  3. price_*        - pure functions applying the rules to those aggregates.
+
+The what-if simulation reprices cached aggregates with ChargeRules.with_overrides().
+"""
+
+import calendar
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+
+from audit import log_audit
+from db import SessionLocal
+from models import (
+    ChargeConfigurationMaster,
+    CustomerChargeSlab,
+    CustomerChargeSummary,
+    MonthLock,
+    MonthlyPickupRollup,
+    PickupRulesMaster,
+    VendorChargeMaster,
+    VendorChargeSummary,
+    VendorUploadBatch,
+    WaiverMaster,
+)
+from utils_month_lock import enforce_month_unlocked
+
+logger = logging.getLogger(__name__)
+
+ENHANCEMENT_THRESHOLD_CODE = "ENHANCEMENT_THRESHOLD_AMOUNT"
+ENHANCEMENT_CHARGE_CODE = "ENHANCEMENT_CHARGE_AMOUNT"
+GST_ENABLED_CODE = "GST_ENABLED"
+GST_RATE_CODE = "GST_RATE_PERCENT"
+CUSTOMER_CHARGE_RATE_CODE = "CUSTOMER_CHARGE_RATE_PERCENT"
+
+BATCH_MAX_WORKERS = int(os.environ.get("CHARGE_BATCH_WORKERS", "4"))
+BATCH_MAX_MONTHS = 36
+AGGREGATE_CACHE_TTL_SEC = int(os.environ.get("CHARGE_AGGREGATE_CACHE_TTL", "900"))
+AGGREGATE_CACHE_MAX_MONTHS = 120
+
+
+def month_bounds(month_key: str) -> tuple[date, date]:
+    """First and last day of a YYYYMM month key."""
+    try:
+        year = int(month_key[:4])
+        month = int(month_key[4:6])
+        if len(month_key) != 6 or not 1 <= month <= 12:
+            raise ValueError(month_key)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="month_key must be YYYYMM")
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def month_range(month_from: str, month_to: str) -> list[str]:
+    """All YYYYMM keys from month_from to month_to inclusive."""
+    start, _ = month_bounds(month_from)
+    end, _ = month_bounds(month_to)
+    if start > end:
+        start, end = end, start
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year}{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _in_effect(effective_from, effective_to, as_of_date) -> bool:
+    return effective_from <= as_of_date and (effective_to is None or effective_to >= as_of_date)
+
+
+def _latest(rows, as_of_date):
+    """Row in effect on as_of_date with the latest effective_from (rows: effective_from, effective_to, ...)."""
+    best = None
+    for row in rows:
+        if _in_effect(row[0], row[1], as_of_date) and (best is None or row[0] > best[0]):
+            best = row
+    return best
+
+
+class ChargeRules:
+    """
+    Snapshot of the charge master tables. Loaded once (one query per table) and then
+    shared read-only across months and worker threads.
+    """
+
+    def __init__(self, configs, pickup_rules, vendor_rates, slabs, waivers):
+        # config_code -> [(effective_from, effective_to, value_number, value_text)]
+        self.configs = configs
+        # pickup_type -> [(effective_from, effective_to, free_limit)]
+        self.pickup_rules = pickup_rules
+        # (vendor_id, pickup_type) -> [(effective_from, effective_to, base_charge, status)]
+        self.vendor_rates = vendor_rates
+        # vendor_id -> [(effective_from, effective_to, amount_from, amount_to, charge_amount)]
+        self.slabs = slabs
+        # customer_id -> [(waiver_from, waiver_to, waiver_type, waiver_percentage, waiver_cap_amount)]
+        self.waivers = waivers
+
+    @classmethod
+    def load(cls, db):
+        configs = {}
+        for row in (
+            db.query(
+                ChargeConfigurationMaster.config_code,
+                ChargeConfigurationMaster.effective_from,
+                ChargeConfigurationMaster.effective_to,
+                ChargeConfigurationMaster.value_number,
+                ChargeConfigurationMaster.value_text,
+            )
+            .filter(ChargeConfigurationMaster.status == "ACTIVE")
+            .all()
+        ):
+            configs.setdefault(row[0], []).append(tuple(row[1:]))
+
+        pickup_rules = {}
+        for row in (
+            db.query(
+                PickupRulesMaster.pickup_type,
+                PickupRulesMaster.effective_from,
+                PickupRulesMaster.effective_to,
+                PickupRulesMaster.free_limit,
+            )
+            .filter(PickupRulesMaster.status == "ACTIVE")
+            .all()
+        ):
+            pickup_rules.setdefault(row[0], []).append(tuple(row[1:]))
+
+        # All statuses: compute falls back to INACTIVE (pending approval) rates.
+        vendor_rates = {}
+        for row in db.query(
+            VendorChargeMaster.vendor_id,
+            VendorChargeMaster.pickup_type,
+            VendorChargeMaster.effective_from,
+            VendorChargeMaster.effective_to,
+            VendorChargeMaster.base_charge,
+            VendorChargeMaster.status,
+        ).all():
+            vendor_rates.setdefault((int(row[0]), row[1]), []).append(tuple(row[2:]))
+
+        slabs = {}
+        for row in (
+            db.query(
+                CustomerChargeSlab.vendor_id,
+                CustomerChargeSlab.effective_from,
+                CustomerChargeSlab.effective_to,
+                CustomerChargeSlab.amount_from,
+                CustomerChargeSlab.amount_to,
+                CustomerChargeSlab.charge_amount,
+            )
+            .filter(CustomerChargeSlab.status == "ACTIVE")
+            .all()
+        ):
+            slabs.setdefault(int(row[0]), []).append(tuple(row[1:]))
+
+        waivers = {}
+        for row in (
+            db.query(
+                WaiverMaster.customer_id,
+                WaiverMaster.waiver_from,
+                WaiverMaster.waiver_to,
+                WaiverMaster.waiver_type,
+                WaiverMaster.waiver_percentage,
+                WaiverMaster.waiver_cap_amount,
+            )
+            .filter(WaiverMaster.status == "ACTIVE")
+            .all()
+        ):
+            waivers.setdefault(row[0], []).append(tuple(row[1:]))
+
+        return cls(configs, pickup_rules, vendor_rates, slabs, waivers)
+
+    def with_overrides(self, vendor_charges=(), slab_sets=(), waivers=()):
+        """
+        Copy of these rules as if the proposed entries were approved, retiring the
+        current entries the way the approve endpoints do. A missing start date applies
+        the proposal to all months.
+        """
+        vendor_rates = dict(self.vendor_rates)
+        for proposal in vendor_charges:
+            key = (int(proposal["vendor_id"]), str(proposal["pickup_type"]).upper())
+            start = proposal.get("effective_from")
+            rows = []
+            for eff_from, eff_to, base_charge, status_ in vendor_rates.get(key, []):
+                if status_ == "ACTIVE":
+                    if start is None:
+                        continue
+                    status_, eff_to = "INACTIVE", start - timedelta(days=1)
+                rows.append((eff_from, eff_to, base_charge, status_))
+            rows.append((start or date.min, None, proposal["base_charge"], "ACTIVE"))
+            vendor_rates[key] = rows
+
+        slabs = dict(self.slabs)
+        for proposal in slab_sets:
+            vendor_id = int(proposal["vendor_id"])
+            start = proposal.get("effective_from")
+            rows = []
+            if start is not None:
+                for eff_from, eff_to, amount_from, amount_to, charge_amount in slabs.get(vendor_id, []):
+                    if eff_from >= start:
+                        continue
+                    if eff_to is None or eff_to >= start:
+                        eff_to = start - timedelta(days=1)
+                    rows.append((eff_from, eff_to, amount_from, amount_to, charge_amount))
+            for slab in proposal["slabs"]:
+                rows.append((start or date.min, None, slab["amount_from"], slab["amount_to"], slab["charge_amount"]))
+            slabs[vendor_id] = rows
+
+        waiver_map = dict(self.waivers)
+        for proposal in waivers:
+            # Approval deactivates every other waiver of the customer
+            waiver_map[proposal["customer_id"]] = [
+                (
+                    proposal.get("waiver_from") or date.min,
+                    proposal.get("waiver_to"),
+                    proposal["waiver_type"],
+                    proposal.get("waiver_percentage"),
+                    proposal.get("waiver_cap_amount"),
+                )
+            ]
+
+        return ChargeRules(self.configs, self.pickup_rules, vendor_rates, slabs, waiver_map)
+
+    def config_number(self, code, as_of_date):
+        row = _latest(self.configs.get(code, []), as_of_date)
+        return float(row[2]) if row and row[2] is not None else None
+
+    def config_text(self, code, as_of_date):
+        row = _latest(self.configs.get(code, []), as_of_date)
+        return row[3] if row else None
+
+    def call_free_limit(self, as_of_date) -> int:
+        row = _latest(self.pickup_rules.get("CALL", []), as_of_date)
+        return int(row[2]) if row and row[2] else 0
+
+    def vendor_rate(self, vendor_id, pickup_type, as_of_date):
+        """Base charge in effect; prefers ACTIVE, falls back to INACTIVE (pending approval)."""
+        rows = self.vendor_rates.get((int(vendor_id), pickup_type), [])
+        row = _latest([r for r in rows if r[3] == "ACTIVE"], as_of_date) or _latest(rows, as_of_date)
+        return float(row[2]) if row else None
+
+    def slab_charge(self, vendor_id, total_remittance, as_of_date):
+        """Slab-based charge for vendor. Returns charge_amount or None if no slab."""
+        slabs = [s for s in self.slabs.get(int(vendor_id), []) if _in_effect(s[0], s[1], as_of_date)]
+        for slab in sorted(slabs, key=lambda s: s[2]):
+            if float(slab[2]) <= total_remittance <= float(slab[3]):
+                return float(slab[4])
+        return None
+
+    def waiver(self, customer_id, as_of_date):
+        return _latest(self.waivers.get(customer_id, []), as_of_date)
+
+
+def _unrolled_slices(db, month_key, build_missing: bool) -> dict:
+    """
+    Slices the rollup table lacks for the month (rollups.missing_vendors): built and
+    committed when build_missing, otherwise computed from the transactions without
+    writing, as rollups.slice_totals rows.
+    """
+    from rollups import ensure_month, missing_vendors, slice_totals
+
+    if build_missing:
+        ensure_month(db, month_key)
+        return {}
+    return slice_totals(db, month_key, missing_vendors(db, month_key))
+
+
+def aggregate_vendor_month(db, month_key, vendor_ids=None, build_missing=True) -> dict:
+    """
+    vendor_id -> {"beat", "call", "pickup_amount"} for vendors with a batch in the month.
+    build_missing=False never writes (see _unrolled_slices).
+    """
+    first_day, last_day = month_bounds(month_key)
+    batch_query = db.query(VendorUploadBatch.vendor_id).filter(
+        VendorUploadBatch.mis_date.between(first_day, last_day)
+    )
+    if vendor_ids:
+        batch_query = batch_query.filter(VendorUploadBatch.vendor_id.in_(vendor_ids))
+    totals = {
+        int(row[0]): {"beat": 0, "call": 0, "pickup_amount": 0.0}
+        for row in batch_query.distinct().all()
+    }
+    if not totals:
+        return totals
+
+    unrolled = _unrolled_slices(db, month_key, build_missing)
+    rows = (
+        db.query(
+            MonthlyPickupRollup.vendor_id,
+            MonthlyPickupRollup.pickup_type,
+            func.sum(MonthlyPickupRollup.pickup_count),
+            func.sum(MonthlyPickupRollup.pickup_amount),
+        )
+        .filter(MonthlyPickupRollup.month_key == month_key)
+        .filter(MonthlyPickupRollup.vendor_id.in_(list(totals.keys())))
+        .group_by(MonthlyPickupRollup.vendor_id, MonthlyPickupRollup.pickup_type)
+        .all()
+    )
+    rows += [
+        (vendor_id, pickup_type, measures[0], measures[1])
+        for (vendor_id, _, _, pickup_type), measures in unrolled.items()
+        if vendor_id in totals
+    ]
+    for vendor_id, pickup_type, count, amount in rows:
+        entry = totals[int(vendor_id)]
+        if pickup_type == "BEAT":
+            entry["beat"] += int(count)
+        elif pickup_type == "CALL":
+            entry["call"] += int(count)
+        entry["pickup_amount"] += float(amount or 0)
+    return totals
+
+
+def aggregate_customer_month(db, month_key, build_missing=True) -> dict:
+    """
+    (customer_id, vendor_id) -> {"remittance", "beat_amount"} for the month's vendor
+    pickups remitted (or picked up) within the month. build_missing=False never writes.
+    """
+    month_bounds(month_key)
+    unrolled = _unrolled_slices(db, month_key, build_missing)
+    rows = (
+        db.query(
+            MonthlyPickupRollup.customer_id,
+            MonthlyPickupRollup.vendor_id,
+            MonthlyPickupRollup.pickup_type,
+            func.sum(MonthlyPickupRollup.remittance_amount),
+        )
+        .filter(MonthlyPickupRollup.month_key == month_key)
+        .filter(MonthlyPickupRollup.customer_id.isnot(None))
+        .filter(MonthlyPickupRollup.remittance_count > 0)
+        .group_by(MonthlyPickupRollup.customer_id, MonthlyPickupRollup.vendor_id, MonthlyPickupRollup.pickup_type)
+        .all()
+    )
+    rows += [
+        (customer_id, vendor_id, pickup_type, measures[3])
+        for (vendor_id, _, customer_id, pickup_type), measures in unrolled.items()
+        if customer_id is not None and measures[2] > 0
+    ]
+    customer_vendor = {}
+    for customer_id, vendor_id, pickup_type, total in rows:
+        amt = float(total or 0)
+        entry = customer_vendor.setdefault((customer_id, int(vendor_id)), {"remittance": 0.0, "beat_amount": 0.0})
+        entry["remittance"] += amt
+        if (pickup_type or "").upper() == "BEAT":
+            entry["beat_amount"] += amt
+    return customer_vendor
+
+
+def _tax(amount, rules: ChargeRules, as_of_date) -> float:
+    gst_enabled = rules.config_text(GST_ENABLED_CODE, as_of_date)
+    gst_rate = rules.config_number(GST_RATE_CODE, as_of_date) or 0.0
+    return amount * (gst_rate / 100) if str(gst_enabled).upper() == "Y" else 0.0
+
+
+def price_vendor_month(month_key, vendor_totals: dict, rules: ChargeRules) -> list[dict]:
+    """Vendor charge summary values per vendor. Raises 400 when a needed rate is missing."""
+    _, as_of_date = month_bounds(month_key)
+    # Enhancement configs disabled for now - use defaults when not configured
+    threshold = rules.config_number(ENHANCEMENT_THRESHOLD_CODE, as_of_date) or 50000.0
+    call_free_limit = rules.call_free_limit(as_of_date)
+
+    results = []
+    for vendor_id in sorted(vendor_totals):
+        totals = vendor_totals[vendor_id]
+        beat_pickups = totals["beat"]
+        call_pickups = totals["call"]
+        chargeable_calls = max(0, call_pickups - call_free_limit)
+
+        beat_rate = rules.vendor_rate(vendor_id, "BEAT", as_of_date)
+        call_rate = rules.vendor_rate(vendor_id, "CALL", as_of_date)
+        if beat_pickups and beat_rate is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Beat charge config missing for vendor {vendor_id}. Add BEAT config with effective_from on or before month end.",
+            )
+        if chargeable_calls and call_rate is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Call charge config missing for vendor {vendor_id}. Add CALL config with effective_from on or before month end.",
+            )
+
+        beat_charge = beat_rate * beat_pickups if beat_rate is not None else 0.0
+        call_charge = call_rate * chargeable_calls if call_rate is not None else 0.0
+        base_charge_amount = beat_charge + call_charge
+
+        enhancement_units = math.floor(totals["pickup_amount"] / threshold)
+        enhancement_amount = 0  # Enhancement disabled; was: enhancement_units * enhancement_charge
+
+        total_charge_amount = base_charge_amount + enhancement_amount
+        tax_amount = _tax(total_charge_amount, rules, as_of_date)
+        results.append(
+            {
+                "vendor_id": vendor_id,
+                "month_key": month_key,
+                "beat_pickups": beat_pickups,
+                "call_pickups": call_pickups,
+                "base_charge_amount": base_charge_amount,
+                "enhancement_charge": enhancement_amount,
+                "tax_amount": tax_amount,
+                "total_charge_amount": total_charge_amount,
+                "total_with_tax": total_charge_amount + tax_amount,
+            }
+        )
+    return results
+
+
+def _waiver_amount(waiver, base_charge_amount) -> float:
+    if not waiver:
+        return 0.0
+    waiver_type, waiver_percentage, waiver_cap_amount = waiver[2], waiver[3], waiver[4]
+    if waiver_type == "PERCENT" and waiver_percentage:
+        return base_charge_amount * (float(waiver_percentage) / 100)
+    if waiver_type == "CAP" and waiver_cap_amount:
+        return float(waiver_cap_amount)
+    if waiver_type == "BOTH":
+        pct_amt = base_charge_amount * (float(waiver_percentage) / 100) if waiver_percentage else 0.0
+        cap_amt = float(waiver_cap_amount) if waiver_cap_amount else 0.0
+        return min(pct_amt, cap_amt) if cap_amt else pct_amt
+    return 0.0
+
+
+def price_customer_month(month_key, customer_vendor: dict, rules: ChargeRules) -> list[dict]:
+    """Customer charge summary values per customer."""
+    _, as_of_date = month_bounds(month_key)
+    customer_rate_fallback = rules.config_number(CUSTOMER_CHARGE_RATE_CODE, as_of_date)
+
+    customer_totals = {}
+    for (customer_id, vendor_id), data in customer_vendor.items():
+        totals = customer_totals.setdefault(
+            customer_id, {"total_remittance": 0.0, "base_charge": 0.0, "enhancement": 0.0}
+        )
+        totals["total_remittance"] += data["remittance"]
+        slab_charge = rules.slab_charge(vendor_id, data["remittance"], as_of_date)
+        if slab_charge is not None:
+            totals["base_charge"] += slab_charge
+        elif customer_rate_fallback is not None:
+            totals["base_charge"] += data["remittance"] * (customer_rate_fallback / 100)
+        beat_enhancement = 0  # Enhancement disabled; was: math.floor(data["beat_amount"] / threshold) * enhancement_per_unit
+        totals["enhancement"] += beat_enhancement
+
+    results = []
+    for customer_id, data in customer_totals.items():
+        base_charge_amount = data["base_charge"] + data["enhancement"]
+        waiver_amount = _waiver_amount(rules.waiver(customer_id, as_of_date), base_charge_amount)
+        net_charge_amount = max(0.0, base_charge_amount - waiver_amount)
+        tax_amount = _tax(net_charge_amount, rules, as_of_date)
+        results.append(
+            {
+                "customer_id": customer_id,
+                "month_key": month_key,
+                "total_remittance": data["total_remittance"],
+                "base_charge_amount": data["base_charge"],
+                "enhancement_charge": data["enhancement"],
+                "waiver_amount": waiver_amount,
+                "net_charge_amount": net_charge_amount,
+                "tax_amount": tax_amount,
+                "total_with_tax": net_charge_amount + tax_amount,
+            }
+        )
+    return results
+
+
+def compute_vendor_charges(db, month_key, computed_by, rules: ChargeRules | None = None, vendor_ids=None) -> int:
+    """Compute and store vendor charge summaries for one month. Commits; returns count."""
+    month_bounds(month_key)
+    enforce_month_unlocked(db, month_key)
+    rules = rules or ChargeRules.load(db)
+
+    vendor_totals = aggregate_vendor_month(db, month_key, vendor_ids)
+    if vendor_totals:
+        existing = (
+            db.query(VendorChargeSummary.summary_id)
+            .filter(VendorChargeSummary.month_key == month_key)
+            .filter(VendorChargeSummary.vendor_id.in_(list(vendor_totals.keys())))
+            .first()
+        )
+        if existing:
+            raise HTTPException(status_code=409, detail="Vendor charges already computed for month")
+
+    results = price_vendor_month(month_key, vendor_totals, rules)
+    for values in results:
+        db.add(VendorChargeSummary(status="COMPUTED", computed_by=computed_by, **values))
+
+    log_audit(
+        db,
+        entity_type="CHARGES",
+        entity_id="VENDOR",
+        action="COMPUTE",
+        old_data=None,
+        new_data=f"month_key={month_key},count={len(results)}",
+        changed_by=computed_by,
+    )
+    db.commit()
+    return len(results)
+
+
+def compute_customer_charges(db, month_key, computed_by, rules: ChargeRules | None = None) -> int:
+    """Compute and store customer charge summaries for one month. Commits; returns count."""
+    month_bounds(month_key)
+    enforce_month_unlocked(db, month_key)
+    rules = rules or ChargeRules.load(db)
+
+    customer_vendor = aggregate_customer_month(db, month_key)
+    results = price_customer_month(month_key, customer_vendor, rules)
+    if results:
+        existing = (
+            db.query(CustomerChargeSummary.summary_id)
+            .filter(CustomerChargeSummary.month_key == month_key)
+            .filter(CustomerChargeSummary.customer_id.in_([r["customer_id"] for r in results]))
+            .first()
+        )
+        if existing:
+            raise HTTPException(status_code=409, detail="Customer charges already computed for month")
+
+    for values in results:
+        db.add(CustomerChargeSummary(status="COMPUTED", computed_by=computed_by, **values))
+
+    log_audit(
+        db,
+        entity_type="CHARGES",
+        entity_id="CUSTOMER",
+        action="COMPUTE",
+        old_data=None,
+        new_data=f"month_key={month_key},count={len(results)}",
+        changed_by=computed_by,
+    )
+    db.commit()
+    return len(results)
+
+
+def _compute_month_worker(month_key, kinds, computed_by, rules, vendor_ids):
+    """Batch worker: one month, own session. Failures are reported, not raised."""
+    outcome = {"month_key": month_key, "status": "ok", "errors": []}
+    db = SessionLocal()
+    try:
+        for kind, compute in (
+            ("VENDOR", lambda: compute_vendor_charges(db, month_key, computed_by, rules, vendor_ids)),
+            ("CUSTOMER", lambda: compute_customer_charges(db, month_key, computed_by, rules)),
+        ):
+            if kind not in kinds:
+                continue
+            try:
+                outcome[f"{kind.lower()}_computed"] = compute()
+            except HTTPException as exc:
+                db.rollback()
+                outcome["errors"].append({"kind": kind, "status_code": exc.status_code, "detail": exc.detail})
+            except Exception as exc:
+                db.rollback()
+                logger.exception("Charge compute failed for %s %s", kind, month_key)
+                outcome["errors"].append({"kind": kind, "status_code": 500, "detail": str(exc)})
+    finally:
+        db.close()
+    if outcome["errors"]:
+        outcome["status"] = "failed"
+    return outcome
+
+
+def compute_charges_for_range(
+    month_from, month_to, computed_by, kinds=("VENDOR", "CUSTOMER"), vendor_ids=None, max_workers=None
+) -> list[dict]:
+    """
+    Compute charges for every unlocked month in the range, one worker (and session) per
+    month, all sharing a single ChargeRules snapshot. kinds is VENDOR and/or CUSTOMER (a
+    single name or a list). Returns one outcome per month.
+    """
+    months = month_range(month_from, month_to)
+    if len(months) > BATCH_MAX_MONTHS:
+        raise HTTPException(
+            status_code=400, detail=f"Month range too large (max {BATCH_MAX_MONTHS} months)"
+        )
+    if isinstance(kinds, str):
+        kinds = [kinds]
+    kinds = {str(k).strip().upper() for k in kinds}
+    if not kinds or not kinds.issubset({"VENDOR", "CUSTOMER"}):
+        raise HTTPException(status_code=400, detail="kinds must be VENDOR and/or CUSTOMER")
+
+    db = SessionLocal()
+    try:
+        rules = ChargeRules.load(db)
+        locked = {
+            row[0]
+            for row in db.query(MonthLock.month_key)
+            .filter(MonthLock.status == "LOCKED")
+            .filter(MonthLock.month_key.in_(months))
+            .all()
+        }
+    finally:
+        db.close()
+
+    outcomes = {m: {"month_key": m, "status": "locked", "errors": []} for m in months if m in locked}
+    open_months = [m for m in months if m not in locked]
+    if open_months:
+        workers = max(1, min(max_workers or BATCH_MAX_WORKERS, len(open_months)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="charge-batch") as pool:
+            futures = [
+                pool.submit(_compute_month_worker, m, kinds, computed_by, rules, vendor_ids)
+                for m in open_months
+            ]
+            for future in futures:
+                outcome = future.result()
+                outcomes[outcome["month_key"]] = outcome
+    return [outcomes[m] for m in months]
+
+
+_aggregate_cache: OrderedDict = OrderedDict()
+_aggregate_cache_lock = threading.Lock()
+
+
+def _month_data_stamp(db, month_key):
+    """
+    Cheap fingerprint of a month's vendor batches and rollups; changes on upload, re-upload
+    or delete, and when rollup slices are rebuilt (e.g. a store mapping approved).
+    """
+    first_day, last_day = month_bounds(month_key)
+    count, max_batch_id, max_uploaded_at = (
+        db.query(
+            func.count(VendorUploadBatch.batch_id),
+            func.max(VendorUploadBatch.batch_id),
+            func.max(VendorUploadBatch.uploaded_at),
+        )
+        .filter(VendorUploadBatch.mis_date.between(first_day, last_day))
+        .one()
+    )
+    rollup_count, max_rollup_id, max_refreshed_at = (
+        db.query(
+            func.count(MonthlyPickupRollup.rollup_id),
+            func.max(MonthlyPickupRollup.rollup_id),
+            func.max(MonthlyPickupRollup.refreshed_at),
+        )
+        .filter(MonthlyPickupRollup.month_key == month_key)
+        .one()
+    )
+    return (
+        int(count or 0),
+        max_batch_id,
+        str(max_uploaded_at),
+        int(rollup_count or 0),
+        max_rollup_id,
+        str(max_refreshed_at),
+    )
+
+
+def cached_month_aggregates(db, month_key) -> tuple[dict, dict]:
+    """
+    (vendor_totals, customer_vendor) for a month, reused across simulation requests
+    until the month's batches or rollups change or the TTL passes. Read-only: slices missing from
+    the rollup table are aggregated from the transactions rather than built.
+    """
+    stamp = _month_data_stamp(db, month_key)
+    now = time.monotonic()
+    with _aggregate_cache_lock:
+        entry = _aggregate_cache.get(month_key)
+        if entry and entry[0] == stamp and entry[1] > now:
+            _aggregate_cache.move_to_end(month_key)
+            return entry[2], entry[3]
+
+    vendor_totals = aggregate_vendor_month(db, month_key, build_missing=False)
+    customer_vendor = aggregate_customer_month(db, month_key, build_missing=False)
+    with _aggregate_cache_lock:
+        _aggregate_cache[month_key] = (stamp, now + AGGREGATE_CACHE_TTL_SEC, vendor_totals, customer_vendor)
+        _aggregate_cache.move_to_end(month_key)
+        while len(_aggregate_cache) > AGGREGATE_CACHE_MAX_MONTHS:
+            _aggregate_cache.popitem(last=False)
+    return vendor_totals, customer_vendor
+
+
+def _compare(key_name, stored: dict, baseline: dict, simulated: dict) -> dict:
+    stored_total = sum(stored.values())
+    baseline_total = sum(baseline.values())
+    simulated_total = sum(simulated.values())
+    changed = []
+    for key in sorted(set(stored) | set(simulated), key=str):
+        before = stored.get(key, 0.0)
+        after = simulated.get(key, 0.0)
+        if round(after - before, 2):
+            changed.append(
+                {key_name: key, "stored": round(before, 2), "simulated": round(after, 2), "delta": round(after - before, 2)}
+            )
+    return {
+        "stored_total": round(stored_total, 2),
+        "baseline_total": round(baseline_total, 2),
+        "simulated_total": round(simulated_total, 2),
+        "delta": round(simulated_total - stored_total, 2),
+        "rule_delta": round(simulated_total - baseline_total, 2),
+        "changed": changed,
+    }
+
+
+def simulate_charges(db, month_from, month_to, vendor_charges=(), slab_sets=(), waivers=()) -> dict:
+    """
+    Reprice each month with the proposed rules and compare total_with_tax against the
+    stored summaries (delta) and against the current rules (rule_delta). Read-only.
+    """
+    months = month_range(month_from, month_to)
+    if len(months) > BATCH_MAX_MONTHS:
+        raise HTTPException(
+            status_code=400, detail=f"Month range too large (max {BATCH_MAX_MONTHS} months)"
+        )
+    rules = ChargeRules.load(db)
+    proposed = rules.with_overrides(vendor_charges, slab_sets, waivers)
+
+    stored_vendor = {}
+    for vendor_id, month_key, total in (
+        db.query(VendorChargeSummary.vendor_id, VendorChargeSummary.month_key, VendorChargeSummary.total_with_tax)
+        .filter(VendorChargeSummary.month_key.in_(months))
+        .all()
+    ):
+        stored_vendor.setdefault(month_key, {})[int(vendor_id)] = float(total or 0)
+    stored_customer = {}
+    for customer_id, month_key, total in (
+        db.query(
+            CustomerChargeSummary.customer_id, CustomerChargeSummary.month_key, CustomerChargeSummary.total_with_tax
+        )
+        .filter(CustomerChargeSummary.month_key.in_(months))
+        .all()
+    ):
+        stored_customer.setdefault(month_key, {})[customer_id] = float(total or 0)
+
+    results = []
+    for month_key in months:
+        vendor_totals, customer_vendor = cached_month_aggregates(db, month_key)
+        outcome = {"month_key": month_key, "errors": []}
+        try:
+            baseline = {r["vendor_id"]: r["total_with_tax"] for r in price_vendor_month(month_key, vendor_totals, rules)}
+            simulated = {
+                r["vendor_id"]: r["total_with_tax"] for r in price_vendor_month(month_key, vendor_totals, proposed)
+            }
+            outcome["vendor"] = _compare("vendor_id", stored_vendor.get(month_key, {}), baseline, simulated)
+        except HTTPException as exc:
+            outcome["errors"].append({"kind": "VENDOR", "detail": exc.detail})
+        baseline = {r["customer_id"]: r["total_with_tax"] for r in price_customer_month(month_key, customer_vendor, rules)}
+        simulated = {
+            r["customer_id"]: r["total_with_tax"] for r in price_customer_month(month_key, customer_vendor, proposed)
+        }
+        outcome["customer"] = _compare("customer_id", stored_customer.get(month_key, {}), baseline, simulated)
+        results.append(outcome)
+
+    return {
+        "months": results,
+        "vendor_delta": round(sum(m["vendor"]["delta"] for m in results if "vendor" in m), 2),
+        "customer_delta": round(sum(m["customer"]["delta"] for m in results), 2),
+    }
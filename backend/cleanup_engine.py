@@ -0,0 +1,218 @@
+"""
+Chunked admin cleanup. A run empties a list of tables in order (children before parents),
+each in chunks of ADMIN_CLEANUP_CHUNK_ROWS rows with a commit per chunk, so undo and lock
+time stay bounded however big the tables are. On Oracle a table that no enabled foreign key
+references is truncated instead (ADMIN_CLEANUP_TRUNCATE).
+
+The run's progress (tables finished, rows deleted per table) lives in admin_cleanup_run and
+is committed together with each chunk, so GET /api/admin/cleanup/runs/{run_id} shows it
+live and a run stopped by an error, a timeout or a restart resumes where it stopped
+(POST /api/admin/cleanup/runs/{run_id}/resume or `manage.py resume-cleanup`).
+
+Only one run is RUNNING at a time (unique index ux_cleanup_run_running). Starting, resuming,
+failing and completing a run are each audited under ADMIN_CLEANUP with the run id.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.exc import IntegrityError
+
+import staging_archive
+from audit import log_audit
+from db import Base, SessionLocal
+from models import AdminCleanupRun, StagingArchive
+
+logger = logging.getLogger(__name__)
+
+ADMIN_CLEANUP_CHUNK_ROWS = int(os.getenv("ADMIN_CLEANUP_CHUNK_ROWS", "5000"))
+ADMIN_CLEANUP_TRUNCATE = os.getenv("ADMIN_CLEANUP_TRUNCATE", "true").lower() in ("1", "true", "yes")
+# A RUNNING run whose progress hasn't moved for this long is taken as interrupted
+STALE_AFTER = timedelta(minutes=5)
+
+
+def _progress(run) -> dict:
+    return json.loads(run.progress)
+
+
+def _save(run, progress: dict, current_table=None):
+    run.progress = json.dumps(progress)
+    run.current_table = current_table
+    run.updated_at = datetime.utcnow()
+
+
+def _active(run) -> bool:
+    return run.status == "RUNNING" and run.updated_at is not None and datetime.utcnow() - run.updated_at < STALE_AFTER
+
+
+def run_status(run) -> dict:
+    progress = _progress(run)
+    return {
+        "run_id": int(run.run_id),
+        "kind": run.kind,
+        "status": run.status,
+        "targets": run.targets,
+        "requested_by": run.requested_by,
+        "tables": progress["tables"],
+        "tables_done": progress["done"],
+        "current_table": run.current_table,
+        "deleted": progress["deleted"],
+        "error": run.error_message,
+        "started_at": run.started_at,
+        "updated_at": run.updated_at,
+        "finished_at": run.finished_at,
+    }
+
+
+def _audit(db, run, action: str, details: dict):
+    log_audit(db, "ADMIN_CLEANUP", run.run_id, action, None, {"kind": run.kind, **details}, run.requested_by)
+
+
+def _claim_running(db):
+    """Flush run as the RUNNING run; 409 if another run got there first."""
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Another cleanup run is in progress")
+
+
+def start_run(db, kind: str, tables: list[str], requested_by: str, targets=None, reason=None):
+    """Record a new run over tables (in deletion order) and commit it; execute() does the work."""
+    running = db.query(AdminCleanupRun).filter(AdminCleanupRun.status == "RUNNING").with_for_update().all()
+    for other in running:
+        if _active(other):
+            raise HTTPException(status_code=409, detail=f"Cleanup run {other.run_id} is still in progress")
+        # Interrupted; it can still be resumed once this run is done
+        other.status = "FAILED"
+        other.error_message = "Interrupted"
+        _audit(db, other, "FAIL", {"table": other.current_table, "error": other.error_message})
+    run = AdminCleanupRun(
+        kind=kind,
+        targets=",".join(targets) if targets else None,
+        reason=reason,
+        requested_by=requested_by,
+        status="RUNNING",
+    )
+    _save(run, {"tables": list(dict.fromkeys(tables)), "done": 0, "deleted": {}})
+    db.add(run)
+    _claim_running(db)
+    _audit(db, run, "START", {"targets": run.targets, "reason": reason, "tables": _progress(run)["tables"]})
+    db.commit()
+    return run
+
+
+def _referenced(db, table: str) -> bool:
+    count = db.execute(
+        text(
+            "SELECT COUNT(*) FROM user_constraints c "
+            "JOIN user_constraints p ON p.constraint_name = c.r_constraint_name "
+            "WHERE c.constraint_type = 'R' AND c.status = 'ENABLED' AND p.table_name = :table"
+        ),
+        {"table": table.upper()},
+    ).scalar()
+    return count > 0
+
+
+def _delete_chunk(db, table, chunk_rows: int) -> int:
+    if db.bind.dialect.name == "oracle":
+        return db.execute(text(f"DELETE FROM {table.name} WHERE ROWNUM <= :n"), {"n": chunk_rows}).rowcount
+    pk = list(table.primary_key.columns)
+    chunk = select(*pk).limit(chunk_rows)
+    key = pk[0] if len(pk) == 1 else tuple_(*pk)
+    return db.execute(delete(table).where(key.in_(chunk))).rowcount
+
+
+def _empty_table(db, run, progress: dict, name: str, chunk_rows: int):
+    table = Base.metadata.tables[name]
+    deleted = progress["deleted"]
+    deleted.setdefault(name, 0)
+    if name == StagingArchive.__tablename__:
+        # Archive files go once the entries deleting them are committed
+        while True:
+            files = staging_archive.discard_entries(db, chunk_rows)
+            deleted[name] += len(files)
+            _save(run, progress, name)
+            db.commit()
+            staging_archive.remove_files(files)
+            if len(files) < chunk_rows:
+                return
+    if ADMIN_CLEANUP_TRUNCATE and db.bind.dialect.name == "oracle" and not _referenced(db, name):
+        deleted[name] += db.execute(select(func.count()).select_from(table)).scalar()
+        db.execute(text(f"TRUNCATE TABLE {name}"))
+        _save(run, progress, name)
+        db.commit()
+        return
+    while True:
+        count = _delete_chunk(db, table, chunk_rows)
+        deleted[name] += count
+        _save(run, progress, name)
+        db.commit()
+        if count < chunk_rows:
+            return
+
+
+def execute(run_id: int, chunk_rows: int = ADMIN_CLEANUP_CHUNK_ROWS) -> dict:
+    """Empty the run's remaining tables; returns its status (FAILED with the error on failure)."""
+    db = SessionLocal()
+    try:
+        run = db.get(AdminCleanupRun, run_id)
+        progress = _progress(run)
+        tables = progress["tables"]
+        try:
+            while progress["done"] < len(tables):
+                name = tables[progress["done"]]
+                _empty_table(db, run, progress, name, chunk_rows)
+                progress["done"] += 1
+                _save(run, progress)
+                db.commit()
+                logger.info("Cleanup run %s: emptied %s (%s rows)", run_id, name, progress["deleted"][name])
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Cleanup run %s stopped at %s", run_id, run.current_table)
+            run.status = "FAILED"
+            run.error_message = str(exc)[:1000]
+            run.updated_at = datetime.utcnow()
+            _audit(
+                db,
+                run,
+                "FAIL",
+                {"table": run.current_table, "error": run.error_message, "deleted": progress["deleted"]},
+            )
+            db.commit()
+            return run_status(run)
+        _audit(db, run, "DELETE", {"targets": run.targets, "reason": run.reason, "deleted": progress["deleted"]})
+        run.status = "COMPLETED"
+        run.error_message = None
+        run.finished_at = datetime.utcnow()
+        _save(run, progress)
+        db.commit()
+        return run_status(run)
+    finally:
+        db.close()
+
+
+def resume(run_id: int, chunk_rows: int = ADMIN_CLEANUP_CHUNK_ROWS) -> dict:
+    """Continue a FAILED or interrupted (stale RUNNING) run from its last committed chunk."""
+    db = SessionLocal()
+    try:
+        run = db.query(AdminCleanupRun).filter(AdminCleanupRun.run_id == run_id).with_for_update().first()
+        if run is None:
+            raise HTTPException(status_code=404, detail="Cleanup run not found")
+        if run.status == "COMPLETED":
+            raise HTTPException(status_code=400, detail="Cleanup run already completed")
+        if _active(run):
+            raise HTTPException(status_code=409, detail=f"Cleanup run {run_id} is still in progress")
+        run.status = "RUNNING"
+        run.error_message = None
+        run.updated_at = datetime.utcnow()
+        _claim_running(db)
+        _audit(db, run, "RESUME", {"tables_done": _progress(run)["done"]})
+        db.commit()
+    finally:
+        db.close()
+    return execute(run_id, chunk_rows)
@@ -0,0 +1,82 @@
+"""
+Version stamp of the data reports are built from (report_cache result keys, report job
+dedup).
+
+log_audit marks a session that records a write to report data (DATA_ENTITY_TYPES:
+uploads, reconciliation, corrections, charges, masters, cleanups). Once that session
+commits, the single data_version row is bumped in its own short transaction, so writers
+never hold the row while their own transaction is open and readers get the stamp with a
+primary-key lookup. Logins, user admin, month locks and reads don't move it.
+
+A bump lost to a crash between the commit and the bump leaves results of that write
+cached for at most REPORT_CACHE_TTL.
+"""
+
+import logging
+
+from sqlalchemy import event, func, insert, update
+
+from db import SessionLocal, engine
+from models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+DATA_ENTITY_TYPES = frozenset(
+    {
+        "UPLOAD",
+        "RECONCILIATION",
+        "RECONCILIATION_RESULT",
+        "RECONCILIATION_CORRECTION",
+        "REMITTANCE",
+        "EXCEPTION",
+        "WAIVER",
+        "CHARGES",
+        "CHARGE_CONFIG",
+        "VENDOR_CHARGE",
+        "PICKUP_RULE",
+        "VENDOR_MASTER",
+        "BANK_STORE_MASTER",
+        "STORE_MAPPING",
+        "ADMIN_CLEANUP",
+        "MIS_PARTITIONS",
+    }
+)
+VERSION_ID = 1
+_CHANGED = "data_changed"
+
+
+def mark_changed(db):
+    """Bump the version once db's current transaction commits."""
+    db.info[_CHANGED] = True
+
+
+def current(db) -> int:
+    version = db.query(DataVersion.version).filter(DataVersion.version_id == VERSION_ID).scalar()
+    return int(version or 0)
+
+
+def bump():
+    with engine.begin() as conn:
+        bumped = conn.execute(
+            update(DataVersion)
+            .where(DataVersion.version_id == VERSION_ID)
+            .values(version=DataVersion.version + 1, updated_at=func.now())
+        ).rowcount
+        if not bumped:
+            # Databases created without schema.sql's seed row (SQLite in development)
+            conn.execute(insert(DataVersion).values(version_id=VERSION_ID, version=1))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _bump_after_commit(session):
+    if session.info.pop(_CHANGED, False):
+        try:
+            bump()
+        except Exception:
+            # The write itself is committed; don't fail the request over the stamp
+            logger.exception("Could not bump the data version")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_after_rollback(session):
+    session.info.pop(_CHANGED, None)
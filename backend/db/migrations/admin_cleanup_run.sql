@@ -0,0 +1,24 @@
+-- Migration: Progress table for chunked admin cleanup and reset (cleanup_engine.py).
+-- Fresh installs use schema.sql which already has the table, index and sequence.
+
+CREATE SEQUENCE seq_admin_cleanup_run START WITH 1 INCREMENT BY 1 NOCACHE;
+
+CREATE TABLE admin_cleanup_run (
+  run_id              NUMBER PRIMARY KEY,
+  kind                VARCHAR2(20) NOT NULL,
+  targets             VARCHAR2(500),
+  reason              VARCHAR2(500),
+  requested_by        VARCHAR2(50) NOT NULL,
+  status              VARCHAR2(20) NOT NULL,
+  progress            VARCHAR2(4000) NOT NULL,
+  current_table       VARCHAR2(128),
+  error_message       VARCHAR2(1000),
+  started_at          DATE DEFAULT SYSDATE NOT NULL,
+  updated_at          DATE,
+  finished_at         DATE,
+  CONSTRAINT chk_cleanup_run_kind CHECK (kind IN ('CLEANUP','RESET_ALL')),
+  CONSTRAINT chk_cleanup_run_status CHECK (status IN ('RUNNING','FAILED','COMPLETED'))
+);
+
+-- At most one RUNNING run
+CREATE UNIQUE INDEX ux_cleanup_run_running ON admin_cleanup_run (CASE WHEN status = 'RUNNING' THEN 'RUNNING' END);
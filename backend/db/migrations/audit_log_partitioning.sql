@@ -0,0 +1,14 @@
+-- Migration: Partition audit_log by month (interval range on changed_at) and add the
+-- search indexes. Needs Oracle 12.2+ for the online conversion.
+-- Fresh installs use schema.sql which already has the partitioned table.
+-- Old months are then removed with:
+--   python manage.py audit-retention --keep-months 12
+
+ALTER TABLE audit_log MODIFY
+  PARTITION BY RANGE (changed_at) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+  (PARTITION p_audit_initial VALUES LESS THAN (DATE '2024-01-01'))
+  ONLINE UPDATE INDEXES;
+
+CREATE INDEX idx_audit_log_changed_at ON audit_log (changed_at) LOCAL;
+CREATE INDEX idx_audit_log_entity ON audit_log (entity_type, entity_id) LOCAL;
+CREATE INDEX idx_audit_log_changed_by ON audit_log (changed_by) LOCAL;
@@ -0,0 +1,13 @@
+-- Migration: Add auth_token, the shared login token store used when AUTH_TOKEN_STORE=db
+-- (needed to run the API with several worker processes).
+-- Fresh installs use schema.sql which already has the table.
+
+CREATE TABLE auth_token (
+  token_hash          VARCHAR2(64) PRIMARY KEY,
+  employee_id         VARCHAR2(50) NOT NULL,
+  full_name           VARCHAR2(150) NOT NULL,
+  role_code           VARCHAR2(20) NOT NULL,
+  issued_at           DATE DEFAULT SYSDATE NOT NULL
+);
+
+CREATE INDEX idx_auth_token_employee ON auth_token (employee_id);
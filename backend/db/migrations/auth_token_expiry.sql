@@ -0,0 +1,4 @@
+-- Migration: Track last use of login tokens for idle expiry (TOKEN_IDLE_TIMEOUT).
+-- Fresh installs use schema.sql which already has the column.
+
+ALTER TABLE auth_token ADD last_seen_at DATE DEFAULT SYSDATE NOT NULL;
@@ -0,0 +1,13 @@
+-- Migration: Single-row data version for report result keys, bumped after each committed
+-- write to report data instead of taking MAX(audit_id) over audit_log on every download.
+-- Fresh installs use schema.sql which already has the table and its row.
+
+CREATE TABLE data_version (
+  version_id          NUMBER PRIMARY KEY,
+  version             NUMBER NOT NULL,
+  updated_at          DATE DEFAULT SYSDATE NOT NULL
+);
+
+INSERT INTO data_version (version_id, version) VALUES (1, 0);
+
+COMMIT;
@@ -0,0 +1,77 @@
+-- Migration: Partition canonical transactions and raw staging by month on the batch's
+-- MIS date, and remittance_entries by reference to its transaction. Needs Oracle 12.2+.
+-- Fresh installs use schema.sql which already has the partitioned tables.
+-- Run in a maintenance window (remittance_entries is rebuilt). Old months are then
+-- archived with:
+--   python manage.py archive-partitions --keep-months 24
+
+-- 1. Carry the partition key, copied from the upload batches
+ALTER TABLE canonical_transactions ADD mis_date DATE;
+UPDATE canonical_transactions c
+   SET mis_date = (SELECT b.mis_date FROM finacle_upload_batch b WHERE b.batch_id = c.raw_batch_id)
+ WHERE c.source = 'FINACLE';
+UPDATE canonical_transactions c
+   SET mis_date = (SELECT b.mis_date FROM vendor_upload_batch b WHERE b.batch_id = c.raw_batch_id)
+ WHERE c.source = 'VENDOR';
+ALTER TABLE canonical_transactions MODIFY mis_date NOT NULL;
+
+ALTER TABLE finacle_raw_staging ADD mis_date DATE;
+UPDATE finacle_raw_staging s
+   SET mis_date = (SELECT b.mis_date FROM finacle_upload_batch b WHERE b.batch_id = s.batch_id);
+ALTER TABLE finacle_raw_staging MODIFY mis_date NOT NULL;
+
+ALTER TABLE vendor_raw_staging ADD mis_date DATE;
+UPDATE vendor_raw_staging s
+   SET mis_date = (SELECT b.mis_date FROM vendor_upload_batch b WHERE b.batch_id = s.batch_id);
+ALTER TABLE vendor_raw_staging MODIFY mis_date NOT NULL;
+COMMIT;
+
+-- 2. Interval partitions by month (online)
+ALTER TABLE canonical_transactions MODIFY
+  PARTITION BY RANGE (mis_date) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+  (PARTITION p_mis_initial VALUES LESS THAN (DATE '2024-01-01'))
+  ONLINE UPDATE INDEXES (idx_canonical_batch_source LOCAL);
+
+ALTER TABLE finacle_raw_staging MODIFY
+  PARTITION BY RANGE (mis_date) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+  (PARTITION p_mis_initial VALUES LESS THAN (DATE '2024-01-01'))
+  ONLINE UPDATE INDEXES;
+CREATE INDEX idx_finacle_staging_batch ON finacle_raw_staging (batch_id, row_number) LOCAL;
+
+ALTER TABLE vendor_raw_staging MODIFY
+  PARTITION BY RANGE (mis_date) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+  (PARTITION p_mis_initial VALUES LESS THAN (DATE '2024-01-01'))
+  ONLINE UPDATE INDEXES;
+CREATE INDEX idx_vendor_staging_batch ON vendor_raw_staging (batch_id, row_number) LOCAL;
+
+-- 3. Reference-partition remittance_entries. Online conversion doesn't cover reference
+--    partitioning, so the table is copied.
+CREATE TABLE remittance_entries_ref (
+  remittance_id       NUMBER PRIMARY KEY,
+  canonical_id        NUMBER NOT NULL,
+  source              VARCHAR2(10) NOT NULL,
+  status              VARCHAR2(20) NOT NULL,
+  rejection_reason    VARCHAR2(255),
+  created_by          VARCHAR2(50) NOT NULL,
+  created_date        DATE DEFAULT SYSDATE NOT NULL,
+  approved_by         VARCHAR2(50),
+  approved_date       DATE,
+  closed_date         DATE,
+  CONSTRAINT fk_remittance_canonical_ref FOREIGN KEY (canonical_id) REFERENCES canonical_transactions(canonical_id),
+  CONSTRAINT chk_remittance_status_ref CHECK (
+    status IN ('UPLOADED','VALIDATED','APPROVED','REJECTED','CLOSED')
+  )
+)
+PARTITION BY REFERENCE (fk_remittance_canonical_ref);
+
+INSERT /*+ APPEND */ INTO remittance_entries_ref SELECT
+  remittance_id, canonical_id, source, status, rejection_reason, created_by, created_date,
+  approved_by, approved_date, closed_date
+FROM remittance_entries;
+COMMIT;
+
+DROP TABLE remittance_entries;
+ALTER TABLE remittance_entries_ref RENAME TO remittance_entries;
+ALTER TABLE remittance_entries RENAME CONSTRAINT fk_remittance_canonical_ref TO fk_remittance_canonical;
+ALTER TABLE remittance_entries RENAME CONSTRAINT chk_remittance_status_ref TO chk_remittance_status;
+CREATE INDEX idx_remittance_canonical ON remittance_entries (canonical_id) LOCAL;
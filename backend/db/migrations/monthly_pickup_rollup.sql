@@ -0,0 +1,23 @@
+-- Migration: Add monthly_pickup_rollup (vendor pickups per MIS month, vendor, store,
+-- customer and pickup type), read by the charge engine instead of canonical_transactions.
+-- Fresh installs use schema.sql which already has the table.
+-- After running, populate it from existing data:
+--   python manage.py rebuild-rollups --from <YYYYMM> --to <YYYYMM>
+
+CREATE SEQUENCE seq_monthly_pickup_rollup START WITH 1 INCREMENT BY 1 NOCACHE;
+
+CREATE TABLE monthly_pickup_rollup (
+  rollup_id           NUMBER PRIMARY KEY,
+  month_key           VARCHAR2(6) NOT NULL,
+  vendor_id           NUMBER NOT NULL,
+  bank_store_code     VARCHAR2(30) NOT NULL,
+  customer_id         VARCHAR2(50),
+  pickup_type         VARCHAR2(10),
+  pickup_count        NUMBER NOT NULL,
+  pickup_amount       NUMBER(18,2) NOT NULL,
+  remittance_count    NUMBER NOT NULL,
+  remittance_amount   NUMBER(18,2) NOT NULL,
+  refreshed_at        DATE DEFAULT SYSDATE NOT NULL
+);
+
+CREATE INDEX idx_monthly_rollup_month_vendor ON monthly_pickup_rollup (month_key, vendor_id);
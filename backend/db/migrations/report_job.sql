@@ -0,0 +1,27 @@
+-- Migration: Background report jobs in the database instead of worker memory, so any
+-- worker can poll or download a job and the pending limit and dedup span all workers.
+-- Fresh installs use schema.sql which already has the tables.
+
+CREATE TABLE report_job (
+  job_id              VARCHAR2(32) PRIMARY KEY,
+  job_key             VARCHAR2(64) NOT NULL,
+  report              VARCHAR2(50) NOT NULL,
+  filename            VARCHAR2(255) NOT NULL,
+  status              VARCHAR2(10) NOT NULL,
+  row_count           NUMBER,
+  error_message       VARCHAR2(1000),
+  created_at          DATE NOT NULL,
+  heartbeat_at        DATE NOT NULL,
+  finished_at         DATE,
+  CONSTRAINT chk_report_job_status CHECK (status IN ('QUEUED','RUNNING','DONE','FAILED'))
+);
+
+CREATE INDEX idx_report_job_key ON report_job (job_key, status);
+CREATE INDEX idx_report_job_status ON report_job (status, finished_at);
+
+CREATE TABLE report_job_requester (
+  job_id              VARCHAR2(32) NOT NULL,
+  employee_id         VARCHAR2(50) NOT NULL,
+  CONSTRAINT pk_report_job_requester PRIMARY KEY (job_id, employee_id),
+  CONSTRAINT fk_report_job_requester FOREIGN KEY (job_id) REFERENCES report_job(job_id) ON DELETE CASCADE
+);
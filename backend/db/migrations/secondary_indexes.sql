@@ -0,0 +1,14 @@
+-- Migration: Secondary indexes for the predicates of the upload, reconciliation, report,
+-- store mapping and approval queries.
+-- Fresh installs use schema.sql which already has the indexes.
+-- ONLINE keeps the tables writable while the indexes build. Afterwards check the plans with:
+--   python manage.py check-plans
+
+CREATE INDEX idx_mapping_vendor_code_status ON vendor_store_mapping_master (vendor_id, vendor_store_code, status) ONLINE;
+CREATE INDEX idx_canonical_batch_source ON canonical_transactions (raw_batch_id, source) ONLINE;
+CREATE INDEX idx_canonical_source_pickup ON canonical_transactions (source, pickup_date) ONLINE;
+CREATE INDEX idx_remittance_canonical ON remittance_entries (canonical_id) ONLINE;
+CREATE INDEX idx_recon_mis_final_store ON reconciliation_results (mis_date, is_final, bank_store_code) ONLINE;
+CREATE INDEX idx_exception_recon_status ON exception_records (recon_id, status) ONLINE;
+CREATE INDEX idx_approval_status_maker ON approval_requests (status, maker_id) ONLINE;
+CREATE INDEX idx_corr_recon ON reconciliation_corrections (recon_id) ONLINE;
@@ -0,0 +1,15 @@
+-- Migration: Cache the sequences of the high-volume tables so bulk inserts and the
+-- application's block id reservations (id_allocator.py) don't update the data dictionary
+-- for every value. Ids remain unique; values cached when the instance stops are skipped.
+-- Fresh installs use schema.sql which already has the cached sequences.
+
+ALTER SEQUENCE seq_finacle_raw_staging CACHE 1000;
+ALTER SEQUENCE seq_vendor_raw_staging CACHE 1000;
+ALTER SEQUENCE seq_canonical_txn CACHE 1000;
+ALTER SEQUENCE seq_monthly_pickup_rollup CACHE 1000;
+ALTER SEQUENCE seq_reconciliation_result CACHE 1000;
+ALTER SEQUENCE seq_remittance_entry CACHE 1000;
+ALTER SEQUENCE seq_exception_record CACHE 1000;
+ALTER SEQUENCE seq_finacle_invalid_record CACHE 1000;
+ALTER SEQUENCE seq_vendor_invalid_record CACHE 1000;
+ALTER SEQUENCE seq_audit_log CACHE 1000;
@@ -0,0 +1,21 @@
+-- Migration: Index table for staging rows archived to files (staging_archive.py), and
+-- batch_id indexes on the invalid-record tables so per-batch archive and delete don't
+-- scan them.
+-- Fresh installs use schema.sql which already has the table and indexes.
+
+CREATE TABLE staging_archive (
+  source              VARCHAR2(10) NOT NULL,
+  batch_id            NUMBER NOT NULL,
+  mis_date            DATE NOT NULL,
+  file_path           VARCHAR2(500) NOT NULL,
+  staging_rows        NUMBER NOT NULL,
+  invalid_rows        NUMBER NOT NULL,
+  file_sha256         VARCHAR2(64) NOT NULL,
+  archived_by         VARCHAR2(50) NOT NULL,
+  archived_at         DATE DEFAULT SYSDATE NOT NULL,
+  CONSTRAINT pk_staging_archive PRIMARY KEY (source, batch_id),
+  CONSTRAINT chk_staging_archive_source CHECK (source IN ('FINACLE','VENDOR'))
+);
+
+CREATE INDEX idx_finacle_invalid_batch ON finacle_invalid_records (batch_id) ONLINE;
+CREATE INDEX idx_vendor_invalid_batch ON vendor_invalid_records (batch_id) ONLINE;
@@ -7,6 +7,8 @@
 -- =========================
 -- Sequences
 -- =========================
+-- High-volume tables (staging, canonical, reconciliation, audit) use cached sequences;
+-- the application also reserves their ids in blocks (id_allocator.py).
 CREATE SEQUENCE seq_bank_store_master START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_vendor_master START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_vendor_store_mapping START WITH 1 INCREMENT BY 1 NOCACHE;
@@ -17,19 +19,21 @@ CREATE SEQUENCE seq_waiver_master START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_vendor_file_format START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_finacle_upload_batch START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_vendor_upload_batch START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_finacle_raw_staging START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_vendor_raw_staging START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_canonical_txn START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_reconciliation_result START WITH 1 INCREMENT BY 1 NOCACHE;
+CREATE SEQUENCE seq_finacle_raw_staging START WITH 1 INCREMENT BY 1 CACHE 1000;
+CREATE SEQUENCE seq_vendor_raw_staging START WITH 1 INCREMENT BY 1 CACHE 1000;
+CREATE SEQUENCE seq_canonical_txn START WITH 1 INCREMENT BY 1 CACHE 1000;
+CREATE SEQUENCE seq_monthly_pickup_rollup START WITH 1 INCREMENT BY 1 CACHE 1000;
+CREATE SEQUENCE seq_reconciliation_result START WITH 1 INCREMENT BY 1 CACHE 1000;
 CREATE SEQUENCE seq_reconciliation_correction START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_remittance_entry START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_exception_record START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_finacle_invalid_record START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_vendor_invalid_record START WITH 1 INCREMENT BY 1 NOCACHE;
+CREATE SEQUENCE seq_remittance_entry START WITH 1 INCREMENT BY 1 CACHE 1000;
+CREATE SEQUENCE seq_exception_record START WITH 1 INCREMENT BY 1 CACHE 1000;
+CREATE SEQUENCE seq_finacle_invalid_record START WITH 1 INCREMENT BY 1 CACHE 1000;
+CREATE SEQUENCE seq_vendor_invalid_record START WITH 1 INCREMENT BY 1 CACHE 1000;
 CREATE SEQUENCE seq_user_account START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_approval_request START WITH 1 INCREMENT BY 1 NOCACHE;
-CREATE SEQUENCE seq_audit_log START WITH 1 INCREMENT BY 1 NOCACHE;
+CREATE SEQUENCE seq_audit_log START WITH 1 INCREMENT BY 1 CACHE 1000;
 CREATE SEQUENCE seq_month_lock START WITH 1 INCREMENT BY 1 NOCACHE;
+CREATE SEQUENCE seq_admin_cleanup_run START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_vendor_charge_summary START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_customer_charge_summary START WITH 1 INCREMENT BY 1 NOCACHE;
 CREATE SEQUENCE seq_customer_charge_slab START WITH 1 INCREMENT BY 1 NOCACHE;
@@ -87,6 +91,18 @@ CREATE TABLE user_account (
   CONSTRAINT chk_user_status CHECK (status IN ('ACTIVE','INACTIVE'))
 );
 
+-- Login tokens when AUTH_TOKEN_STORE=db (shared by all API workers)
+CREATE TABLE auth_token (
+  token_hash          VARCHAR2(64) PRIMARY KEY,
+  employee_id         VARCHAR2(50) NOT NULL,
+  full_name           VARCHAR2(150) NOT NULL,
+  role_code           VARCHAR2(20) NOT NULL,
+  issued_at           DATE DEFAULT SYSDATE NOT NULL,
+  last_seen_at        DATE DEFAULT SYSDATE NOT NULL
+);
+
+CREATE INDEX idx_auth_token_employee ON auth_token (employee_id);
+
 CREATE TABLE vendor_store_mapping_master (
   mapping_id          NUMBER PRIMARY KEY,
   vendor_id           NUMBER NOT NULL,
@@ -106,6 +122,8 @@ CREATE TABLE vendor_store_mapping_master (
   CONSTRAINT chk_mapping_status CHECK (status IN ('ACTIVE','INACTIVE'))
 );
 
+CREATE INDEX idx_mapping_vendor_code_status ON vendor_store_mapping_master (vendor_id, vendor_store_code, status);
+
 CREATE TABLE charge_configuration_master (
   config_id           NUMBER PRIMARY KEY,
   config_code         VARCHAR2(50) NOT NULL UNIQUE,
@@ -282,11 +300,16 @@ CREATE TABLE vendor_upload_batch (
 CREATE TABLE finacle_raw_staging (
   raw_id              NUMBER PRIMARY KEY,
   batch_id            NUMBER NOT NULL,
+  mis_date            DATE NOT NULL,
   row_number          NUMBER NOT NULL,
   row_payload         VARCHAR2(4000) NOT NULL,
   created_date        DATE DEFAULT SYSDATE NOT NULL,
   CONSTRAINT fk_finacle_raw_batch FOREIGN KEY (batch_id) REFERENCES finacle_upload_batch(batch_id)
-);
+)
+PARTITION BY RANGE (mis_date) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_mis_initial VALUES LESS THAN (DATE '2024-01-01'));
+
+CREATE INDEX idx_finacle_staging_batch ON finacle_raw_staging (batch_id, row_number) LOCAL;
 
 CREATE TABLE finacle_invalid_records (
   invalid_id          NUMBER PRIMARY KEY,
@@ -301,11 +324,16 @@ CREATE TABLE finacle_invalid_records (
 CREATE TABLE vendor_raw_staging (
   raw_id              NUMBER PRIMARY KEY,
   batch_id            NUMBER NOT NULL,
+  mis_date            DATE NOT NULL,
   row_number          NUMBER NOT NULL,
   row_payload         VARCHAR2(4000) NOT NULL,
   created_date        DATE DEFAULT SYSDATE NOT NULL,
   CONSTRAINT fk_vendor_raw_batch FOREIGN KEY (batch_id) REFERENCES vendor_upload_batch(batch_id)
-);
+)
+PARTITION BY RANGE (mis_date) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_mis_initial VALUES LESS THAN (DATE '2024-01-01'));
+
+CREATE INDEX idx_vendor_staging_batch ON vendor_raw_staging (batch_id, row_number) LOCAL;
 
 CREATE TABLE vendor_invalid_records (
   invalid_id          NUMBER PRIMARY KEY,
@@ -317,9 +345,30 @@ CREATE TABLE vendor_invalid_records (
   CONSTRAINT fk_vendor_invalid_batch FOREIGN KEY (batch_id) REFERENCES vendor_upload_batch(batch_id)
 );
 
+CREATE INDEX idx_finacle_invalid_batch ON finacle_invalid_records (batch_id);
+CREATE INDEX idx_vendor_invalid_batch ON vendor_invalid_records (batch_id);
+
+-- Batches whose staging and invalid rows were moved to compressed files by
+-- staging_archive.py; file_path is relative to STAGING_ARCHIVE_DIR
+CREATE TABLE staging_archive (
+  source              VARCHAR2(10) NOT NULL,
+  batch_id            NUMBER NOT NULL,
+  mis_date            DATE NOT NULL,
+  file_path           VARCHAR2(500) NOT NULL,
+  staging_rows        NUMBER NOT NULL,
+  invalid_rows        NUMBER NOT NULL,
+  file_sha256         VARCHAR2(64) NOT NULL,
+  archived_by         VARCHAR2(50) NOT NULL,
+  archived_at         DATE DEFAULT SYSDATE NOT NULL,
+  CONSTRAINT pk_staging_archive PRIMARY KEY (source, batch_id),
+  CONSTRAINT chk_staging_archive_source CHECK (source IN ('FINACLE','VENDOR'))
+);
+
 -- =========================
 -- Canonical Data Model
 -- =========================
+-- Transactions and staging rows carry their batch's mis_date and are partitioned by
+-- month on it; mis_partitions.py archives locked months by partition exchange or drop
 CREATE TABLE canonical_transactions (
   canonical_id        NUMBER PRIMARY KEY,
   source              VARCHAR2(10) NOT NULL,
@@ -333,11 +382,37 @@ CREATE TABLE canonical_transactions (
   remittance_amount   NUMBER(18,2),
   pickup_type         VARCHAR2(10),
   raw_batch_id        NUMBER NOT NULL,
+  mis_date            DATE NOT NULL,
   created_date        DATE DEFAULT SYSDATE NOT NULL,
   CONSTRAINT chk_canonical_source CHECK (source IN ('FINACLE','VENDOR')),
   CONSTRAINT chk_canonical_pickup_type CHECK (pickup_type IN ('BEAT','CALL'))
+)
+PARTITION BY RANGE (mis_date) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_mis_initial VALUES LESS THAN (DATE '2024-01-01'));
+
+CREATE INDEX idx_canonical_batch_source ON canonical_transactions (raw_batch_id, source) LOCAL;
+-- Global: pickup-date reports span MIS months, so a local index would probe every partition
+CREATE INDEX idx_canonical_source_pickup ON canonical_transactions (source, pickup_date);
+
+-- =========================
+-- Monthly Pickup Rollup
+-- =========================
+CREATE TABLE monthly_pickup_rollup (
+  rollup_id           NUMBER PRIMARY KEY,
+  month_key           VARCHAR2(6) NOT NULL,
+  vendor_id           NUMBER NOT NULL,
+  bank_store_code     VARCHAR2(30) NOT NULL,
+  customer_id         VARCHAR2(50),
+  pickup_type         VARCHAR2(10),
+  pickup_count        NUMBER NOT NULL,
+  pickup_amount       NUMBER(18,2) NOT NULL,
+  remittance_count    NUMBER NOT NULL,
+  remittance_amount   NUMBER(18,2) NOT NULL,
+  refreshed_at        DATE DEFAULT SYSDATE NOT NULL
 );
 
+CREATE INDEX idx_monthly_rollup_month_vendor ON monthly_pickup_rollup (month_key, vendor_id);
+
 -- =========================
 -- Remittance Entries
 -- =========================
@@ -356,7 +431,11 @@ CREATE TABLE remittance_entries (
   CONSTRAINT chk_remittance_status CHECK (
     status IN ('UPLOADED','VALIDATED','APPROVED','REJECTED','CLOSED')
   )
-);
+)
+-- Partitioned like its transaction, so exchanging or dropping a month cascades here
+PARTITION BY REFERENCE (fk_remittance_canonical);
+
+CREATE INDEX idx_remittance_canonical ON remittance_entries (canonical_id) LOCAL;
 
 -- =========================
 -- Reconciliation Results
@@ -380,6 +459,9 @@ CREATE TABLE reconciliation_results (
   )
 );
 
+-- bank_store_code is NOT NULL, so legacy rows with no mis_date are indexed too
+CREATE INDEX idx_recon_mis_final_store ON reconciliation_results (mis_date, is_final, bank_store_code);
+
 -- =========================
 -- Exception Records
 -- =========================
@@ -398,6 +480,8 @@ CREATE TABLE exception_records (
   CONSTRAINT chk_exception_status CHECK (status IN ('OPEN','RESOLVED','ESCALATED'))
 );
 
+CREATE INDEX idx_exception_recon_status ON exception_records (recon_id, status);
+
 -- =========================
 -- Maker-Checker Approvals
 -- =========================
@@ -418,6 +502,8 @@ CREATE TABLE approval_requests (
   CONSTRAINT chk_approval_status CHECK (status IN ('PENDING','APPROVED','REJECTED','CLARIFICATION'))
 );
 
+CREATE INDEX idx_approval_status_maker ON approval_requests (status, maker_id);
+
 -- =========================
 -- Reconciliation Corrections
 -- =========================
@@ -436,6 +522,8 @@ CREATE TABLE reconciliation_corrections (
   CONSTRAINT chk_corr_status CHECK (status IN ('PENDING','APPROVED','REJECTED'))
 );
 
+CREATE INDEX idx_corr_recon ON reconciliation_corrections (recon_id);
+
 -- =========================
 -- Audit Logs
 -- =========================
@@ -448,7 +536,14 @@ CREATE TABLE audit_log (
   new_data            VARCHAR2(4000),
   changed_by          VARCHAR2(50) NOT NULL,
   changed_at          DATE DEFAULT SYSDATE NOT NULL
-);
+)
+-- One partition per month; retention drops whole partitions (manage.py audit-retention)
+PARTITION BY RANGE (changed_at) INTERVAL (NUMTOYMINTERVAL(1, 'MONTH'))
+(PARTITION p_audit_initial VALUES LESS THAN (DATE '2024-01-01'));
+
+CREATE INDEX idx_audit_log_changed_at ON audit_log (changed_at) LOCAL;
+CREATE INDEX idx_audit_log_entity ON audit_log (entity_type, entity_id) LOCAL;
+CREATE INDEX idx_audit_log_changed_by ON audit_log (changed_by) LOCAL;
 
 -- =========================
 -- Month End Lock
@@ -462,6 +557,73 @@ CREATE TABLE month_lock (
   CONSTRAINT chk_month_lock_status CHECK (status IN ('OPEN','LOCKED'))
 );
 
+-- =========================
+-- Data Version
+-- =========================
+-- Single-row stamp of report data, bumped after each committed write to it
+-- (data_version.py); report result keys include it
+CREATE TABLE data_version (
+  version_id          NUMBER PRIMARY KEY,
+  version             NUMBER NOT NULL,
+  updated_at          DATE DEFAULT SYSDATE NOT NULL
+);
+
+INSERT INTO data_version (version_id, version) VALUES (1, 0);
+
+-- =========================
+-- Report Jobs
+-- =========================
+-- Background report jobs (report_jobs.py), shared by every API worker; the .xlsx
+-- artifacts live in REPORT_ARTIFACT_DIR
+CREATE TABLE report_job (
+  job_id              VARCHAR2(32) PRIMARY KEY,
+  job_key             VARCHAR2(64) NOT NULL,
+  report              VARCHAR2(50) NOT NULL,
+  filename            VARCHAR2(255) NOT NULL,
+  status              VARCHAR2(10) NOT NULL,
+  row_count           NUMBER,
+  error_message       VARCHAR2(1000),
+  created_at          DATE NOT NULL,
+  heartbeat_at        DATE NOT NULL,
+  finished_at         DATE,
+  CONSTRAINT chk_report_job_status CHECK (status IN ('QUEUED','RUNNING','DONE','FAILED'))
+);
+
+CREATE INDEX idx_report_job_key ON report_job (job_key, status);
+CREATE INDEX idx_report_job_status ON report_job (status, finished_at);
+
+CREATE TABLE report_job_requester (
+  job_id              VARCHAR2(32) NOT NULL,
+  employee_id         VARCHAR2(50) NOT NULL,
+  CONSTRAINT pk_report_job_requester PRIMARY KEY (job_id, employee_id),
+  CONSTRAINT fk_report_job_requester FOREIGN KEY (job_id) REFERENCES report_job(job_id) ON DELETE CASCADE
+);
+
+-- =========================
+-- Admin Cleanup Runs
+-- =========================
+-- Progress of admin cleanup/reset (cleanup_engine.py), committed with each deleted chunk
+-- so an interrupted run resumes where it stopped; kept by reset-all
+CREATE TABLE admin_cleanup_run (
+  run_id              NUMBER PRIMARY KEY,
+  kind                VARCHAR2(20) NOT NULL,
+  targets             VARCHAR2(500),
+  reason              VARCHAR2(500),
+  requested_by        VARCHAR2(50) NOT NULL,
+  status              VARCHAR2(20) NOT NULL,
+  progress            VARCHAR2(4000) NOT NULL,
+  current_table       VARCHAR2(128),
+  error_message       VARCHAR2(1000),
+  started_at          DATE DEFAULT SYSDATE NOT NULL,
+  updated_at          DATE,
+  finished_at         DATE,
+  CONSTRAINT chk_cleanup_run_kind CHECK (kind IN ('CLEANUP','RESET_ALL')),
+  CONSTRAINT chk_cleanup_run_status CHECK (status IN ('RUNNING','FAILED','COMPLETED'))
+);
+
+-- At most one RUNNING run
+CREATE UNIQUE INDEX ux_cleanup_run_running ON admin_cleanup_run (CASE WHEN status = 'RUNNING' THEN 'RUNNING' END);
+
 -- =============================================================================
 -- Optional Seed Data (uncomment as needed)
 -- =============================================================================
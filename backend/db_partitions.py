@@ -0,0 +1,50 @@
+"""
+Helpers for the month-partitioned tables: audit_log (audit_retention.py) and the MIS-date
+tables (mis_partitions.py).
+"""
+
+import re
+from datetime import date
+
+from sqlalchemy import text
+
+_HIGH_VALUE_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_key_of(day: date) -> str:
+    return f"{day.year}{day.month:02d}"
+
+
+def retention_cutoff(keep_months: int, today: date | None = None) -> date:
+    """First day kept: the current month plus the keep_months - 1 before it are retained."""
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1")
+    today = today or date.today()
+    return add_months(today.replace(day=1), -(keep_months - 1))
+
+
+def table_partitions(db, table: str):
+    """[(name, high_value_date, is_interval)] of a range-partitioned table, or None if it isn't."""
+    if db.bind.dialect.name != "oracle":
+        return None
+    rows = db.execute(
+        text(
+            "SELECT partition_name, high_value, interval FROM user_tab_partitions "
+            "WHERE table_name = :table ORDER BY partition_position"
+        ),
+        {"table": table.upper()},
+    ).all()
+    if not rows:
+        return None
+    partitions = []
+    for name, high_value, interval in rows:
+        match = _HIGH_VALUE_DATE.search(high_value or "")
+        if match is None:  # MAXVALUE
+            continue
+        partitions.append((name, date(*map(int, match.groups())), interval == "YES"))
+    return partitions
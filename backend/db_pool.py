@@ -0,0 +1,165 @@
+"""
+Connection pool instrumentation. MeteredQueuePool is SQLAlchemy's QueuePool timing how
+long each checkout waits for a free connection; pool_stats() combines that with the
+pool's own counters for /api/health/pool.
+
+CheckoutTracker records who checked each connection out (the request's route, via
+ConnectionOwnerMiddleware, or the thread name for background work) and logs and counts
+connections held longer than DB_HOLD_WARN_SEC.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+WAIT_SAMPLES = 500
+DB_HOLD_WARN_SEC = float(os.getenv("DB_HOLD_WARN_SEC", "30"))
+
+_request_scope: ContextVar = ContextVar("db_request_scope", default=None)
+
+
+class MeteredQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self._waits_ms = deque(maxlen=WAIT_SAMPLES)
+        self._checkouts = 0
+        self._timeouts = 0
+        self._peak_checked_out = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            with self._metrics_lock:
+                self._timeouts += 1
+            raise
+        waited_ms = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            self._checkouts += 1
+            self._waits_ms.append(waited_ms)
+            self._peak_checked_out = max(self._peak_checked_out, self.checkedout())
+        return conn
+
+    def wait_stats(self) -> dict:
+        with self._metrics_lock:
+            waits = sorted(self._waits_ms)
+            stats = {
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "peak_checked_out": self._peak_checked_out,
+            }
+        stats["wait_ms"] = {"samples": len(waits)}
+        if waits:
+            stats["wait_ms"].update(
+                avg=round(sum(waits) / len(waits), 2),
+                p95=round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2),
+                max=round(waits[-1], 2),
+            )
+        return stats
+
+
+class ConnectionOwnerMiddleware:
+    """ASGI middleware exposing the current request to CheckoutTracker."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+
+def _owner() -> str:
+    scope = _request_scope.get()
+    if scope is None:
+        return f"thread:{threading.current_thread().name}"
+    # The router stores the matched route in the scope, so ids in the path don't split counts
+    route = scope.get("route")
+    return f"{scope.get('method')} {getattr(route, 'path', None) or scope.get('path')}"
+
+
+class CheckoutTracker:
+    def __init__(self, hold_warn_sec: float = DB_HOLD_WARN_SEC):
+        self.hold_warn_sec = hold_warn_sec
+        self._lock = threading.Lock()
+        # id(connection record) -> (checked out at, owner)
+        self._held: dict[int, tuple[float, str]] = {}
+        self._long_held = Counter()
+
+    def attach(self, engine):
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self._held[id(connection_record)] = (time.monotonic(), _owner())
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            entry = self._held.pop(id(connection_record), None)
+        if entry is None:
+            return
+        held_sec = time.monotonic() - entry[0]
+        if held_sec > self.hold_warn_sec:
+            with self._lock:
+                self._long_held[entry[1]] += 1
+            logger.warning("DB connection held %.1fs by %s", held_sec, entry[1])
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            held = list(self._held.values())
+            long_held = dict(self._long_held)
+        return {
+            "hold_warn_sec": self.hold_warn_sec,
+            "long_held_total": sum(long_held.values()),
+            "long_held_by_owner": long_held,
+            "held_now": sorted(
+                ({"owner": owner, "held_sec": round(now - started, 1)} for started, owner in held),
+                key=lambda item: -item["held_sec"],
+            ),
+        }
+
+
+checkout_tracker = CheckoutTracker()
+
+
+def pool_stats(engine) -> dict:
+    """Current occupancy plus checkout wait statistics (recent samples) of engine's pool."""
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        size = pool.size()
+        max_overflow = pool._max_overflow
+        checked_out = pool.checkedout()
+        stats.update(
+            size=size,
+            max_overflow=max_overflow,
+            checked_in=pool.checkedin(),
+            checked_out=checked_out,
+            # Negative while the pool is still filling up to `size`
+            overflow=pool.overflow(),
+            timeout_sec=pool.timeout(),
+            saturated=max_overflow >= 0 and checked_out >= size + max_overflow,
+        )
+    if isinstance(pool, MeteredQueuePool):
+        stats.update(pool.wait_stats())
+    stats["checkouts_held"] = checkout_tracker.stats()
+    return stats
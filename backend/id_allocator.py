@@ -0,0 +1,83 @@
+"""
+Client-side primary keys for bulk inserts. Each IdAllocator reserves a block of
+ID_BLOCK_SIZE values from its table's sequence in one round trip and hands them out from
+memory, so uploads and rollups can give thousands of rows their keys without a sequence
+fetch or flush per row, and the ORM inserts them in batches.
+
+Sequences are not transactional: ids reserved but unused (rolled back, or still in the
+block at shutdown) leave gaps, as Oracle's own sequence cache does.
+"""
+
+import os
+import threading
+from collections import deque
+
+from sqlalchemy import Sequence, inspect, select, text
+
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "500"))
+
+
+class IdAllocator:
+    def __init__(self, sequence: Sequence, block_size: int = ID_BLOCK_SIZE):
+        self.sequence = sequence
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._free = deque()
+
+    def _reserve(self, db, count: int) -> list[int]:
+        if db.bind.dialect.name == "oracle":
+            rows = db.execute(
+                text(f"SELECT {self.sequence.name}.NEXTVAL FROM dual CONNECT BY LEVEL <= :count"),
+                {"count": count},
+            )
+            return [int(row[0]) for row in rows]
+        return [int(db.scalar(select(self.sequence.next_value()))) for _ in range(count)]
+
+    def take(self, db, count: int) -> list[int]:
+        """count unused ids, reserving another block from the sequence when needed."""
+        with self._lock:
+            if len(self._free) < count:
+                self._free.extend(self._reserve(db, max(self.block_size, count - len(self._free))))
+            return [self._free.popleft() for _ in range(count)]
+
+
+_allocators: dict[str, IdAllocator] = {}
+_allocators_lock = threading.Lock()
+
+
+def _allocator(mapper):
+    pk = mapper.primary_key[0]
+    if not isinstance(pk.default, Sequence):
+        return None, pk
+    with _allocators_lock:
+        allocator = _allocators.get(pk.default.name)
+        if allocator is None:
+            allocator = _allocators[pk.default.name] = IdAllocator(pk.default)
+    return allocator, pk
+
+
+def add_with_ids(db, objects) -> list:
+    """
+    Add objects to the session with their sequence primary keys already assigned. On
+    databases without sequences (SQLite in development) they are flushed instead so the
+    database assigns the keys; either way every object has its id on return.
+    """
+    objects = list(objects)
+    if not objects:
+        return objects
+    if not db.bind.dialect.supports_sequences:
+        db.add_all(objects)
+        db.flush()
+        return objects
+    by_mapper = {}
+    for obj in objects:
+        by_mapper.setdefault(inspect(obj).mapper, []).append(obj)
+    for mapper, group in by_mapper.items():
+        allocator, pk = _allocator(mapper)
+        attr = mapper.get_property_by_column(pk).key
+        missing = [obj for obj in group if getattr(obj, attr) is None]
+        if allocator is not None and missing:
+            for obj, new_id in zip(missing, allocator.take(db, len(missing))):
+                setattr(obj, attr, new_id)
+    db.add_all(objects)
+    return objects
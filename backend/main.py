@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -5,11 +6,15 @@ from dotenv import load_dotenv
 # Load .env from backend/ so AD_SKIP, AD_* etc. are available
 load_dotenv(Path(__file__).resolve().parent / ".env")
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 
-from db import SessionLocal
+from ad_login import ad_metrics
+from audit import shutdown_audit_writer
+from auth import AuthUser, require_roles, token_stats
+from db import SessionLocal, engine
+from db_pool import ConnectionOwnerMiddleware, pool_stats
 from routes_vendor_file_format import router as vendor_file_format_router
 from routes_uploads import router as uploads_router
 from routes_store_mapping import router as store_mapping_router
@@ -31,9 +36,17 @@ from routes_customer_charge_slabs import router as customer_charge_slabs_router
 from routes_exceptions import router as exceptions_router
 from routes_admin import router as admin_router
 from routes_users import router as users_router
+from routes_audit import router as audit_router
 
 
-app = FastAPI(title="Doorstep Banking Application")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Write out audit entries still queued by read endpoints
+    shutdown_audit_writer()
+
+
+app = FastAPI(title="Doorstep Banking Application", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -44,7 +57,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(ConnectionOwnerMiddleware)
 
 app.include_router(vendor_file_format_router)
 app.include_router(uploads_router)
@@ -67,6 +82,7 @@ app.include_router(customer_charge_slabs_router)
 app.include_router(exceptions_router)
 app.include_router(admin_router)
 app.include_router(users_router)
+app.include_router(audit_router)
 
 
 @app.get("/api/health")
@@ -74,6 +90,18 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/api/health/tokens")
+def health_check_tokens(user: AuthUser = Depends(require_roles("ADMIN"))):
+    """Login token store size and issue/expiry counters of this worker."""
+    return {"status": "ok", **token_stats()}
+
+
+@app.get("/api/health/ad")
+def health_check_ad(user: AuthUser = Depends(require_roles("ADMIN"))):
+    """AD login client: circuit breaker state, call counts and latency of this worker."""
+    return {"status": "ok", **ad_metrics()}
+
+
 @app.get("/api/health/db")
 def health_check_db():
     db = SessionLocal()
@@ -87,3 +115,10 @@ def health_check_db():
         ) from exc
     finally:
         db.close()
+
+
+@app.get("/api/health/pool")
+def health_check_pool(user: AuthUser = Depends(require_roles("ADMIN"))):
+    """DB connection pool occupancy and checkout wait times of this worker."""
+    stats = pool_stats(engine)
+    return {"status": "saturated" if stats.get("saturated") else "ok", **stats}
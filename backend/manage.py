@@ -0,0 +1,222 @@
+"""
+Operational commands. Run from backend/:
+
+    python manage.py compute-charges --from 202401 --to 202412
+    python manage.py rebuild-rollups --from 202401 --to 202412
+    python manage.py freeze-reports --month 202401
+    python manage.py audit-retention --keep-months 12
+    python manage.py check-plans
+    python manage.py archive-partitions --keep-months 24 --method exchange
+    python manage.py archive-staging --older-than-days 90
+    python manage.py resume-cleanup
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Same .env as the API so DB and feature settings match
+load_dotenv(Path(__file__).resolve().parent / ".env")
+
+from fastapi import HTTPException
+
+
+def _compute_charges(args) -> int:
+    import charge_engine
+
+    kinds = ("VENDOR", "CUSTOMER") if args.kind == "both" else (args.kind.upper(),)
+    months = charge_engine.compute_charges_for_range(
+        args.month_from,
+        args.month_to,
+        args.computed_by,
+        kinds=kinds,
+        max_workers=args.workers,
+    )
+    print(json.dumps(months, indent=2, default=str))
+    return 1 if any(m["status"] == "failed" for m in months) else 0
+
+
+def _rebuild_rollups(args) -> int:
+    import charge_engine
+    import rollups
+
+    months = rollups.rebuild_range(charge_engine.month_range(args.month_from, args.month_to))
+    print(json.dumps(months, indent=2))
+    return 0
+
+
+def _freeze_reports(args) -> int:
+    import report_snapshots
+    import routes_reports  # noqa: F401 - registers the month reports
+
+    manifest = report_snapshots.freeze_month(args.month, args.frozen_by)
+    if manifest is None:
+        print(f"error: month {args.month} is not locked", file=sys.stderr)
+        return 1
+    print(json.dumps({"month_key": args.month, "reports": len(manifest["reports"])}, indent=2))
+    return 0
+
+
+def _audit_retention(args) -> int:
+    import audit_retention
+
+    keep_months = audit_retention.AUDIT_RETENTION_MONTHS if args.keep_months is None else args.keep_months
+    months = audit_retention.apply_retention(
+        keep_months=keep_months,
+        archive=not args.no_archive,
+        dry_run=args.dry_run,
+        archive_dir=args.archive_dir,
+        run_by=args.run_by,
+    )
+    print(json.dumps(months, indent=2))
+    return 0
+
+
+def _archive_partitions(args) -> int:
+    import mis_partitions
+
+    keep_months = mis_partitions.MIS_RETENTION_MONTHS if args.keep_months is None else args.keep_months
+    months = mis_partitions.archive_months(
+        keep_months=keep_months,
+        method=args.method,
+        dry_run=args.dry_run,
+        run_by=args.run_by,
+    )
+    print(json.dumps(months, indent=2))
+    return 0
+
+
+def _archive_staging(args) -> int:
+    import staging_archive
+
+    older_than_days = (
+        staging_archive.STAGING_ARCHIVE_AFTER_DAYS if args.older_than_days is None else args.older_than_days
+    )
+    batches = staging_archive.archive_staging(
+        older_than_days=older_than_days,
+        dry_run=args.dry_run,
+        run_by=args.run_by,
+    )
+    print(json.dumps(batches, indent=2))
+    return 1 if any("error" in b for b in batches) else 0
+
+
+def _resume_cleanup(args) -> int:
+    import cleanup_engine
+    from db import SessionLocal
+    from models import AdminCleanupRun
+
+    run_id = args.run_id
+    if run_id is None:
+        db = SessionLocal()
+        try:
+            run = (
+                db.query(AdminCleanupRun)
+                .filter(AdminCleanupRun.status != "COMPLETED")
+                .order_by(AdminCleanupRun.run_id.desc())
+                .first()
+            )
+        finally:
+            db.close()
+        if run is None:
+            print("No unfinished cleanup run")
+            return 0
+        run_id = int(run.run_id)
+    kwargs = {} if args.chunk_rows is None else {"chunk_rows": args.chunk_rows}
+    result = cleanup_engine.resume(run_id, **kwargs)
+    print(json.dumps(result, indent=2, default=str))
+    return 0 if result["status"] == "COMPLETED" else 1
+
+
+def _check_plans(args) -> int:
+    import query_plans
+
+    results = query_plans.check_plans(args.check or None)
+    print(json.dumps(results, indent=2))
+    return 1 if any(not r["ok"] for r in results) else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="manage.py", description="Doorstep Banking operational commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    charges = sub.add_parser("compute-charges", help="Compute vendor/customer charges for a month range")
+    charges.add_argument("--from", dest="month_from", required=True, help="First month (YYYYMM)")
+    charges.add_argument("--to", dest="month_to", required=True, help="Last month (YYYYMM)")
+    charges.add_argument("--kind", choices=("vendor", "customer", "both"), default="both")
+    charges.add_argument("--workers", type=int, default=None, help="Parallel months (default CHARGE_BATCH_WORKERS)")
+    charges.add_argument("--computed-by", default="SYSTEM", help="Recorded as computed_by / audit user")
+    charges.set_defaults(handler=_compute_charges)
+
+    rebuild = sub.add_parser("rebuild-rollups", help="Rebuild monthly pickup rollups for a month range")
+    rebuild.add_argument("--from", dest="month_from", required=True, help="First month (YYYYMM)")
+    rebuild.add_argument("--to", dest="month_to", required=True, help="Last month (YYYYMM)")
+    rebuild.set_defaults(handler=_rebuild_rollups)
+
+    freeze = sub.add_parser("freeze-reports", help="(Re)build the report snapshot of a locked month")
+    freeze.add_argument("--month", required=True, help="Locked month (YYYYMM)")
+    freeze.add_argument("--frozen-by", default="SYSTEM", help="Recorded in the snapshot manifest")
+    freeze.set_defaults(handler=_freeze_reports)
+
+    retention = sub.add_parser("audit-retention", help="Archive and drop audit_log months past retention")
+    retention.add_argument(
+        "--keep-months", type=int, default=None, help="Months kept, current included (default AUDIT_RETENTION_MONTHS)"
+    )
+    retention.add_argument("--archive-dir", default=None, help="Archive directory (default AUDIT_ARCHIVE_DIR)")
+    retention.add_argument("--no-archive", action="store_true", help="Drop without writing archive files")
+    retention.add_argument("--dry-run", action="store_true", help="Only list the months that would be removed")
+    retention.add_argument("--run-by", default="SYSTEM", help="Recorded as the audit user")
+    retention.set_defaults(handler=_audit_retention)
+
+    partitions = sub.add_parser(
+        "archive-partitions", help="Exchange or drop canonical transaction partitions of locked months past retention"
+    )
+    partitions.add_argument(
+        "--keep-months", type=int, default=None, help="Months kept, current included (default MIS_RETENTION_MONTHS)"
+    )
+    partitions.add_argument(
+        "--method", choices=("exchange", "drop"), default="exchange", help="exchange keeps each month as a table"
+    )
+    partitions.add_argument("--dry-run", action="store_true", help="Only list the partitions that would go")
+    partitions.add_argument("--run-by", default="SYSTEM", help="Recorded as the audit user")
+    partitions.set_defaults(handler=_archive_partitions)
+
+    staging = sub.add_parser(
+        "archive-staging", help="Move staging and invalid rows of old or locked-month batches to archive files"
+    )
+    staging.add_argument(
+        "--older-than-days",
+        type=int,
+        default=None,
+        help="Archive batches with an older MIS date (default STAGING_ARCHIVE_AFTER_DAYS); locked months always",
+    )
+    staging.add_argument("--dry-run", action="store_true", help="Only list the batches that would be archived")
+    staging.add_argument("--run-by", default="SYSTEM", help="Recorded as the audit user")
+    staging.set_defaults(handler=_archive_staging)
+
+    cleanup = sub.add_parser("resume-cleanup", help="Resume an interrupted admin cleanup or reset-all run")
+    cleanup.add_argument("--run-id", type=int, default=None, help="Run to resume (default the latest unfinished)")
+    cleanup.add_argument(
+        "--chunk-rows", type=int, default=None, help="Rows deleted per commit (default ADMIN_CLEANUP_CHUNK_ROWS)"
+    )
+    cleanup.set_defaults(handler=_resume_cleanup)
+
+    plans = sub.add_parser("check-plans", help="Check the hot endpoint queries still use their indexes")
+    plans.add_argument("--check", action="append", help="Only this check (repeatable; default all)")
+    plans.set_defaults(handler=_check_plans)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        return args.handler(args)
+    except HTTPException as exc:
+        print(f"error: {exc.detail}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
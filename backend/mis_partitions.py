@@ -0,0 +1,128 @@
+"""
+MIS-date partitions. canonical_transactions, finacle_raw_staging and vendor_raw_staging carry
+their batch's mis_date and are interval-partitioned by month on it; remittance_entries is
+reference-partitioned on canonical_transactions, so its rows follow their transaction (see
+db/schema.sql). Queries that know the batch filter on mis_date so only one partition is
+read, whatever the table's age.
+
+archive_months() takes locked months older than MIS_RETENTION_MONTHS out of
+canonical_transactions (MIS_ARCHIVED_TABLES) without deleting rows:
+
+- exchange (default): each month partition is swapped with an empty table named
+  <table>_<YYYYMM>, which keeps the data for export, and the emptied partition is dropped.
+  canonical_transactions is exchanged together with its remittance_entries partition.
+- drop: the partitions are dropped, remittance entries included.
+
+The staging partitions are left alone: the upload preview and download endpoints read a
+batch's staging rows until staging_archive.py moves them, batch by batch, to the batch's
+archive file.
+
+Needs Oracle 12.2+ and db/migrations/mis_date_partitioning.sql on existing databases. Run via
+`manage.py archive-partitions`.
+"""
+
+import logging
+import os
+from datetime import timedelta
+
+from sqlalchemy import text
+
+from audit import log_audit
+from db import SessionLocal
+from db_partitions import month_key_of, retention_cutoff, table_partitions
+from models import MonthLock
+
+logger = logging.getLogger(__name__)
+
+MIS_RETENTION_MONTHS = int(os.getenv("MIS_RETENTION_MONTHS", "24"))
+MIS_ARCHIVED_TABLES = ("canonical_transactions",)
+ARCHIVE_METHODS = ("exchange", "drop")
+
+
+def _archive_table(table: str, month_key: str) -> str:
+    return f"{table}_{month_key}"
+
+
+def _exchange(db, table: str, partition: str, month_key: str) -> str:
+    archive = _archive_table(table, month_key)
+    db.execute(text(f"CREATE TABLE {archive} FOR EXCHANGE WITH TABLE {table}"))
+    cascade = ""
+    if table == "canonical_transactions":
+        # The exchange table needs the same parent/child shape as the live pair
+        child = _archive_table("remittance_entries", month_key)
+        db.execute(text(f"ALTER TABLE {archive} ADD CONSTRAINT pk_{archive} PRIMARY KEY (canonical_id)"))
+        db.execute(text(f"CREATE TABLE {child} FOR EXCHANGE WITH TABLE remittance_entries"))
+        db.execute(
+            text(
+                f"ALTER TABLE {child} ADD CONSTRAINT fk_{child} "
+                f"FOREIGN KEY (canonical_id) REFERENCES {archive} (canonical_id)"
+            )
+        )
+        cascade = " CASCADE"
+    db.execute(
+        text(
+            f'ALTER TABLE {table} EXCHANGE PARTITION "{partition}" WITH TABLE {archive}'
+            f"{cascade} WITHOUT VALIDATION UPDATE GLOBAL INDEXES"
+        )
+    )
+    return archive
+
+
+def archive_months(
+    keep_months: int = MIS_RETENTION_MONTHS,
+    method: str = "exchange",
+    dry_run: bool = False,
+    run_by: str = "SYSTEM",
+) -> list[dict]:
+    """
+    Exchange or drop the MIS partitions of locked months before the retention window, one
+    month and table at a time. Unlocked months are skipped. dry_run only lists them.
+    """
+    if method not in ARCHIVE_METHODS:
+        raise ValueError(f"method must be one of {', '.join(ARCHIVE_METHODS)}")
+    cutoff = retention_cutoff(keep_months)
+    results = []
+    db = SessionLocal()
+    try:
+        locked = {row[0] for row in db.query(MonthLock.month_key).filter(MonthLock.status == "LOCKED").all()}
+        for table in MIS_ARCHIVED_TABLES:
+            partitions = table_partitions(db, table)
+            if partitions is None:
+                logger.warning("%s is not partitioned; run db/migrations/mis_date_partitioning.sql", table)
+                continue
+            for name, high_value, is_interval in partitions:
+                if high_value > cutoff:
+                    break
+                month_key = month_key_of(high_value - timedelta(days=1))
+                if not is_interval:
+                    # The range partition anchoring the interval can't be dropped
+                    logger.info("Keeping range partition %s of %s", name, table)
+                    continue
+                entry = {"table": table, "month_key": month_key, "partition": name, "method": method.upper()}
+                if month_key not in locked:
+                    entry["skipped"] = "month not locked"
+                elif not dry_run:
+                    if method == "exchange":
+                        entry["archive_table"] = _exchange(db, table, name, month_key)
+                    db.execute(text(f'ALTER TABLE {table} DROP PARTITION "{name}" UPDATE GLOBAL INDEXES'))
+                    logger.info("Archived %s partition %s (%s) by %s", table, name, month_key, method)
+                results.append(entry)
+        archived = [entry for entry in results if "skipped" not in entry]
+        if archived and not dry_run:
+            log_audit(
+                db,
+                "MIS_PARTITIONS",
+                None,
+                "ARCHIVE",
+                None,
+                {
+                    "cutoff": cutoff,
+                    "method": method,
+                    "partitions": [f"{entry['table']}:{entry['month_key']}" for entry in archived],
+                },
+                run_by,
+            )
+            db.commit()
+    finally:
+        db.close()
+    return results
@@ -4,9 +4,11 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Sequence,
     String,
     Text,
+    case,
     func,
 )
 from sqlalchemy.orm import relationship
@@ -80,6 +82,20 @@ class UserAccount(Base):
     )
 
 
+class AuthToken(Base):
+    __tablename__ = "auth_token"
+
+    # sha256 of the bearer token
+    token_hash = Column(String(64), primary_key=True)
+    employee_id = Column(String(50), nullable=False)
+    full_name = Column(String(150), nullable=False)
+    role_code = Column(String(20), nullable=False)
+    issued_at = Column(DateTime, server_default=func.now(), nullable=False)
+    last_seen_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index("idx_auth_token_employee", "employee_id"),)
+
+
 class VendorStoreMappingMaster(Base):
     __tablename__ = "vendor_store_mapping_master"
 
@@ -100,6 +116,7 @@ class VendorStoreMappingMaster(Base):
 
     __table_args__ = (
         CheckConstraint("status IN ('ACTIVE','INACTIVE')", name="chk_mapping_status"),
+        Index("idx_mapping_vendor_code_status", "vendor_id", "vendor_store_code", "status"),
     )
 
 
@@ -306,10 +323,14 @@ class FinacleRawStaging(Base):
 
     raw_id = Column(Number, Sequence("seq_finacle_raw_staging"), primary_key=True)
     batch_id = Column(Number, ForeignKey("finacle_upload_batch.batch_id"), nullable=False)
+    # Copied from the batch; the table is partitioned by month on it
+    mis_date = Column(Date, nullable=False)
     row_number = Column(Number, nullable=False)
     row_payload = Column(String(4000), nullable=False)
     created_date = Column(DateTime, server_default=func.now(), nullable=False)
 
+    __table_args__ = (Index("idx_finacle_staging_batch", "batch_id", "row_number"),)
+
 
 class FinacleInvalidRecord(Base):
     __tablename__ = "finacle_invalid_records"
@@ -321,16 +342,22 @@ class FinacleInvalidRecord(Base):
     row_payload = Column(String(4000), nullable=False)
     created_date = Column(DateTime, server_default=func.now(), nullable=False)
 
+    __table_args__ = (Index("idx_finacle_invalid_batch", "batch_id"),)
+
 
 class VendorRawStaging(Base):
     __tablename__ = "vendor_raw_staging"
 
     raw_id = Column(Number, Sequence("seq_vendor_raw_staging"), primary_key=True)
     batch_id = Column(Number, ForeignKey("vendor_upload_batch.batch_id"), nullable=False)
+    # Copied from the batch; the table is partitioned by month on it
+    mis_date = Column(Date, nullable=False)
     row_number = Column(Number, nullable=False)
     row_payload = Column(String(4000), nullable=False)
     created_date = Column(DateTime, server_default=func.now(), nullable=False)
 
+    __table_args__ = (Index("idx_vendor_staging_batch", "batch_id", "row_number"),)
+
 
 class VendorInvalidRecord(Base):
     __tablename__ = "vendor_invalid_records"
@@ -342,6 +369,29 @@ class VendorInvalidRecord(Base):
     row_payload = Column(String(4000), nullable=False)
     created_date = Column(DateTime, server_default=func.now(), nullable=False)
 
+    __table_args__ = (Index("idx_vendor_invalid_batch", "batch_id"),)
+
+
+class StagingArchive(Base):
+    """A batch whose staging and invalid rows staging_archive.py moved to a file."""
+
+    __tablename__ = "staging_archive"
+
+    source = Column(String(10), primary_key=True)
+    batch_id = Column(Number, primary_key=True)
+    mis_date = Column(Date, nullable=False)
+    # Relative to STAGING_ARCHIVE_DIR
+    file_path = Column(String(500), nullable=False)
+    staging_rows = Column(Number, nullable=False)
+    invalid_rows = Column(Number, nullable=False)
+    file_sha256 = Column(String(64), nullable=False)
+    archived_by = Column(String(50), nullable=False)
+    archived_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        CheckConstraint("source IN ('FINACLE','VENDOR')", name="chk_staging_archive_source"),
+    )
+
 
 class CanonicalTransaction(Base):
     __tablename__ = "canonical_transactions"
@@ -358,14 +408,39 @@ class CanonicalTransaction(Base):
     remittance_amount = Column(Number(18, 2))
     pickup_type = Column(String(10))
     raw_batch_id = Column(Number, nullable=False)
+    # Copied from the batch; the table is partitioned by month on it
+    mis_date = Column(Date, nullable=False)
     created_date = Column(DateTime, server_default=func.now(), nullable=False)
 
     __table_args__ = (
         CheckConstraint("source IN ('FINACLE','VENDOR')", name="chk_canonical_source"),
         CheckConstraint("pickup_type IN ('BEAT','CALL')", name="chk_canonical_pickup_type"),
+        Index("idx_canonical_batch_source", "raw_batch_id", "source"),
+        Index("idx_canonical_source_pickup", "source", "pickup_date"),
     )
 
 
+class MonthlyPickupRollup(Base):
+    """Vendor pickups per batch MIS month; maintained by rollups.refresh_month."""
+
+    __tablename__ = "monthly_pickup_rollup"
+
+    rollup_id = Column(Number, Sequence("seq_monthly_pickup_rollup"), primary_key=True)
+    month_key = Column(String(6), nullable=False)
+    vendor_id = Column(Number, nullable=False)
+    bank_store_code = Column(String(30), nullable=False)
+    customer_id = Column(String(50))
+    pickup_type = Column(String(10))
+    pickup_count = Column(Number, nullable=False)
+    pickup_amount = Column(Number(18, 2), nullable=False)
+    # Pickups whose remittance (else pickup) date falls within the month
+    remittance_count = Column(Number, nullable=False)
+    remittance_amount = Column(Number(18, 2), nullable=False)
+    refreshed_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index("idx_monthly_rollup_month_vendor", "month_key", "vendor_id"),)
+
+
 class RemittanceEntry(Base):
     __tablename__ = "remittance_entries"
 
@@ -382,6 +457,7 @@ class RemittanceEntry(Base):
 
     __table_args__ = (
         CheckConstraint("status IN ('UPLOADED','VALIDATED','APPROVED','REJECTED','CLOSED')", name="chk_remittance_status"),
+        Index("idx_remittance_canonical", "canonical_id"),
     )
 
 
@@ -407,6 +483,7 @@ class ReconciliationResult(Base):
             "status IN ('MATCHED','AMOUNT_MISMATCH','DATE_MISMATCH','MISSING_FINACLE','MISSING_VENDOR')",
             name="chk_recon_status",
         ),
+        Index("idx_recon_mis_final_store", "mis_date", "is_final", "bank_store_code"),
     )
 
 
@@ -426,6 +503,7 @@ class ExceptionRecord(Base):
 
     __table_args__ = (
         CheckConstraint("status IN ('OPEN','RESOLVED','ESCALATED')", name="chk_exception_status"),
+        Index("idx_exception_recon_status", "recon_id", "status"),
     )
 
 
@@ -450,6 +528,7 @@ class ApprovalRequest(Base):
         CheckConstraint(
             "status IN ('PENDING','APPROVED','REJECTED','CLARIFICATION')", name="chk_approval_status"
         ),
+        Index("idx_approval_status_maker", "status", "maker_id"),
     )
 
 
@@ -468,6 +547,7 @@ class ReconciliationCorrection(Base):
 
     __table_args__ = (
         CheckConstraint("status IN ('PENDING','APPROVED','REJECTED')", name="chk_corr_status"),
+        Index("idx_corr_recon", "recon_id"),
     )
 
 
@@ -483,6 +563,13 @@ class AuditLog(Base):
     changed_by = Column(String(50), nullable=False)
     changed_at = Column(DateTime, server_default=func.now(), nullable=False)
 
+    # Local indexes on the monthly partitions (see db/schema.sql)
+    __table_args__ = (
+        Index("idx_audit_log_changed_at", "changed_at"),
+        Index("idx_audit_log_entity", "entity_type", "entity_id"),
+        Index("idx_audit_log_changed_by", "changed_by"),
+    )
+
 
 class MonthLock(Base):
     __tablename__ = "month_lock"
@@ -496,3 +583,74 @@ class MonthLock(Base):
     __table_args__ = (
         CheckConstraint("status IN ('OPEN','LOCKED')", name="chk_month_lock_status"),
     )
+
+
+class DataVersion(Base):
+    """Single-row stamp of report data; see data_version.py."""
+
+    __tablename__ = "data_version"
+
+    version_id = Column(Number, primary_key=True)
+    version = Column(Number, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+class ReportJob(Base):
+    """A background report; see report_jobs.py."""
+
+    __tablename__ = "report_job"
+
+    job_id = Column(String(32), primary_key=True)
+    # report_cache.result_key of the report and its parameters; identical jobs share it
+    job_key = Column(String(64), nullable=False)
+    report = Column(String(50), nullable=False)
+    filename = Column(String(255), nullable=False)
+    status = Column(String(10), nullable=False)
+    row_count = Column(Number)
+    error_message = Column(String(1000))
+    created_at = Column(DateTime, nullable=False)
+    # Refreshed by the sweeper of the process that runs the job; a stale one means orphaned
+    heartbeat_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime)
+
+    requesters = relationship("ReportJobRequester", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        CheckConstraint("status IN ('QUEUED','RUNNING','DONE','FAILED')", name="chk_report_job_status"),
+        Index("idx_report_job_key", "job_key", "status"),
+        Index("idx_report_job_status", "status", "finished_at"),
+    )
+
+
+class ReportJobRequester(Base):
+    __tablename__ = "report_job_requester"
+
+    job_id = Column(String(32), ForeignKey("report_job.job_id", ondelete="CASCADE"), primary_key=True)
+    employee_id = Column(String(50), primary_key=True)
+
+
+class AdminCleanupRun(Base):
+    """Progress of an admin cleanup or reset; see cleanup_engine.py."""
+
+    __tablename__ = "admin_cleanup_run"
+
+    run_id = Column(Number, Sequence("seq_admin_cleanup_run"), primary_key=True)
+    kind = Column(String(20), nullable=False)
+    targets = Column(String(500))
+    reason = Column(String(500))
+    requested_by = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False)
+    # JSON: {"tables": [...], "done": <tables finished>, "deleted": {table: rows}}
+    progress = Column(String(4000), nullable=False)
+    current_table = Column(String(128))
+    error_message = Column(String(1000))
+    started_at = Column(DateTime, server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        CheckConstraint("kind IN ('CLEANUP','RESET_ALL')", name="chk_cleanup_run_kind"),
+        CheckConstraint("status IN ('RUNNING','FAILED','COMPLETED')", name="chk_cleanup_run_status"),
+        # At most one RUNNING run
+        Index("ux_cleanup_run_running", case((status == "RUNNING", "RUNNING")), unique=True),
+    )
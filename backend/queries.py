@@ -0,0 +1,157 @@
+"""
+Hot queries shared by the endpoints that run them and by query_plans.py, which explains
+the same builders so a plan check can't drift from what the endpoint executes. Each
+builder returns an unexecuted Query; callers add their own ordering, paging, .first(),
+.all() or .delete().
+"""
+
+from sqlalchemy import and_, or_
+
+from models import (
+    ApprovalRequest,
+    BankStoreMaster,
+    CanonicalTransaction,
+    ExceptionRecord,
+    ReconciliationCorrection,
+    ReconciliationResult,
+    RemittanceEntry,
+    VendorStoreMappingMaster,
+)
+
+# Keyset order of the pickup reports
+PICKUPS_KEY = [CanonicalTransaction.pickup_date, CanonicalTransaction.canonical_id]
+
+
+def batch_transactions(db, source, batch_ids, mis_date):
+    """Canonical transactions of upload batches of one MIS date, pruned to its month's partition."""
+    return (
+        db.query(CanonicalTransaction)
+        .filter(CanonicalTransaction.source == source)
+        .filter(CanonicalTransaction.raw_batch_id.in_(batch_ids))
+        .filter(CanonicalTransaction.mis_date == mis_date)
+    )
+
+
+def batch_remittances(db, canonical_ids):
+    return db.query(RemittanceEntry).filter(RemittanceEntry.canonical_id.in_(canonical_ids))
+
+
+def store_name_join(pickup_date_col):
+    """Outer-join condition for the store name in effect on the pickup date."""
+    return and_(
+        BankStoreMaster.bank_store_code == CanonicalTransaction.bank_store_code,
+        BankStoreMaster.status == "ACTIVE",
+        BankStoreMaster.effective_from <= pickup_date_col,
+        or_(BankStoreMaster.effective_to.is_(None), BankStoreMaster.effective_to >= pickup_date_col),
+    )
+
+
+def mapping_in_effect():
+    """Mapping predicates matching a vendor transaction on its pickup date."""
+    return and_(
+        VendorStoreMappingMaster.vendor_store_code == CanonicalTransaction.vendor_store_code,
+        VendorStoreMappingMaster.bank_store_code == CanonicalTransaction.bank_store_code,
+        VendorStoreMappingMaster.status == "ACTIVE",
+        VendorStoreMappingMaster.effective_from <= CanonicalTransaction.pickup_date,
+        or_(
+            VendorStoreMappingMaster.effective_to.is_(None),
+            VendorStoreMappingMaster.effective_to >= CanonicalTransaction.pickup_date,
+        ),
+    )
+
+
+def vendor_pickups(db, vendor_id, from_dt, to_dt):
+    """(transaction, store name) of vendor pickups in the range at stores mapped to vendor_id."""
+    mapped = (
+        db.query(VendorStoreMappingMaster.mapping_id)
+        .filter(VendorStoreMappingMaster.vendor_id == vendor_id)
+        .filter(mapping_in_effect())
+        .exists()
+    )
+    return (
+        db.query(CanonicalTransaction, BankStoreMaster.store_name)
+        .outerjoin(BankStoreMaster, store_name_join(CanonicalTransaction.pickup_date))
+        .filter(CanonicalTransaction.source == "VENDOR")
+        .filter(CanonicalTransaction.pickup_date >= from_dt)
+        .filter(CanonicalTransaction.pickup_date <= to_dt)
+        .filter(mapped)
+    )
+
+
+def final_recon_results(db, from_dt, to_dt):
+    """Final results dated in the range: mis_date when set, else pickup/remittance date (legacy rows)."""
+    return (
+        db.query(ReconciliationResult)
+        .filter(ReconciliationResult.is_final == 1)
+        .filter(
+            (
+                (ReconciliationResult.mis_date >= from_dt)
+                & (ReconciliationResult.mis_date <= to_dt)
+            )
+            | (
+                (ReconciliationResult.mis_date.is_(None))
+                & (
+                    (
+                        (ReconciliationResult.pickup_date >= from_dt)
+                        & (ReconciliationResult.pickup_date <= to_dt)
+                    )
+                    | (
+                        (ReconciliationResult.remittance_date >= from_dt)
+                        & (ReconciliationResult.remittance_date <= to_dt)
+                    )
+                )
+            )
+        )
+    )
+
+
+def existing_recon(db, bank_store_code, mis_date, date_key):
+    """Earlier results of a reconciliation run for one store and date."""
+    return (
+        db.query(ReconciliationResult)
+        .filter(ReconciliationResult.bank_store_code == bank_store_code)
+        .filter(ReconciliationResult.mis_date == mis_date)
+        .filter(
+            (ReconciliationResult.pickup_date == date_key)
+            | (ReconciliationResult.remittance_date == date_key)
+        )
+    )
+
+
+def open_exceptions(db, recon_id):
+    return (
+        db.query(ExceptionRecord)
+        .filter(ExceptionRecord.recon_id == recon_id)
+        .filter(ExceptionRecord.status == "OPEN")
+    )
+
+
+def active_store_mappings(db, vendor_id, vendor_store_code):
+    return (
+        db.query(VendorStoreMappingMaster)
+        .filter(VendorStoreMappingMaster.vendor_id == vendor_id)
+        .filter(VendorStoreMappingMaster.vendor_store_code == vendor_store_code)
+        .filter(VendorStoreMappingMaster.status == "ACTIVE")
+    )
+
+
+def pending_approvals(db):
+    return db.query(ApprovalRequest).filter(ApprovalRequest.status == "PENDING")
+
+
+def clarifications(db, maker_id):
+    return (
+        db.query(ApprovalRequest)
+        .filter(ApprovalRequest.status == "CLARIFICATION")
+        .filter(ApprovalRequest.maker_id == maker_id)
+    )
+
+
+def correction_statuses(db, recon_ids):
+    """(recon_id, approval status, approval reason) of corrections to recon_ids, newest first."""
+    return (
+        db.query(ReconciliationCorrection.recon_id, ApprovalRequest.status, ApprovalRequest.reason)
+        .join(ApprovalRequest, ApprovalRequest.approval_id == ReconciliationCorrection.approval_id)
+        .filter(ReconciliationCorrection.recon_id.in_(recon_ids))
+        .order_by(ReconciliationCorrection.created_date.desc())
+    )
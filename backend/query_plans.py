@@ -0,0 +1,233 @@
+"""
+Query plan regression check. Each PlanCheck is the hot query behind an endpoint, built by
+the same queries.py builder the endpoint calls, with the index it is expected to use
+(db/migrations/secondary_indexes.sql). check_plans() has the
+database explain every query and reports a regression when the plan scans the whole table
+or does not touch the index - e.g. after a predicate change, a dropped index or stale
+optimizer statistics. Run via `manage.py check-plans`; plans are only meaningful against a
+database with production-like data and statistics.
+
+Supported on Oracle (EXPLAIN PLAN / plan_table) and SQLite (EXPLAIN QUERY PLAN).
+"""
+
+import uuid
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable
+
+from sqlalchemy import text
+
+import queries
+from db import SessionLocal
+from models import CanonicalTransaction, ReconciliationResult
+from report_export import PAGE_SIZE
+
+# Bind values only shape the query; the plan is what's checked
+SAMPLE_DATE = date(2024, 1, 31)
+SAMPLE_IDS = [1, 2, 3]
+
+
+@dataclass(frozen=True)
+class PlanCheck:
+    name: str
+    endpoint: str
+    table: str
+    index: str
+    build: Callable
+
+
+def _upload_batch_transactions(db):
+    return queries.batch_transactions(db, "FINACLE", [1], SAMPLE_DATE).with_entities(
+        CanonicalTransaction.canonical_id
+    )
+
+
+def _vendor_pickups(db):
+    # First keyset page
+    return (
+        queries.vendor_pickups(db, 1, SAMPLE_DATE.replace(day=1), SAMPLE_DATE)
+        .order_by(*queries.PICKUPS_KEY)
+        .limit(PAGE_SIZE)
+    )
+
+
+def _recon_results(db):
+    return queries.final_recon_results(db, SAMPLE_DATE.replace(day=1), SAMPLE_DATE).order_by(
+        ReconciliationResult.created_date.desc()
+    )
+
+
+def _recon_existing(db):
+    return queries.existing_recon(db, "S001", SAMPLE_DATE, SAMPLE_DATE).order_by(
+        ReconciliationResult.created_date.desc()
+    )
+
+
+def _store_mapping_lookup(db):
+    return queries.active_store_mappings(db, 1, "V001")
+
+
+def _recon_exceptions(db):
+    return queries.open_exceptions(db, 1)
+
+
+def _pending_approvals(db):
+    return queries.pending_approvals(db)
+
+
+def _clarifications(db):
+    return queries.clarifications(db, "E001")
+
+
+def _recon_corrections(db):
+    return queries.correction_statuses(db, SAMPLE_IDS)
+
+
+def _batch_remittances(db):
+    return queries.batch_remittances(db, SAMPLE_IDS)
+
+
+PLAN_CHECKS = [
+    PlanCheck(
+        "upload_batch_transactions",
+        "DELETE /api/uploads/{finacle,vendor}/{batch_id}, POST /api/reconciliation/run",
+        "canonical_transactions",
+        "idx_canonical_batch_source",
+        _upload_batch_transactions,
+    ),
+    PlanCheck(
+        "vendor_pickups",
+        "GET /api/reports/vendor-pickups",
+        "canonical_transactions",
+        "idx_canonical_source_pickup",
+        _vendor_pickups,
+    ),
+    PlanCheck(
+        "recon_results",
+        "GET /api/reconciliation/results, GET /api/reports/reconciliation-final",
+        "reconciliation_results",
+        "idx_recon_mis_final_store",
+        _recon_results,
+    ),
+    PlanCheck(
+        "recon_existing",
+        "POST /api/reconciliation/run",
+        "reconciliation_results",
+        "idx_recon_mis_final_store",
+        _recon_existing,
+    ),
+    PlanCheck(
+        "store_mapping_lookup",
+        "POST /api/uploads/vendor, POST /api/store-mappings/requests/{approval_id}/approve",
+        "vendor_store_mapping_master",
+        "idx_mapping_vendor_code_status",
+        _store_mapping_lookup,
+    ),
+    PlanCheck(
+        "recon_exceptions",
+        "POST /api/reconciliation/run, POST /api/reconciliation/corrections/requests/{approval_id}/approve",
+        "exception_records",
+        "idx_exception_recon_status",
+        _recon_exceptions,
+    ),
+    PlanCheck(
+        "pending_approvals",
+        "GET /api/approvals/pending, POST /api/month-locks/lock",
+        "approval_requests",
+        "idx_approval_status_maker",
+        _pending_approvals,
+    ),
+    PlanCheck(
+        "clarifications",
+        "GET /api/approvals/clarifications",
+        "approval_requests",
+        "idx_approval_status_maker",
+        _clarifications,
+    ),
+    PlanCheck(
+        "recon_corrections",
+        "POST /api/reconciliation/run, GET /api/reports/reconciliation-final",
+        "reconciliation_corrections",
+        "idx_corr_recon",
+        _recon_corrections,
+    ),
+    PlanCheck(
+        "batch_remittances",
+        "DELETE /api/uploads/{finacle,vendor}/{batch_id}",
+        "remittance_entries",
+        "idx_remittance_canonical",
+        _batch_remittances,
+    ),
+]
+
+
+def _driver_sql(db, query):
+    dialect = db.bind.dialect
+    compiled = query.statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.params
+    if dialect.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+
+def explain(db, query) -> list[tuple[str, str]]:
+    """The plan of query as [(operation, object)], objects lower-cased."""
+    sql, params = _driver_sql(db, query)
+    conn = db.connection()
+    dialect = db.bind.dialect.name
+    if dialect == "oracle":
+        statement_id = uuid.uuid4().hex[:30]
+        conn.exec_driver_sql(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {sql}", params)
+        rows = conn.execute(
+            text(
+                "SELECT operation, options, object_name FROM plan_table "
+                "WHERE statement_id = :statement_id ORDER BY id"
+            ),
+            {"statement_id": statement_id},
+        ).all()
+        conn.execute(text("DELETE FROM plan_table WHERE statement_id = :statement_id"), {"statement_id": statement_id})
+        return [(" ".join(filter(None, (op, options))), (name or "").lower()) for op, options, name in rows]
+    if dialect == "sqlite":
+        steps = []
+        for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params):
+            # e.g. "SCAN audit_log" or "SEARCH canonical_transactions USING INDEX idx_x (source=?)"
+            words = row[-1].split()
+            if words[0] in ("SCAN", "SEARCH") and len(words) > 1:
+                has_index = "INDEX" in words and words.index("INDEX") + 1 < len(words)
+                steps.append(("TABLE SCAN" if words[0] == "SCAN" and not has_index else words[0], words[1].lower()))
+                if has_index:
+                    steps.append(("INDEX", words[words.index("INDEX") + 1].lower()))
+        return steps
+    raise ValueError(f"Query plans are not supported on {dialect}")
+
+
+def _full_scan(operation: str) -> bool:
+    return operation in ("TABLE ACCESS FULL", "TABLE SCAN")
+
+
+def check_plans(names=None) -> list[dict]:
+    """Explain each check (all, or those in names); entries with ok=False are regressions."""
+    checks = [c for c in PLAN_CHECKS if names is None or c.name in names]
+    results = []
+    db = SessionLocal()
+    try:
+        for check in checks:
+            steps = explain(db, check.build(db))
+            full_scan = any(_full_scan(op) and obj == check.table for op, obj in steps)
+            uses_index = any(obj == check.index for _, obj in steps)
+            results.append(
+                {
+                    "name": check.name,
+                    "endpoint": check.endpoint,
+                    "table": check.table,
+                    "index": check.index,
+                    "ok": uses_index and not full_scan,
+                    "full_scan": full_scan,
+                    "uses_index": uses_index,
+                    "plan": [f"{op} {obj}".strip() for op, obj in steps],
+                }
+            )
+        db.rollback()
+    finally:
+        db.close()
+    return results
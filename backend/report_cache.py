@@ -0,0 +1,232 @@
+"""
+Materialised report results shared between a preview and the following download, and
+between downloads of the same report.
+
+Previews only ever read their page. A first-page preview can opt in to warming (warm=true):
+the full result is then built on a background thread, with its own session, so it is ready
+when the user clicks download; a warm is skipped when every REPORT_CACHE_WARM_WORKERS thread
+is busy. Otherwise the first download builds the result while streaming it. Either way it
+is stored under a handle (report name + parameters + data version), so later downloads with
+the same parameters stream the stored rows instead of running the report again. A download
+never waits for a build in progress; it runs the report itself. Results are kept in a small
+LRU, in memory when small and spilled to a temp file when large.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "32"))
+REPORT_CACHE_TTL_SEC = int(os.getenv("REPORT_CACHE_TTL", "600"))
+REPORT_CACHE_MEMORY_ROWS = int(os.getenv("REPORT_CACHE_MEMORY_ROWS", "5000"))
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR") or tempfile.gettempdir()
+REPORT_CACHE_WARM_WORKERS = int(os.getenv("REPORT_CACHE_WARM_WORKERS", "2"))
+# A build not finished within this long is taken as abandoned (e.g. client went away)
+BUILD_ABANDON_SEC = 300
+
+_results: "OrderedDict[str, _Result]" = OrderedDict()
+_lock = threading.Lock()
+_spill_dir = None
+_warm_pool = None
+_warming = 0
+
+
+def _spill_path() -> str:
+    """New spill file in this process's own directory (removed at exit)."""
+    global _spill_dir
+    with _lock:
+        if _spill_dir is None:
+            os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+            _spill_dir = tempfile.mkdtemp(prefix="dsb-report-cache-", dir=REPORT_CACHE_DIR)
+            atexit.register(shutil.rmtree, _spill_dir, True)
+    fd, path = tempfile.mkstemp(suffix=".jsonl", dir=_spill_dir)
+    os.close(fd)
+    return path
+
+
+class _Result:
+    def __init__(self):
+        self.rows = []
+        self.path = None
+        self._file = None
+        self.count = 0
+        self.started_at = time.monotonic()
+        self.created_at = None
+        self.failed = False
+        self.ready = threading.Event()
+
+    def add(self, row):
+        if self._file is None and len(self.rows) >= REPORT_CACHE_MEMORY_ROWS:
+            self.path = _spill_path()
+            self._file = open(self.path, "w", encoding="utf-8")
+            for pending in self.rows:
+                self._file.write(json.dumps(pending, default=str) + "\n")
+            self.rows = None
+        if self._file is not None:
+            self._file.write(json.dumps(row, default=str) + "\n")
+        else:
+            self.rows.append(row)
+        self.count += 1
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.created_at = time.monotonic()
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def stale(self) -> bool:
+        """Expired, or a build that was never driven to completion (e.g. client went away)."""
+        now = time.monotonic()
+        if self.created_at is not None:
+            return now - self.created_at > REPORT_CACHE_TTL_SEC
+        return now - self.started_at > BUILD_ABANDON_SEC
+
+    def iter_rows(self):
+        if self.path:
+            # Opened now, so the rows stay readable if the entry is evicted meanwhile
+            return _read_lines(open(self.path, encoding="utf-8"))
+        return iter(self.rows)
+
+
+def _read_lines(handle):
+    with handle:
+        for line in handle:
+            yield json.loads(line)
+
+
+def result_key(report: str, params: dict, version) -> str:
+    raw = json.dumps([report, params, version], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _claim(key: str):
+    """(entry, owner): the live entry for key, or a new one the caller must build."""
+    with _lock:
+        entry = _results.get(key)
+        if entry is not None and (entry.failed or entry.stale()):
+            _results.pop(key, None)
+            entry.discard()
+            entry = None
+        if entry is not None:
+            _results.move_to_end(key)
+            return entry, False
+        entry = _Result()
+        _results[key] = entry
+        _evict()
+        return entry, True
+
+
+def _evict():
+    # Caller holds _lock. Entries still being built are never evicted.
+    for key in list(_results):
+        if len(_results) <= REPORT_CACHE_MAX_ENTRIES:
+            return
+        entry = _results[key]
+        if entry.ready.is_set():
+            _results.pop(key)
+            entry.discard()
+
+
+def _drop(key: str, entry: _Result):
+    entry.failed = True
+    with _lock:
+        if _results.get(key) is entry:
+            _results.pop(key)
+    entry.discard()
+    entry.ready.set()
+
+
+def _tee(key: str, entry: _Result, rows):
+    """Yield rows while storing them; an abandoned or failed build is dropped."""
+    try:
+        for row in rows:
+            entry.add(row)
+            yield row
+    except BaseException:
+        _drop(key, entry)
+        raise
+    entry.finish()
+    entry.ready.set()
+
+
+def cached_rows(key: str, rows_factory):
+    """
+    Rows for key: the stored result when available, otherwise rows_factory() streamed
+    through and stored for the next caller. While another request is still building the
+    result, rows_factory() is streamed without storing rather than waiting for it.
+    """
+    entry, owner = _claim(key)
+    if owner:
+        try:
+            rows = rows_factory()
+        except BaseException:
+            _drop(key, entry)
+            raise
+        return _tee(key, entry, rows)
+    if entry.ready.is_set() and not entry.failed:
+        return entry.iter_rows()
+    return rows_factory()
+
+
+def warm(key: str, build) -> bool:
+    """
+    Start materialising build(db) under key on a warm thread and return at once. Skipped
+    (False) when the result is stored or being built already, or every warm thread is busy.
+    build receives the thread's own session and returns an iterable of rows.
+    """
+    global _warm_pool, _warming
+    with _lock:
+        entry = _results.get(key)
+        if entry is not None and not (entry.failed or entry.stale()):
+            return False
+        if _warming >= REPORT_CACHE_WARM_WORKERS:
+            return False
+        _warming += 1
+        if _warm_pool is None:
+            _warm_pool = ThreadPoolExecutor(
+                max_workers=max(1, REPORT_CACHE_WARM_WORKERS), thread_name_prefix="report-warm"
+            )
+    _warm_pool.submit(_build, key, build)
+    return True
+
+
+def _build(key: str, build):
+    global _warming
+    try:
+        entry, owner = _claim(key)
+        if not owner:
+            return
+        db = SessionLocal()
+        try:
+            for _ in _tee(key, entry, build(db)):
+                pass
+        except Exception:
+            _drop(key, entry)
+            logger.exception("Report result build failed")
+        finally:
+            db.close()
+    finally:
+        with _lock:
+            _warming -= 1
@@ -0,0 +1,240 @@
+"""
+Streaming report exports. Rows are pulled page by page from the database and written
+to the response in chunks, so memory stays flat regardless of table size.
+"""
+
+import base64
+import csv
+import io
+import json
+import tempfile
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from sqlalchemy import and_, or_
+
+PAGE_SIZE = 2000
+CSV_CHUNK_ROWS = 1000
+PREVIEW_MAX_ROWS = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+XLSX_SPOOL_MAX_BYTES = 8 * 1024 * 1024  # workbooks larger than this go to a temp file
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def keyset_pages(query, order_columns, page_size=PAGE_SIZE, descending=False, after=None, then_by=()):
+    """
+    Yield a query in keyset pages ordered by order_columns (a unique key, most
+    significant first). Each page is a short, index-friendly query instead of one
+    long-lived cursor over the whole table. descending is one flag for all columns
+    or one per column; after resumes behind a row_key(). then_by only breaks ties
+    within a key and is not part of it.
+    """
+    directions = _directions(order_columns, descending)
+    ordering = [col.desc() if desc else col.asc() for col, desc in zip(order_columns, directions)]
+    ordering.extend(then_by)
+    last = after
+    while True:
+        page_query = query
+        if last is not None:
+            page_query = page_query.filter(_after(order_columns, last, directions))
+        page = page_query.order_by(*ordering).limit(page_size).all()
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        last = row_key(page[-1], order_columns)
+
+
+def keyset_iter(query, order_columns, page_size=PAGE_SIZE, descending=False, after=None, then_by=()):
+    """Rows of keyset_pages(), one at a time."""
+    for page in keyset_pages(query, order_columns, page_size, descending, after, then_by):
+        yield from page
+
+
+def row_key(result, order_columns):
+    """Key values of a result row (an entity, or a tuple whose first element is the entity)."""
+    keys = [col.key for col in order_columns]
+    entity = result if hasattr(result, keys[0]) else result[0]
+    return [getattr(entity, key) for key in keys]
+
+
+def _directions(order_columns, descending):
+    if isinstance(descending, bool):
+        return [descending] * len(order_columns)
+    return list(descending)
+
+
+def _after(order_columns, values, directions):
+    """(c1, c2, ...) past values in the given directions, expanded for Oracle."""
+    clauses = []
+    for i, col in enumerate(order_columns):
+        prefix = [order_columns[j] == values[j] for j in range(i)]
+        step = col < values[i] if directions[i] else col > values[i]
+        clauses.append(and_(*prefix, step))
+    return or_(*clauses)
+
+
+def encode_cursor(values) -> str:
+    """Opaque, URL-safe cursor for a row_key()."""
+    tagged = []
+    for value in values:
+        if isinstance(value, datetime):
+            tagged.append(["t", value.isoformat()])
+        elif isinstance(value, date):
+            tagged.append(["d", value.isoformat()])
+        elif isinstance(value, Decimal):
+            tagged.append(["n", str(value)])
+        else:
+            tagged.append(["v", value])
+    raw = json.dumps(tagged, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str | None):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = []
+        for tag, value in json.loads(raw):
+            if tag == "t":
+                values.append(datetime.fromisoformat(value))
+            elif tag == "d":
+                values.append(date.fromisoformat(value))
+            elif tag == "n":
+                values.append(Decimal(value))
+            else:
+                values.append(value)
+        return values
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def preview_limit(limit: int) -> int:
+    return max(1, min(limit, PREVIEW_MAX_ROWS))
+
+
+def preview_page(keyed_rows, limit: int, response):
+    """
+    First `limit` rows of an iterator of (row_key, row) pairs. When more rows exist the
+    cursor for the next page is returned in the X-Next-Cursor header, so the body
+    stays a plain list.
+    """
+    page = list(islice(keyed_rows, limit + 1))
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(page[-1][0])
+    return [row for _, row in page]
+
+
+def rows_only(keyed_rows):
+    """Rows of an iterator of (row_key, row) pairs."""
+    for _, row in keyed_rows:
+        yield row
+
+
+def _csv_chunks(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")  # BOM for Excel compatibility
+    writer.writerow(header)
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= CSV_CHUNK_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    tail = buffer.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _closing(chunks, on_close):
+    try:
+        yield from chunks
+    finally:
+        if on_close:
+            on_close()
+
+
+def csv_streaming_response(filename: str, header: list[str], rows, gzip: bool = False, on_close=None):
+    """
+    StreamingResponse writing header + rows as CSV. on_close (e.g. db.close) runs once
+    the stream is exhausted or abandoned. With gzip=True the body is sent with
+    Content-Encoding: gzip, which browsers decode transparently.
+    """
+    chunks = _csv_chunks(header, rows)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _closing(chunks, on_close),
+        media_type="text/csv; charset=utf-8",
+        headers=headers,
+    )
+
+
+def write_xlsx(rows, header=None, sheet_name="Sheet1"):
+    """
+    Write rows to an .xlsx in openpyxl write-only mode, one row at a time, into a
+    spooled temp file. rows are dicts (header defaults to the first row's keys) or
+    sequences. Returns (file positioned at 0, data row count).
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    if header is not None:
+        sheet.append(header)
+    count = 0
+    for row in rows:
+        if isinstance(row, dict):
+            if header is None:
+                header = list(row.keys())
+                sheet.append(header)
+            sheet.append([row.get(key) for key in header])
+        else:
+            sheet.append(list(row))
+        count += 1
+    spool = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_BYTES)
+    workbook.save(spool)
+    spool.seek(0)
+    return spool, count
+
+
+def _file_chunks(handle):
+    try:
+        while True:
+            chunk = handle.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        handle.close()
+
+
+def xlsx_streaming_response(filename: str, spool):
+    """StreamingResponse sending a write_xlsx() file in chunks; the file is closed at the end."""
+    return StreamingResponse(
+        _file_chunks(spool),
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,256 @@
+"""
+Background report generation. A submitted report runs on a small worker pool in the
+process that accepted it and is written to REPORT_ARTIFACT_DIR, where it can be polled and
+downloaded until its TTL runs out. Identical submissions (same key) share one job.
+
+Jobs live in the report_job table, so with several API workers any of them can answer a
+poll or download, and sharing and the pending limit span all of them. REPORT_ARTIFACT_DIR
+must be readable by every worker (local disk on a single host, a shared mount otherwise);
+artifacts survive restarts until they expire.
+
+Each process runs a sweeper thread every REPORT_JOB_SWEEP_INTERVAL seconds. It refreshes
+heartbeat_at on the jobs this process has queued or is running, fails jobs whose heartbeat
+is older than REPORT_JOB_ORPHAN_AFTER (left behind by a process that stopped), and deletes
+expired jobs with their artifacts. Polls and downloads only read.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import or_
+
+from db import SessionLocal
+from models import ReportJob, ReportJobRequester
+from report_export import write_xlsx
+
+logger = logging.getLogger(__name__)
+
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+REPORT_JOB_MAX_PENDING = int(os.getenv("REPORT_JOB_MAX_PENDING", "20"))
+REPORT_ARTIFACT_TTL_SEC = int(os.getenv("REPORT_ARTIFACT_TTL", "3600"))
+REPORT_JOB_SWEEP_INTERVAL_SEC = float(os.getenv("REPORT_JOB_SWEEP_INTERVAL", "30"))
+REPORT_JOB_ORPHAN_AFTER_SEC = int(os.getenv("REPORT_JOB_ORPHAN_AFTER", "300"))
+REPORT_ARTIFACT_DIR = os.getenv("REPORT_ARTIFACT_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "report_artifacts"
+)
+
+PENDING = ("QUEUED", "RUNNING")
+
+_executor = None
+_executor_lock = threading.Lock()
+# Jobs queued or running in this process; the sweeper keeps their heartbeat fresh
+_active: set[str] = set()
+_active_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=REPORT_JOB_WORKERS, thread_name_prefix="report-job")
+        return _executor
+
+
+def artifact_path(job: ReportJob) -> str:
+    return os.path.join(REPORT_ARTIFACT_DIR, f"{job.job_id}.xlsx")
+
+
+def _expires_at(job: ReportJob):
+    return job.finished_at + timedelta(seconds=REPORT_ARTIFACT_TTL_SEC) if job.finished_at else None
+
+
+def as_dict(job: ReportJob) -> dict:
+    return {
+        "job_id": job.job_id,
+        "report": job.report,
+        "status": job.status,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "expires_at": _expires_at(job),
+        "rows": None if job.row_count is None else int(job.row_count),
+        "error": job.error_message,
+    }
+
+
+def sweep() -> int:
+    """Heartbeat this process's jobs, fail orphaned ones and drop expired ones; returns jobs dropped."""
+    now = datetime.utcnow()
+    with _active_lock:
+        active = list(_active)
+    db = SessionLocal()
+    try:
+        if active:
+            db.query(ReportJob).filter(ReportJob.job_id.in_(active)).filter(
+                ReportJob.status.in_(PENDING)
+            ).update({"heartbeat_at": now}, synchronize_session=False)
+        db.query(ReportJob).filter(ReportJob.status.in_(PENDING)).filter(
+            ReportJob.heartbeat_at < now - timedelta(seconds=REPORT_JOB_ORPHAN_AFTER_SEC)
+        ).update(
+            {"status": "FAILED", "error_message": "Report job did not finish", "finished_at": now},
+            synchronize_session=False,
+        )
+        expired_ids = [
+            job_id
+            for (job_id,) in db.query(ReportJob.job_id).filter(
+                ReportJob.finished_at < now - timedelta(seconds=REPORT_ARTIFACT_TTL_SEC)
+            )
+        ]
+        if expired_ids:
+            db.query(ReportJobRequester).filter(ReportJobRequester.job_id.in_(expired_ids)).delete(
+                synchronize_session=False
+            )
+            db.query(ReportJob).filter(ReportJob.job_id.in_(expired_ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    for job_id in expired_ids:
+        try:
+            os.remove(os.path.join(REPORT_ARTIFACT_DIR, f"{job_id}.xlsx"))
+        except OSError:
+            pass
+    return len(expired_ids)
+
+
+class JobSweeper:
+    """Daemon thread running sweep() every REPORT_JOB_SWEEP_INTERVAL seconds."""
+
+    def __init__(self, interval: float = REPORT_JOB_SWEEP_INTERVAL_SEC):
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None or self._interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="report-job-sweeper", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                removed = sweep()
+                if removed:
+                    logger.info("Removed %s expired report jobs", removed)
+            except Exception:
+                logger.exception("Report job sweep failed")
+
+    def stop(self):
+        self._stop.set()
+
+
+_sweeper = JobSweeper()
+
+
+def submit(db, key: str, report: str, filename: str, sheet_name: str, rows_factory, requested_by: str) -> dict:
+    """
+    Queue rows_factory(db) -> rows to be written as an .xlsx artifact, or join the live
+    job already recorded under key. rows_factory gets its own session on a worker.
+    """
+    _sweeper.start()
+    now = datetime.utcnow()
+    existing = (
+        db.query(ReportJob)
+        .filter(ReportJob.job_key == key)
+        .filter(ReportJob.status != "FAILED")
+        .filter(
+            or_(
+                ReportJob.finished_at.is_(None),
+                ReportJob.finished_at >= now - timedelta(seconds=REPORT_ARTIFACT_TTL_SEC),
+            )
+        )
+        .order_by(ReportJob.created_at.desc())
+        .first()
+    )
+    if existing is not None:
+        if db.get(ReportJobRequester, (existing.job_id, requested_by)) is None:
+            existing.requesters.append(ReportJobRequester(employee_id=requested_by))
+            db.commit()
+        return as_dict(existing)
+    pending = db.query(ReportJob).filter(ReportJob.status.in_(PENDING)).count()
+    if pending >= REPORT_JOB_MAX_PENDING:
+        raise HTTPException(status_code=429, detail="Too many report jobs in progress. Try again shortly.")
+    job = ReportJob(
+        job_id=uuid.uuid4().hex,
+        job_key=key,
+        report=report,
+        filename=filename,
+        status="QUEUED",
+        created_at=now,
+        heartbeat_at=now,
+    )
+    job.requesters.append(ReportJobRequester(employee_id=requested_by))
+    db.add(job)
+    db.commit()
+    with _active_lock:
+        _active.add(job.job_id)
+    _pool().submit(_run, job.job_id, sheet_name, rows_factory)
+    return as_dict(job)
+
+
+def _write_artifact(job: ReportJob, spool):
+    os.makedirs(REPORT_ARTIFACT_DIR, exist_ok=True)
+    fd, work_path = tempfile.mkstemp(prefix=f".{job.job_id}-", dir=REPORT_ARTIFACT_DIR)
+    try:
+        with spool, os.fdopen(fd, "wb") as handle:
+            shutil.copyfileobj(spool, handle)
+        os.replace(work_path, artifact_path(job))
+    except BaseException:
+        os.remove(work_path)
+        raise
+
+
+def _set_status(db, job_id: str, from_status: str, values: dict) -> bool:
+    """Move the job on from from_status; False when it was swept or deleted meanwhile."""
+    updated = (
+        db.query(ReportJob)
+        .filter(ReportJob.job_id == job_id)
+        .filter(ReportJob.status == from_status)
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    return bool(updated)
+
+
+def _run(job_id: str, sheet_name: str, rows_factory):
+    db = SessionLocal()
+    try:
+        job = db.get(ReportJob, job_id)
+        if job is None or not _set_status(
+            db, job_id, "QUEUED", {"status": "RUNNING", "heartbeat_at": datetime.utcnow()}
+        ):
+            return
+        try:
+            spool, count = write_xlsx(rows_factory(db), sheet_name=sheet_name)
+            _write_artifact(job, spool)
+            values = {"status": "DONE", "row_count": count}
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Report job %s (%s) failed", job_id, job.report)
+            error = exc.detail if isinstance(exc, HTTPException) else "Report generation failed"
+            values = {"status": "FAILED", "error_message": error}
+        values["finished_at"] = datetime.utcnow()
+        if not _set_status(db, job_id, "RUNNING", values):
+            logger.warning("Report job %s was failed or removed while running; result discarded", job_id)
+    finally:
+        with _active_lock:
+            _active.discard(job_id)
+        db.close()
+
+
+def get(db, job_id: str, employee_id: str, role: str) -> ReportJob:
+    """Job visible to this user (any requester of it, or ADMIN); 404 otherwise."""
+    _sweeper.start()
+    job = db.get(ReportJob, job_id)
+    if job is None or (role != "ADMIN" and db.get(ReportJobRequester, (job_id, employee_id)) is None):
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
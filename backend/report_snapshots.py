@@ -0,0 +1,262 @@
+"""
+Frozen reports for locked months. Once a month is locked its uploads, reconciliation and
+charges can no longer change, so lock_month freezes the standard month reports into a
+compressed snapshot (gzipped JSON lines, plus the rendered .xlsx for Excel reports) and
+the report endpoints serve the snapshot with a strong ETag instead of re-running the
+queries.
+
+Snapshots live under REPORT_SNAPSHOT_DIR/<YYYYMM>/ and are only served while the month is
+still LOCKED. A month is published by renaming a fully written directory into place, so
+readers never see a partial freeze. Reports register how to build themselves with
+register(); routes_reports does this for the month reports.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+
+from charge_engine import month_bounds
+from db import SessionLocal
+from report_export import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, preview_limit, write_xlsx
+from utils_month_lock import is_month_locked
+
+logger = logging.getLogger(__name__)
+
+REPORT_SNAPSHOT_DIR = os.getenv("REPORT_SNAPSHOT_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "report_snapshots"
+)
+MANIFEST_FILE = "manifest.json"
+HASH_CHUNK_BYTES = 64 * 1024
+
+# report -> (keyed_rows, sheet_name, variants)
+_specs: dict = {}
+_manifests: dict = {}
+_manifest_lock = threading.Lock()
+_freeze_lock = threading.Lock()
+
+
+def register(report: str, keyed_rows, sheet_name: str | None = None, variants=None):
+    """
+    Freeze `report` on lock. keyed_rows(db, first_day, last_day, param) yields the
+    report's (row_key, row) pairs; variants(db, first_day, last_day) lists the params
+    to freeze (e.g. vendor ids) for reports that take one. sheet_name also stores the
+    rendered .xlsx for reports downloaded as Excel.
+    """
+    _specs[report] = (keyed_rows, sheet_name, variants)
+
+
+def _entry_name(report: str, param=None) -> str:
+    if param is None:
+        return report
+    digest = hashlib.sha1(str(param).encode("utf-8")).hexdigest()[:16]
+    return f"{report}-{digest}"
+
+
+def _month_dir(month_key: str) -> str:
+    return os.path.join(REPORT_SNAPSHOT_DIR, month_key)
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_keyed(path: str):
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            cursor, row = json.loads(line)
+            yield cursor, row
+
+
+def _write_entry(work_dir, name, keyed_rows, sheet_name):
+    rows_path = os.path.join(work_dir, f"{name}.jsonl.gz")
+    count = 0
+    # mtime=0 keeps the file, and so its ETag, identical across re-freezes of the same data
+    with open(rows_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as handle:
+        for key, row in keyed_rows:
+            handle.write((json.dumps([encode_cursor(key), row], default=str) + "\n").encode("utf-8"))
+            count += 1
+    entry = {"rows": count, "etag": _file_hash(rows_path)}
+    if sheet_name:
+        spool, _ = write_xlsx((row for _, row in _read_keyed(rows_path)), sheet_name=sheet_name)
+        xlsx_path = os.path.join(work_dir, f"{name}.xlsx")
+        with spool, open(xlsx_path, "wb") as handle:
+            shutil.copyfileobj(spool, handle)
+        entry["xlsx_etag"] = _file_hash(xlsx_path)
+    return entry
+
+
+def freeze_month(month_key: str, frozen_by: str = "SYSTEM") -> dict:
+    """
+    Build and publish the snapshot for month_key, replacing any earlier one. Uses its own
+    session; skipped (returns None) if the month is not locked. Returns the manifest.
+    """
+    first_day, last_day = month_bounds(month_key)
+    with _freeze_lock:
+        db = SessionLocal()
+        try:
+            if not is_month_locked(db, month_key):
+                logger.info("Month %s is not locked; snapshot skipped", month_key)
+                return None
+            os.makedirs(REPORT_SNAPSHOT_DIR, exist_ok=True)
+            work_dir = tempfile.mkdtemp(prefix=f".{month_key}-", dir=REPORT_SNAPSHOT_DIR)
+            try:
+                reports = {}
+                for report, (keyed_rows, sheet_name, variants) in _specs.items():
+                    params = [None] if variants is None else variants(db, first_day, last_day)
+                    for param in params:
+                        name = _entry_name(report, param)
+                        entry = _write_entry(work_dir, name, keyed_rows(db, first_day, last_day, param), sheet_name)
+                        entry.update({"report": report, "param": None if param is None else str(param)})
+                        reports[name] = entry
+                manifest = {
+                    "month_key": month_key,
+                    "frozen_at": datetime.utcnow().isoformat(),
+                    "frozen_by": frozen_by,
+                    "reports": reports,
+                }
+                with open(os.path.join(work_dir, MANIFEST_FILE), "w", encoding="utf-8") as handle:
+                    json.dump(manifest, handle)
+                _publish(month_key, work_dir)
+            except BaseException:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                raise
+        finally:
+            db.close()
+    logger.info("Froze %s report snapshots for %s", len(manifest["reports"]), month_key)
+    return manifest
+
+
+def _publish(month_key: str, work_dir: str):
+    target = _month_dir(month_key)
+    retired = None
+    if os.path.exists(target):
+        retired = os.path.join(REPORT_SNAPSHOT_DIR, f".{month_key}-retired-{uuid.uuid4().hex}")
+        os.rename(target, retired)
+    os.rename(work_dir, target)
+    with _manifest_lock:
+        _manifests.pop(month_key, None)
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+
+
+def freeze_month_task(month_key: str, frozen_by: str):
+    """Background task wrapper: a failed freeze only means the month is served live."""
+    try:
+        freeze_month(month_key, frozen_by)
+    except Exception:
+        logger.exception("Report snapshot for %s failed", month_key)
+
+
+def _manifest(month_key: str):
+    path = os.path.join(_month_dir(month_key), MANIFEST_FILE)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _manifest_lock:
+        cached = _manifests.get(month_key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    with _manifest_lock:
+        _manifests[month_key] = (mtime, manifest)
+    return manifest
+
+
+class Snapshot:
+    def __init__(self, month_key: str, name: str, entry: dict):
+        self.month_key = month_key
+        self.name = name
+        self.rows_count = entry["rows"]
+        self._etag = entry["etag"]
+        self._xlsx_etag = entry.get("xlsx_etag")
+
+    @property
+    def rows_path(self) -> str:
+        return os.path.join(_month_dir(self.month_key), f"{self.name}.jsonl.gz")
+
+    @property
+    def xlsx_path(self) -> str:
+        return os.path.join(_month_dir(self.month_key), f"{self.name}.xlsx")
+
+    def etag(self, variant: str) -> str:
+        """Strong ETag of one representation: "xlsx", "csv", "csv-gzip" or a preview key."""
+        if variant == "xlsx":
+            return f'"{self._xlsx_etag}"'
+        return f'"{self._etag[:40]}-{variant}"'
+
+    def keyed_rows(self):
+        """(cursor, row) pairs in report order."""
+        return _read_keyed(self.rows_path)
+
+    def rows(self):
+        for _, row in self.keyed_rows():
+            yield row
+
+
+def lookup(db, report: str, month_key: str | None, param=None) -> Snapshot | None:
+    """The frozen report for a locked month, or None to run it live."""
+    if not month_key:
+        return None
+    manifest = _manifest(month_key)
+    if manifest is None:
+        return None
+    name = _entry_name(report, param)
+    entry = manifest["reports"].get(name)
+    if entry is None or not is_month_locked(db, month_key):
+        return None
+    return Snapshot(month_key, name, entry)
+
+
+def not_modified(if_none_match: str | None, etag: str) -> Response | None:
+    """304 response when the client already holds this representation."""
+    if not if_none_match or etag is None:
+        return None
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison
+    if "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def preview(snapshot: Snapshot, cursor: str | None, limit: int, if_none_match: str | None, response: Response):
+    """
+    A preview page served from the snapshot, with the same cursor scheme as the live
+    preview (cursors are interchangeable between the two).
+    """
+    limit = preview_limit(limit)
+    decode_cursor(cursor)  # 400 on a malformed cursor, as live
+    etag = snapshot.etag(hashlib.sha1(f"{cursor or ''}:{limit}".encode("utf-8")).hexdigest()[:16])
+    cached = not_modified(if_none_match, etag)
+    if cached is not None:
+        return cached
+    page = []
+    started = cursor is None
+    for key, row in snapshot.keyed_rows():
+        if not started:
+            started = key == cursor
+            continue
+        page.append((key, row))
+        if len(page) > limit:
+            break
+    if not started:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = page[-1][0]
+    response.headers["ETag"] = etag
+    return [row for _, row in page]
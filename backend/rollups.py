@@ -0,0 +1,249 @@
+"""
+Monthly pickup rollups: vendor transactions summed per (batch MIS month, vendor, bank
+store, customer, pickup type). A (month, vendor) slice is rebuilt in the same transaction
+as any change to its transactions (vendor upload, vendor batch delete), so month-level
+readers such as the charge engine read a few rollup rows instead of raw transactions.
+
+customer_id is the transaction's own, else the store mapping in effect on the
+transaction's remittance/pickup date. Approving or deactivating a store mapping refreshes
+the vendor's months that have rollup rows for the mapping's bank store (refresh_stores);
+`manage.py rebuild-rollups` refreshes a range after other master-data fixes.
+"""
+
+import logging
+
+from sqlalchemy import case, func
+
+from charge_engine import month_bounds
+from db import SessionLocal
+from id_allocator import add_with_ids
+from models import (
+    CanonicalTransaction,
+    MonthlyPickupRollup,
+    VendorMaster,
+    VendorStoreMappingMaster,
+    VendorUploadBatch,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _in_effect(effective_from, effective_to, as_of_date) -> bool:
+    return effective_from <= as_of_date and (effective_to is None or effective_to >= as_of_date)
+
+
+def _load_mappings(db, vendor_ids) -> dict:
+    mappings = {}
+    for row in (
+        db.query(
+            VendorStoreMappingMaster.vendor_id,
+            VendorStoreMappingMaster.bank_store_code,
+            VendorStoreMappingMaster.vendor_store_code,
+            VendorStoreMappingMaster.effective_from,
+            VendorStoreMappingMaster.effective_to,
+            VendorStoreMappingMaster.customer_id,
+        )
+        .filter(VendorStoreMappingMaster.vendor_id.in_(vendor_ids))
+        .filter(VendorStoreMappingMaster.status == "ACTIVE")
+        .all()
+    ):
+        mappings.setdefault((int(row[0]), row[1], row[2]), []).append(tuple(row[3:]))
+    return mappings
+
+
+def _mapped_customer(mappings, vendor_id, bank_store_code, vendor_store_code, as_of_date):
+    if as_of_date is None:
+        return None
+    for eff_from, eff_to, customer_id in mappings.get((int(vendor_id), bank_store_code, vendor_store_code or ""), []):
+        if _in_effect(eff_from, eff_to, as_of_date):
+            return customer_id
+    return None
+
+
+def _slice_vendors(db, month_key, first_day, last_day) -> list[int]:
+    """Vendors with a batch or existing rollup rows in the month."""
+    batch_vendors = (
+        db.query(VendorUploadBatch.vendor_id)
+        .filter(VendorUploadBatch.mis_date.between(first_day, last_day))
+        .distinct()
+        .all()
+    )
+    rollup_vendors = (
+        db.query(MonthlyPickupRollup.vendor_id)
+        .filter(MonthlyPickupRollup.month_key == month_key)
+        .distinct()
+        .all()
+    )
+    return sorted({int(row[0]) for row in batch_vendors} | {int(row[0]) for row in rollup_vendors})
+
+
+def slice_totals(db, month_key, vendor_ids) -> dict:
+    """
+    Rollup rows of the vendors' slices computed from their transactions, without writing:
+    (vendor_id, bank_store_code, customer_id, pickup_type) ->
+    [pickup_count, pickup_amount, remittance_count, remittance_amount].
+    """
+    first_day, last_day = month_bounds(month_key)
+    date_val = func.coalesce(CanonicalTransaction.remittance_date, CanonicalTransaction.pickup_date)
+    in_month = date_val.between(first_day, last_day)
+    # remittance_amount, unless missing or zero, else pickup_amount
+    amount = func.coalesce(
+        func.nullif(CanonicalTransaction.remittance_amount, 0), CanonicalTransaction.pickup_amount, 0
+    )
+    rows = (
+        db.query(
+            VendorUploadBatch.vendor_id,
+            CanonicalTransaction.customer_id,
+            CanonicalTransaction.bank_store_code,
+            CanonicalTransaction.vendor_store_code,
+            date_val,
+            CanonicalTransaction.pickup_type,
+            func.count(CanonicalTransaction.canonical_id),
+            func.sum(CanonicalTransaction.pickup_amount),
+            func.sum(case((in_month, 1), else_=0)),
+            func.sum(case((in_month, amount), else_=0)),
+        )
+        .join(VendorUploadBatch, VendorUploadBatch.batch_id == CanonicalTransaction.raw_batch_id)
+        .filter(CanonicalTransaction.source == "VENDOR")
+        # Same as the batch's, but lets Oracle read only the month's partition
+        .filter(CanonicalTransaction.mis_date.between(first_day, last_day))
+        .filter(VendorUploadBatch.mis_date.between(first_day, last_day))
+        .filter(VendorUploadBatch.vendor_id.in_(vendor_ids))
+        .group_by(
+            VendorUploadBatch.vendor_id,
+            CanonicalTransaction.customer_id,
+            CanonicalTransaction.bank_store_code,
+            CanonicalTransaction.vendor_store_code,
+            date_val,
+            CanonicalTransaction.pickup_type,
+        )
+        .all()
+    )
+
+    mappings = _load_mappings(db, vendor_ids) if any(not row[1] for row in rows) else {}
+    totals = {}
+    for vendor_id, customer_id, bank_store_code, vendor_store_code, day, pickup_type, *measures in rows:
+        if not customer_id:
+            customer_id = _mapped_customer(mappings, vendor_id, bank_store_code, vendor_store_code, day)
+        key = (int(vendor_id), bank_store_code, customer_id or None, pickup_type)
+        entry = totals.setdefault(key, [0, 0.0, 0, 0.0])
+        pickup_count, pickup_amount, remittance_count, remittance_amount = measures
+        entry[0] += int(pickup_count or 0)
+        entry[1] += float(pickup_amount or 0)
+        entry[2] += int(remittance_count or 0)
+        entry[3] += float(remittance_amount or 0)
+    return totals
+
+
+def refresh_month(db, month_key, vendor_ids=None) -> int:
+    """
+    Rebuild the rollup slice for month_key (only vendor_ids when given) in db's current
+    transaction; the caller commits. Returns the number of rollup rows written.
+    """
+    if vendor_ids is None:
+        first_day, last_day = month_bounds(month_key)
+        vendor_ids = _slice_vendors(db, month_key, first_day, last_day)
+    vendor_ids = sorted({int(v) for v in vendor_ids})
+    if not vendor_ids:
+        return 0
+
+    # Serialise concurrent refreshes of the same vendor slices
+    db.query(VendorMaster.vendor_id).filter(VendorMaster.vendor_id.in_(vendor_ids)).with_for_update().all()
+
+    totals = slice_totals(db, month_key, vendor_ids)
+    db.query(MonthlyPickupRollup).filter(MonthlyPickupRollup.month_key == month_key).filter(
+        MonthlyPickupRollup.vendor_id.in_(vendor_ids)
+    ).delete(synchronize_session=False)
+    add_with_ids(
+        db,
+        (
+            MonthlyPickupRollup(
+                month_key=month_key,
+                vendor_id=vendor_id,
+                bank_store_code=bank_store_code,
+                customer_id=customer_id,
+                pickup_type=pickup_type,
+                pickup_count=measures[0],
+                pickup_amount=round(measures[1], 2),
+                remittance_count=measures[2],
+                remittance_amount=round(measures[3], 2),
+            )
+            for (vendor_id, bank_store_code, customer_id, pickup_type), measures in totals.items()
+        ),
+    )
+    db.flush()
+    return len(totals)
+
+
+def refresh_stores(db, vendor_id, bank_store_codes) -> list[str]:
+    """
+    Rebuild the vendor's slices in every month with rollup rows for bank_store_codes, after
+    a mapping change for those stores, in db's current transaction; the caller commits.
+    Returns the month keys refreshed.
+    """
+    month_keys = [
+        row[0]
+        for row in db.query(MonthlyPickupRollup.month_key)
+        .filter(MonthlyPickupRollup.vendor_id == vendor_id)
+        .filter(MonthlyPickupRollup.bank_store_code.in_(set(bank_store_codes)))
+        .distinct()
+        .order_by(MonthlyPickupRollup.month_key)
+        .all()
+    ]
+    for month_key in month_keys:
+        refresh_month(db, month_key, [vendor_id])
+    return month_keys
+
+
+def missing_vendors(db, month_key) -> list[int]:
+    """Vendors with a batch in the month but no rollup rows (data loaded before rollups existed)."""
+    first_day, last_day = month_bounds(month_key)
+    batch_vendors = {
+        int(row[0])
+        for row in db.query(VendorUploadBatch.vendor_id)
+        .filter(VendorUploadBatch.mis_date.between(first_day, last_day))
+        .distinct()
+        .all()
+    }
+    if not batch_vendors:
+        return []
+    rolled_up = {
+        int(row[0])
+        for row in db.query(MonthlyPickupRollup.vendor_id)
+        .filter(MonthlyPickupRollup.month_key == month_key)
+        .distinct()
+        .all()
+    }
+    return sorted(batch_vendors - rolled_up)
+
+
+def ensure_month(db, month_key) -> list[int]:
+    """
+    Build the month's missing slices (missing_vendors) in their own committed transaction.
+    Returns the vendor ids refreshed.
+    """
+    missing = missing_vendors(db, month_key)
+    if not missing:
+        return []
+    session = SessionLocal()
+    try:
+        refresh_month(session, month_key, missing)
+        session.commit()
+    finally:
+        session.close()
+    return missing
+
+
+def rebuild_range(month_keys) -> list[dict]:
+    """Rebuild whole months, one committed transaction per month."""
+    results = []
+    for month_key in month_keys:
+        db = SessionLocal()
+        try:
+            rows = refresh_month(db, month_key)
+            db.commit()
+            results.append({"month_key": month_key, "rows": rows})
+            logger.info("Rebuilt rollups for %s: %s rows", month_key, rows)
+        finally:
+            db.close()
+    return results
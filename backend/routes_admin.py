@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
+import cleanup_engine
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from db import get_db
 from models import (
+    AdminCleanupRun,
     ApprovalRequest,
     AuditLog,
     BankStoreMaster,
@@ -16,10 +18,12 @@ from models import (
     FinacleRawStaging,
     FinacleUploadBatch,
     MonthLock,
+    MonthlyPickupRollup,
     PickupRulesMaster,
     ReconciliationCorrection,
     ReconciliationResult,
     RemittanceEntry,
+    StagingArchive,
     VendorChargeMaster,
     VendorChargeSummary,
     VendorFileFormatConfig,
@@ -36,11 +40,57 @@ from schemas import AdminCleanupRequest, AdminResetAllRequest
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+# Everything but user accounts, children before parents (FK order)
+RESET_ALL_ORDER = [
+    MonthlyPickupRollup,
+    RemittanceEntry,
+    CanonicalTransaction,
+    ReconciliationCorrection,
+    ExceptionRecord,
+    ReconciliationResult,
+    ApprovalRequest,
+    StagingArchive,
+    VendorRawStaging,
+    VendorInvalidRecord,
+    VendorUploadBatch,
+    FinacleRawStaging,
+    FinacleInvalidRecord,
+    FinacleUploadBatch,
+    VendorStoreMappingMaster,
+    VendorFileFormatHeaderMapping,
+    VendorFileFormatConfig,
+    VendorChargeMaster,
+    CustomerChargeSlab,
+    VendorChargeSummary,
+    CustomerChargeSummary,
+    VendorMaster,
+    BankStoreMaster,
+    WaiverMaster,
+    PickupRulesMaster,
+    ChargeConfigurationMaster,
+    AuditLog,
+    MonthLock,
+]
+
+
+def _finished(result: dict) -> dict:
+    """Response of a cleanup run, or an error pointing at its resume endpoint if it stopped."""
+    if result["status"] != "COMPLETED":
+        raise HTTPException(
+            status_code=500,
+            detail=(
+                f"Cleanup run {result['run_id']} stopped at {result['current_table']}: {result['error']}. "
+                f"Rows deleted so far are committed; resume with POST /api/admin/cleanup/runs/{result['run_id']}/resume"
+            ),
+        )
+    return {"run_id": result["run_id"], "deleted": result["deleted"]}
+
 
 @router.post("/cleanup")
 def cleanup_data(
     payload: AdminCleanupRequest,
     user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
 ):
     if not payload.reason or not payload.reason.strip():
         raise HTTPException(status_code=400, detail="Reason is required")
@@ -56,72 +106,67 @@ def cleanup_data(
     if "ALL" in targets:
         targets = {"UPLOADS", "TRANSACTIONS", "RECONCILIATION", "APPROVALS", "VENDORS_STORES", "MASTERS", "CHARGES"}
 
-    db = SessionLocal()
-    deleted = {}
-
-    def delete_model(model, label=None):
-        count = db.query(model).delete(synchronize_session=False)
-        deleted[label or model.__tablename__] = count
+    models = []
+    if "UPLOADS" in targets or "TRANSACTIONS" in targets:
+        # Rollups mirror vendor transactions joined to their batches
+        models.append(MonthlyPickupRollup)
 
     if "UPLOADS" in targets:
-        delete_model(VendorRawStaging)
-        delete_model(VendorInvalidRecord)
-        delete_model(VendorUploadBatch)
-        delete_model(FinacleRawStaging)
-        delete_model(FinacleInvalidRecord)
-        delete_model(FinacleUploadBatch)
+        models += [
+            StagingArchive,
+            VendorRawStaging,
+            VendorInvalidRecord,
+            VendorUploadBatch,
+            FinacleRawStaging,
+            FinacleInvalidRecord,
+            FinacleUploadBatch,
+        ]
 
     if "TRANSACTIONS" in targets:
-        delete_model(RemittanceEntry)
-        delete_model(CanonicalTransaction)
+        models += [RemittanceEntry, CanonicalTransaction]
 
     if "RECONCILIATION" in targets:
-        delete_model(ExceptionRecord)
-        delete_model(ReconciliationCorrection)
-        delete_model(ReconciliationResult)
+        models += [ExceptionRecord, ReconciliationCorrection, ReconciliationResult]
 
     if "APPROVALS" in targets:
-        delete_model(ApprovalRequest)
+        models.append(ApprovalRequest)
 
     if "STORE_MAPPING" in targets:
-        delete_model(VendorStoreMappingMaster)
+        models.append(VendorStoreMappingMaster)
 
     if "VENDORS_STORES" in targets:
-        delete_model(VendorStoreMappingMaster)
-        delete_model(VendorFileFormatHeaderMapping)
-        delete_model(VendorFileFormatConfig)
-        delete_model(VendorChargeMaster)
-        delete_model(CustomerChargeSlab)
-        delete_model(VendorMaster)
-        delete_model(BankStoreMaster)
+        models += [
+            VendorStoreMappingMaster,
+            VendorFileFormatHeaderMapping,
+            VendorFileFormatConfig,
+            VendorChargeMaster,
+            CustomerChargeSlab,
+            VendorMaster,
+            BankStoreMaster,
+        ]
 
     if "MASTERS" in targets:
-        delete_model(WaiverMaster)
-        delete_model(PickupRulesMaster)
-        delete_model(ChargeConfigurationMaster)
+        models += [WaiverMaster, PickupRulesMaster, ChargeConfigurationMaster]
 
     if "CHARGES" in targets:
-        delete_model(CustomerChargeSummary)
-        delete_model(VendorChargeSummary)
+        models += [CustomerChargeSummary, VendorChargeSummary]
 
-    log_audit(
+    run = cleanup_engine.start_run(
         db,
-        "ADMIN_CLEANUP",
-        "BATCH",
-        "DELETE",
-        None,
-        f"targets={sorted(list(targets))}, reason={payload.reason}",
+        "CLEANUP",
+        [model.__tablename__ for model in models],
         user.employee_id,
+        targets=sorted(targets),
+        reason=payload.reason,
     )
-    db.commit()
-    db.close()
-    return {"deleted": deleted}
+    return _finished(cleanup_engine.execute(run.run_id))
 
 
 @router.post("/reset-all")
 def reset_all(
     payload: AdminResetAllRequest,
     user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Reset application completely: all data, audit logs, month locks. User accounts preserved."""
     if not payload.reason or not payload.reason.strip():
@@ -132,44 +177,45 @@ def reset_all(
             detail='Type "RESET ALL" (exactly) to proceed. This clears all application data.',
         )
 
-    db = SessionLocal()
-    deleted = {}
-
-    def delete_model(model, label=None):
-        count = db.query(model).delete(synchronize_session=False)
-        deleted[label or model.__tablename__] = count
-
-    # Order respects FK constraints
-    delete_model(RemittanceEntry)
-    delete_model(CanonicalTransaction)
-    delete_model(ReconciliationCorrection)
-    delete_model(ExceptionRecord)
-    delete_model(ReconciliationResult)
-    delete_model(ApprovalRequest)
-    delete_model(VendorRawStaging)
-    delete_model(VendorInvalidRecord)
-    delete_model(VendorUploadBatch)
-    delete_model(FinacleRawStaging)
-    delete_model(FinacleInvalidRecord)
-    delete_model(FinacleUploadBatch)
-    delete_model(VendorStoreMappingMaster)
-    delete_model(VendorFileFormatHeaderMapping)
-    delete_model(VendorFileFormatConfig)
-    delete_model(VendorChargeMaster)
-    delete_model(CustomerChargeSlab)
-    delete_model(VendorChargeSummary)
-    delete_model(CustomerChargeSummary)
-    delete_model(VendorMaster)
-    delete_model(BankStoreMaster)
-    delete_model(WaiverMaster)
-    delete_model(PickupRulesMaster)
-    delete_model(ChargeConfigurationMaster)
-    delete_model(AuditLog)
-    delete_model(MonthLock)
-
-    db.commit()
-    db.close()
+    run = cleanup_engine.start_run(
+        db,
+        "RESET_ALL",
+        [model.__tablename__ for model in RESET_ALL_ORDER],
+        user.employee_id,
+        reason=payload.reason,
+    )
+    result = _finished(cleanup_engine.execute(run.run_id))
     return {
-        "deleted": deleted,
+        **result,
         "message": "Application reset complete. Refresh the page to clear client cache.",
     }
+
+
+@router.get("/cleanup/runs")
+def list_cleanup_runs(
+    limit: int = 20,
+    user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
+):
+    runs = db.query(AdminCleanupRun).order_by(AdminCleanupRun.run_id.desc()).limit(limit).all()
+    return [cleanup_engine.run_status(run) for run in runs]
+
+
+@router.get("/cleanup/runs/{run_id}")
+def get_cleanup_run(
+    run_id: int,
+    user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
+):
+    run = db.get(AdminCleanupRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Cleanup run not found")
+    return cleanup_engine.run_status(run)
+
+
+@router.post("/cleanup/runs/{run_id}/resume")
+def resume_cleanup_run(
+    run_id: int,
+    user: AuthUser = Depends(require_roles("ADMIN")),
+):
+    return _finished(cleanup_engine.resume(run_id))
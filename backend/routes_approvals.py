@@ -1,11 +1,13 @@
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest
+from queries import clarifications, pending_approvals
 from schemas import ApprovalDecision, CommentRequest
 from utils_approval import append_comment_history
 
@@ -14,23 +16,18 @@ router = APIRouter(prefix="/api/approvals", tags=["approvals"])
 
 
 @router.get("/pending/count")
-def pending_count(user: AuthUser = Depends(require_roles("CHECKER", "ADMIN"))):
+def pending_count(
+    user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     """Return count of pending approvals for dashboard notification badge."""
-    db = SessionLocal()
-    count = db.query(ApprovalRequest).filter(ApprovalRequest.status == "PENDING").count()
-    db.close()
+    count = pending_approvals(db).count()
     return {"count": count}
 
 
 @router.get("/pending")
-def list_pending(user: AuthUser = Depends(require_roles("CHECKER", "ADMIN"))):
-    db = SessionLocal()
-    approvals = (
-        db.query(ApprovalRequest)
-        .filter(ApprovalRequest.status == "PENDING")
-        .order_by(ApprovalRequest.created_date.desc())
-        .all()
-    )
+def list_pending(user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")), db: Session = Depends(get_db)):
+    approvals = pending_approvals(db).order_by(ApprovalRequest.created_date.desc()).all()
     payload = [
         {
             "approval_id": item.approval_id,
@@ -47,8 +44,7 @@ def list_pending(user: AuthUser = Depends(require_roles("CHECKER", "ADMIN"))):
         }
         for item in approvals
     ]
-    log_audit(
-        db,
+    enqueue_audit(
         entity_type="APPROVAL",
         entity_id="LIST",
         action="VIEW",
@@ -56,35 +52,25 @@ def list_pending(user: AuthUser = Depends(require_roles("CHECKER", "ADMIN"))):
         new_data=f"count={len(payload)}",
         changed_by=user.employee_id,
     )
-    db.commit()
-    db.close()
     return payload
 
 
 @router.get("/clarifications/count")
-def clarifications_count(user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def clarifications_count(
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     """Return count of clarification requests for the current maker (dashboard notification)."""
-    db = SessionLocal()
-    count = (
-        db.query(ApprovalRequest)
-        .filter(ApprovalRequest.status == "CLARIFICATION")
-        .filter(ApprovalRequest.maker_id == user.employee_id)
-        .count()
-    )
-    db.close()
+    count = clarifications(db, user.employee_id).count()
     return {"count": count}
 
 
 @router.get("/clarifications")
-def list_clarifications(user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
-    db = SessionLocal()
-    approvals = (
-        db.query(ApprovalRequest)
-        .filter(ApprovalRequest.status == "CLARIFICATION")
-        .filter(ApprovalRequest.maker_id == user.employee_id)
-        .order_by(ApprovalRequest.created_date.desc())
-        .all()
-    )
+def list_clarifications(
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
+    approvals = clarifications(db, user.employee_id).order_by(ApprovalRequest.created_date.desc()).all()
     payload = [
         {
             "approval_id": item.approval_id,
@@ -98,8 +84,7 @@ def list_clarifications(user: AuthUser = Depends(require_roles("MAKER", "ADMIN")
         }
         for item in approvals
     ]
-    log_audit(
-        db,
+    enqueue_audit(
         entity_type="APPROVAL",
         entity_id="CLARIFICATIONS",
         action="VIEW",
@@ -107,8 +92,6 @@ def list_clarifications(user: AuthUser = Depends(require_roles("MAKER", "ADMIN")
         new_data=f"count={len(payload)}",
         changed_by=user.employee_id,
     )
-    db.commit()
-    db.close()
     return payload
 
 
@@ -117,14 +100,12 @@ def request_clarification(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval:
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     if approval.status != "PENDING":
-        db.close()
         raise HTTPException(status_code=400, detail="Only pending approvals can be clarified")
 
     approval.status = "CLARIFICATION"
@@ -137,7 +118,6 @@ def request_clarification(
 
     log_audit(db, "APPROVAL", approval_id, "CLARIFY", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "CLARIFICATION"}
 
 
@@ -146,20 +126,16 @@ def resubmit_approval(
     approval_id: int,
     payload: CommentRequest,
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval:
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     if approval.maker_id != user.employee_id:
-        db.close()
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
     if approval.status != "CLARIFICATION":
-        db.close()
         raise HTTPException(status_code=400, detail="Only clarification requests can be resubmitted")
     if not payload.comment or not payload.comment.strip():
-        db.close()
         raise HTTPException(status_code=400, detail="Comment required")
 
     approval.status = "PENDING"
@@ -172,5 +148,4 @@ def resubmit_approval(
 
     log_audit(db, "APPROVAL", approval_id, "RESUBMIT", None, None, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "PENDING"}
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+
+from auth import AuthUser, require_roles
+from audit import AUDIT_LOG_KEY, enqueue_audit, filter_audit_query
+from db import get_db
+from models import AuditLog
+from report_export import decode_cursor, keyset_iter, preview_limit, preview_page, row_key
+
+
+router = APIRouter(prefix="/api/audit", tags=["audit"])
+
+
+def _parse_date(value: str | None, name: str):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM-DD")
+
+
+@router.get("/logs")
+def search_audit_logs(
+    response: Response,
+    entity_type: str | None = None,
+    entity_id: int | None = None,
+    action: str | None = None,
+    changed_by: str | None = None,
+    from_date: str | None = None,
+    to_date: str | None = None,
+    cursor: str | None = None,
+    limit: int = 100,
+    user: AuthUser = Depends(require_roles("ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    """
+    Audit entries matching the filters, newest first, one page at a time; the next page's
+    cursor is in the X-Next-Cursor header. from_date/to_date (inclusive) limit the search
+    to those months' partitions.
+    """
+    limit = preview_limit(limit)
+    after = decode_cursor(cursor)
+    changed_from = _parse_date(from_date, "from_date")
+    changed_to = _parse_date(to_date, "to_date")
+    if changed_from and changed_to and changed_from > changed_to:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date")
+
+    query = filter_audit_query(
+        db.query(AuditLog),
+        entity_type=entity_type,
+        entity_id=entity_id,
+        action=action,
+        changed_by=changed_by,
+        changed_from=changed_from,
+        changed_before=changed_to + timedelta(days=1) if changed_to else None,
+    )
+    rows = (
+        (
+            row_key(r, AUDIT_LOG_KEY),
+            {
+                "audit_id": r.audit_id,
+                "entity_type": r.entity_type,
+                "entity_id": r.entity_id,
+                "action": r.action,
+                "old_data": r.old_data,
+                "new_data": r.new_data,
+                "changed_by": r.changed_by,
+                "changed_at": r.changed_at,
+            },
+        )
+        for r in keyset_iter(query, AUDIT_LOG_KEY, limit + 1, descending=True, after=after)
+    )
+    result = preview_page(rows, limit, response)
+    enqueue_audit("AUDIT_LOG", "SEARCH", "VIEW", None, f"count={len(result)}", user.employee_id)
+    return result
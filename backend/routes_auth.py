@@ -1,11 +1,12 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
 
-from auth import AuthUser, authenticate, get_current_user, issue_token
-from audit import log_audit
-from db import SessionLocal
+from auth import AuthUser, authenticate, bearer_token, get_current_user, issue_token, revoke_token
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import UserAccount
 
 
@@ -18,8 +19,7 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/login")
-def login(payload: LoginRequest):
-    db = SessionLocal()
+def login(payload: LoginRequest, db: Session = Depends(get_db)):
     user = authenticate(db, payload.employeeId, payload.password)
     if not user:
         log_audit(
@@ -32,7 +32,6 @@ def login(payload: LoginRequest):
             changed_by=payload.employeeId,
         )
         db.commit()
-        db.close()
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     token = issue_token(user)
     db_user = (
@@ -52,22 +51,33 @@ def login(payload: LoginRequest):
         changed_by=user.employee_id,
     )
     db.commit()
-    db.close()
     return {"token": token, "employeeId": user.employee_id, "name": user.name, "role": user.role}
 
 
 @router.get("/me")
 def me(user: AuthUser = Depends(get_current_user)):
-    db = SessionLocal()
+    enqueue_audit(
+        entity_type="AUTH",
+        entity_id=None,
+        action="ME",
+        old_data=None,
+        new_data=f"employee_id={user.employee_id}",
+        changed_by=user.employee_id,
+    )
+    return {"employeeId": user.employee_id, "name": user.name, "role": user.role}
+
+
+@router.post("/logout")
+def logout(request: Request, user: AuthUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    revoke_token(bearer_token(request))
     log_audit(
         db,
         entity_type="AUTH",
         entity_id=None,
-        action="ME",
+        action="LOGOUT",
         old_data=None,
         new_data=f"employee_id={user.employee_id}",
         changed_by=user.employee_id,
     )
     db.commit()
-    db.close()
-    return {"employeeId": user.employee_id, "name": user.name, "role": user.role}
+    return {"status": "ok"}
@@ -2,10 +2,11 @@ import json
 from datetime import datetime, timedelta, date
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest, BankStoreMaster
 from schemas import ApprovalDecision, BankStoreDeactivateRequest, BankStoreRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history, safe_json_loads_clob
@@ -19,8 +20,8 @@ router = APIRouter(prefix="/api/bank-stores", tags=["bank-stores"])
 def list_bank_stores(
     include_inactive: bool = False,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     query = db.query(BankStoreMaster)
     if not include_inactive:
         query = query.filter(BankStoreMaster.status == "ACTIVE")
@@ -38,22 +39,22 @@ def list_bank_stores(
         }
         for s in stores
     ]
-    log_audit(db, "BANK_STORE_MASTER", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("BANK_STORE_MASTER", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("/requests")
-def request_bank_store(payload: BankStoreRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def request_bank_store(
+    payload: BankStoreRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     enforce_month_unlocked(db, payload.effective_from.strftime("%Y%m"))
     existing = db.query(BankStoreMaster).filter(BankStoreMaster.bank_store_code == payload.bank_store_code).first()
     if existing:
-        db.close()
         raise HTTPException(status_code=400, detail="Bank store code already exists or pending approval")
 
     store = BankStoreMaster(
@@ -87,7 +88,6 @@ def request_bank_store(payload: BankStoreRequest, user: AuthUser = Depends(requi
     approval_id = approval.approval_id
     store_id = store.store_id
     db.commit()
-    db.close()
     return {"approval_id": approval_id, "store_id": store_id}
 
 
@@ -96,18 +96,16 @@ def approve_bank_store(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "BANK_STORE_MASTER":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
     db.refresh(approval)  # Force load CLOB columns (helps Oracle on Windows)
     store = db.query(BankStoreMaster).filter(BankStoreMaster.store_id == approval.entity_id).first()
     if not store:
-        db.close()
         raise HTTPException(status_code=404, detail="Store not found")
 
     proposed = safe_json_loads_clob(approval.proposed_data, raise_on_error=False)
@@ -140,7 +138,6 @@ def approve_bank_store(
 
     log_audit(db, "BANK_STORE_MASTER", store.store_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -149,11 +146,10 @@ def reject_bank_store(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "BANK_STORE_MASTER":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -167,7 +163,6 @@ def reject_bank_store(
 
     log_audit(db, "BANK_STORE_MASTER", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
 
 
@@ -176,6 +171,7 @@ def request_deactivate_store(
     store_id: int,
     payload: BankStoreDeactivateRequest,
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Request store deactivation. Requires maker-checker approval."""
     if payload.store_id != store_id:
@@ -183,13 +179,10 @@ def request_deactivate_store(
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     store = db.query(BankStoreMaster).filter(BankStoreMaster.store_id == store_id).first()
     if not store:
-        db.close()
         raise HTTPException(status_code=404, detail="Store not found")
     if store.status != "ACTIVE":
-        db.close()
         raise HTTPException(status_code=400, detail="Only ACTIVE stores can be deactivated")
 
     original_data = json.dumps(
@@ -218,5 +211,4 @@ def request_deactivate_store(
     approval_id = approval.approval_id
     log_audit(db, "BANK_STORE_MASTER", store_id, "DEACTIVATE_REQUEST", None, payload.reason, user.employee_id)
     db.commit()
-    db.close()
     return {"approval_id": approval_id}
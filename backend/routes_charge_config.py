@@ -2,10 +2,11 @@ import json
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest, ChargeConfigurationMaster
 from schemas import ApprovalDecision, ChargeConfigRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history
@@ -15,8 +16,10 @@ router = APIRouter(prefix="/api/charge-configs", tags=["charge-configs"])
 
 
 @router.get("")
-def list_charge_configs(user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR"))):
-    db = SessionLocal()
+def list_charge_configs(
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
     configs = db.query(ChargeConfigurationMaster).filter(ChargeConfigurationMaster.status == "ACTIVE").all()
     result = [
         {
@@ -27,18 +30,19 @@ def list_charge_configs(user: AuthUser = Depends(require_roles("MAKER", "CHECKER
         }
         for c in configs
     ]
-    log_audit(db, "CHARGE_CONFIG", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("CHARGE_CONFIG", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("/requests")
-def request_charge_config(payload: ChargeConfigRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def request_charge_config(
+    payload: ChargeConfigRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     config = ChargeConfigurationMaster(
         config_code=payload.config_code,
         config_name=payload.config_name,
@@ -64,7 +68,6 @@ def request_charge_config(payload: ChargeConfigRequest, user: AuthUser = Depends
     db.add(approval)
     log_audit(db, "CHARGE_CONFIG", config.config_id, "REQUEST", None, payload.model_dump(), user.employee_id)
     db.commit()
-    db.close()
     return {"approval_id": approval.approval_id, "config_id": config.config_id}
 
 
@@ -73,17 +76,15 @@ def approve_charge_config(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "CHARGE_CONFIG":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
     config = db.query(ChargeConfigurationMaster).filter(ChargeConfigurationMaster.config_id == approval.entity_id).first()
     if not config:
-        db.close()
         raise HTTPException(status_code=404, detail="Config not found")
 
     active = (
@@ -110,7 +111,6 @@ def approve_charge_config(
 
     log_audit(db, "CHARGE_CONFIG", config.config_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -119,11 +119,10 @@ def reject_charge_config(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "CHARGE_CONFIG":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -137,5 +136,4 @@ def reject_charge_config(
 
     log_audit(db, "CHARGE_CONFIG", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
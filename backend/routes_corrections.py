@@ -2,11 +2,13 @@ import json
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
 from audit import log_audit
-from db import SessionLocal
-from models import ApprovalRequest, ExceptionRecord, ReconciliationCorrection, ReconciliationResult
+from db import get_db
+from models import ApprovalRequest, ReconciliationCorrection, ReconciliationResult
+from queries import open_exceptions
 from schemas import ApprovalDecision, CorrectionRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history, safe_json_loads_clob
 from utils_month_lock import enforce_month_unlocked
@@ -16,18 +18,20 @@ router = APIRouter(prefix="/api/reconciliation/corrections", tags=["corrections"
 
 
 @router.post("/requests")
-def request_correction(payload: CorrectionRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def request_correction(
+    payload: CorrectionRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     recon = (
         db.query(ReconciliationResult)
         .filter(ReconciliationResult.recon_id == payload.recon_id)
         .first()
     )
     if not recon:
-        db.close()
         raise HTTPException(status_code=404, detail="Reconciliation record not found")
     base_date = recon.remittance_date or recon.pickup_date
     if base_date:
@@ -76,22 +80,22 @@ def request_correction(payload: CorrectionRequest, user: AuthUser = Depends(requ
         user.employee_id,
     )
     db.commit()
-    db.close()
     return {"approval_id": approval_id, "correction_id": correction_id}
 
 
 @router.get("/by-approval/{approval_id}")
-def get_by_approval(approval_id: int, user: AuthUser = Depends(require_roles("CHECKER", "ADMIN"))):
-    db = SessionLocal()
+def get_by_approval(
+    approval_id: int,
+    user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     correction = (
         db.query(ReconciliationCorrection)
         .filter(ReconciliationCorrection.approval_id == approval_id)
         .first()
     )
     if not correction:
-        db.close()
         raise HTTPException(status_code=404, detail="Correction not found")
-    db.close()
     return {"correction_id": correction.correction_id}
 
 
@@ -100,11 +104,10 @@ def approve_correction(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "RECONCILIATION_CORRECTION":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -114,7 +117,6 @@ def approve_correction(
         .first()
     )
     if not correction:
-        db.close()
         raise HTTPException(status_code=404, detail="Correction not found")
 
     recon = (
@@ -123,7 +125,6 @@ def approve_correction(
         .first()
     )
     if not recon:
-        db.close()
         raise HTTPException(status_code=404, detail="Reconciliation record not found")
 
     base_date = recon.remittance_date or recon.pickup_date
@@ -167,18 +168,13 @@ def approve_correction(
             recon.reason = "Amount mismatch after correction"
 
         if recon.status == "MATCHED":
-            (
-                db.query(ExceptionRecord)
-                .filter(ExceptionRecord.recon_id == recon.recon_id)
-                .filter(ExceptionRecord.status == "OPEN")
-                .update(
-                    {
-                        "status": "RESOLVED",
-                        "resolved_by": decision.checker_id,
-                        "resolved_date": datetime.utcnow(),
-                        "remarks": "Auto-resolved after amount correction",
-                    }
-                )
+            open_exceptions(db, recon.recon_id).update(
+                {
+                    "status": "RESOLVED",
+                    "resolved_by": decision.checker_id,
+                    "resolved_date": datetime.utcnow(),
+                    "remarks": "Auto-resolved after amount correction",
+                }
             )
 
         log_audit(
@@ -219,7 +215,6 @@ def approve_correction(
         user.employee_id,
     )
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -228,11 +223,10 @@ def reject_correction(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "RECONCILIATION_CORRECTION":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -264,5 +258,4 @@ def reject_correction(
         user.employee_id,
     )
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
@@ -3,9 +3,10 @@
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from db import SessionLocal
+from db import get_db
 from models import CustomerChargeSlab, VendorMaster
 
 
@@ -16,9 +17,9 @@ router = APIRouter(prefix="/api/customer-charge-slabs", tags=["customer-charge-s
 def list_customer_charge_slabs(
     vendor_id: int | None = None,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
     """List customer charge slabs, optionally filtered by vendor."""
-    db = SessionLocal()
     q = db.query(CustomerChargeSlab, VendorMaster.vendor_name, VendorMaster.vendor_code).outerjoin(
         VendorMaster, CustomerChargeSlab.vendor_id == VendorMaster.vendor_id
     )
@@ -42,7 +43,6 @@ def list_customer_charge_slabs(
         }
         for s, name, code in rows
     ]
-    db.close()
     return result
 
 
@@ -50,6 +50,7 @@ def list_customer_charge_slabs(
 def create_customer_charge_slab(
     payload: dict,
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Create a customer charge slab (admin/maker)."""
     vendor_id = payload.get("vendor_id")
@@ -62,7 +63,6 @@ def create_customer_charge_slab(
     if vendor_id is None or amount_from is None or amount_to is None or charge_amount is None:
         raise HTTPException(status_code=400, detail="vendor_id, amount_from, amount_to, charge_amount required")
 
-    db = SessionLocal()
     try:
         eff_from = (
             datetime.strptime(str(effective_from), "%Y-%m-%d").date()
@@ -92,7 +92,6 @@ def create_customer_charge_slab(
         "amount_to": float(slab.amount_to),
         "charge_amount": float(slab.charge_amount),
     }
-    db.close()
     return result
 
 
@@ -100,14 +99,12 @@ def create_customer_charge_slab(
 def delete_customer_charge_slab(
     slab_id: int,
     user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Soft-delete (set INACTIVE) a customer charge slab.""" 
-    db = SessionLocal()
     slab = db.query(CustomerChargeSlab).filter(CustomerChargeSlab.slab_id == slab_id).first()
     if not slab:
-        db.close()
         raise HTTPException(status_code=404, detail="Slab not found")
     slab.status = "INACTIVE"
     db.commit()
-    db.close()
     return {"status": "ok"}
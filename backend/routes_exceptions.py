@@ -1,12 +1,14 @@
 import json
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest, ExceptionRecord, ReconciliationResult
+from report_export import decode_cursor, keyset_iter, preview_limit, preview_page, row_key
 from schemas import ApprovalDecision, ExceptionRequest, ExceptionResolutionRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history
 from utils_month_lock import enforce_month_unlocked
@@ -15,48 +17,50 @@ from utils_month_lock import enforce_month_unlocked
 router = APIRouter(prefix="/api/exceptions", tags=["exceptions"])
 
 
+EXCEPTIONS_KEY = [ExceptionRecord.exception_id]
+
+
 @router.get("")
 def list_exceptions(
+    response: Response,
     status_filter: str | None = None,
+    cursor: str | None = None,
+    limit: int = 100,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    recon = (
-        db.query(ReconciliationResult)
-        .filter(ReconciliationResult.recon_id == payload.recon_id)
-        .first()
-    )
-    if not recon:
-        db.close()
-        raise HTTPException(status_code=404, detail="Reconciliation record not found")
-    base_date = recon.remittance_date or recon.pickup_date
-    if base_date:
-        enforce_month_unlocked(db, base_date.strftime("%Y%m"))
+    """Newest first, one page at a time; the next page's cursor is in the X-Next-Cursor header."""
+    limit = preview_limit(limit)
+    after = decode_cursor(cursor)
     query = db.query(ExceptionRecord)
     if status_filter:
         query = query.filter(ExceptionRecord.status == status_filter)
-    rows = query.order_by(ExceptionRecord.exception_id.desc()).all()
-    result = [
-        {
-            "exception_id": r.exception_id,
-            "recon_id": r.recon_id,
-            "exception_type": r.exception_type,
-            "status": r.status,
-        }
-        for r in rows
-    ]
-    log_audit(db, "EXCEPTION", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    rows = (
+        (
+            row_key(r, EXCEPTIONS_KEY),
+            {
+                "exception_id": r.exception_id,
+                "recon_id": r.recon_id,
+                "exception_type": r.exception_type,
+                "status": r.status,
+            },
+        )
+        for r in keyset_iter(query, EXCEPTIONS_KEY, limit + 1, descending=True, after=after)
+    )
+    result = preview_page(rows, limit, response)
+    enqueue_audit("EXCEPTION", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("")
-def create_exception(payload: ExceptionRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def create_exception(
+    payload: ExceptionRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     record = ExceptionRecord(
         recon_id=payload.recon_id,
         exception_type=payload.exception_type,
@@ -67,20 +71,19 @@ def create_exception(payload: ExceptionRequest, user: AuthUser = Depends(require
     db.add(record)
     log_audit(db, "EXCEPTION", payload.recon_id, "CREATE", None, payload.model_dump(), user.employee_id)
     db.commit()
-    db.close()
     return {"exception_id": record.exception_id, "status": record.status}
 
 
 @router.post("/requests")
 def request_resolution(
-    payload: ExceptionResolutionRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))
+    payload: ExceptionResolutionRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
-    db = SessionLocal()
     record = db.query(ExceptionRecord).filter(ExceptionRecord.exception_id == payload.exception_id).first()
     if not record:
-        db.close()
         raise HTTPException(status_code=404, detail="Exception not found")
     recon = (
         db.query(ReconciliationResult)
@@ -105,7 +108,6 @@ def request_resolution(
     db.add(approval)
     log_audit(db, "EXCEPTION", record.exception_id, "REQUEST", None, payload.model_dump(), user.employee_id)
     db.commit()
-    db.close()
     return {"approval_id": approval.approval_id}
 
 
@@ -114,17 +116,15 @@ def approve_resolution(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "EXCEPTION_RESOLUTION":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
     record = db.query(ExceptionRecord).filter(ExceptionRecord.exception_id == approval.entity_id).first()
     if not record:
-        db.close()
         raise HTTPException(status_code=404, detail="Exception not found")
     record.status = "RESOLVED"
     record.resolved_by = decision.checker_id
@@ -138,7 +138,6 @@ def approve_resolution(
     approval.approved_date = datetime.utcnow()
     log_audit(db, "EXCEPTION", record.exception_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -147,11 +146,10 @@ def reject_resolution(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "EXCEPTION_RESOLUTION":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -164,5 +162,4 @@ def reject_resolution(
     approval.approved_date = datetime.utcnow()
     log_audit(db, "EXCEPTION", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
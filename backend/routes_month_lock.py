@@ -1,19 +1,21 @@
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
-from models import ApprovalRequest, MonthLock
+from audit import enqueue_audit, log_audit
+from db import get_db
+from models import MonthLock
+from queries import pending_approvals
+from report_snapshots import freeze_month_task
 
 
 router = APIRouter(prefix="/api/month-locks", tags=["month-locks"])
 
 
 @router.get("")
-def list_locks(user: AuthUser = Depends(require_roles("ADMIN", "AUDITOR"))):
-    db = SessionLocal()
+def list_locks(user: AuthUser = Depends(require_roles("ADMIN", "AUDITOR")), db: Session = Depends(get_db)):
     locks = db.query(MonthLock).order_by(MonthLock.locked_at.desc()).all()
     result = [
         {
@@ -25,27 +27,27 @@ def list_locks(user: AuthUser = Depends(require_roles("ADMIN", "AUDITOR"))):
         }
         for l in locks
     ]
-    log_audit(db, "MONTH_LOCK", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("MONTH_LOCK", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("/lock")
-def lock_month(payload: dict, user: AuthUser = Depends(require_roles("ADMIN"))):
+def lock_month(
+    payload: dict,
+    background_tasks: BackgroundTasks,
+    user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
+):
     month_key = payload.get("month_key")
     if not month_key:
         raise HTTPException(status_code=400, detail="month_key required")
 
-    db = SessionLocal()
-    pending = db.query(ApprovalRequest).filter(ApprovalRequest.status == "PENDING").count()
+    pending = pending_approvals(db).count()
     if pending:
-        db.close()
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Pending approvals exist")
 
     existing = db.query(MonthLock).filter(MonthLock.month_key == month_key).first()
     if existing and existing.status == "LOCKED":
-        db.close()
         raise HTTPException(status_code=409, detail="Month already locked")
 
     lock = MonthLock(
@@ -57,5 +59,6 @@ def lock_month(payload: dict, user: AuthUser = Depends(require_roles("ADMIN"))):
     db.add(lock)
     log_audit(db, "MONTH_LOCK", month_key, "LOCK", None, None, user.employee_id)
     db.commit()
-    db.close()
+    # Month data is now immutable: freeze its reports so they are served from the snapshot
+    background_tasks.add_task(freeze_month_task, month_key, user.employee_id)
     return {"status": "LOCKED", "month_key": month_key}
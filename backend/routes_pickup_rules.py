@@ -2,10 +2,11 @@ import json
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest, PickupRulesMaster
 from schemas import ApprovalDecision, PickupRuleRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history
@@ -16,8 +17,10 @@ router = APIRouter(prefix="/api/pickup-rules", tags=["pickup-rules"])
 
 
 @router.get("")
-def list_rules(user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR"))):
-    db = SessionLocal()
+def list_rules(
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
     rules = db.query(PickupRulesMaster).filter(PickupRulesMaster.status == "ACTIVE").all()
     result = [
         {
@@ -29,18 +32,19 @@ def list_rules(user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN
         }
         for r in rules
     ]
-    log_audit(db, "PICKUP_RULE", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("PICKUP_RULE", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("/requests")
-def request_rule(payload: PickupRuleRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def request_rule(
+    payload: PickupRuleRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     rule = PickupRulesMaster(
         pickup_type=payload.pickup_type,
         free_limit=payload.free_limit,
@@ -67,7 +71,6 @@ def request_rule(payload: PickupRuleRequest, user: AuthUser = Depends(require_ro
     approval_id = approval.approval_id
     rule_id = rule.rule_id
     db.commit()
-    db.close()
     return {"approval_id": approval_id, "rule_id": rule_id}
 
 
@@ -76,17 +79,15 @@ def approve_rule(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "PICKUP_RULE":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
     rule = db.query(PickupRulesMaster).filter(PickupRulesMaster.rule_id == approval.entity_id).first()
     if not rule:
-        db.close()
         raise HTTPException(status_code=404, detail="Rule not found")
 
     active = (
@@ -113,7 +114,6 @@ def approve_rule(
 
     log_audit(db, "PICKUP_RULE", rule.rule_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -122,11 +122,10 @@ def reject_rule(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "PICKUP_RULE":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -140,5 +139,4 @@ def reject_rule(
 
     log_audit(db, "PICKUP_RULE", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
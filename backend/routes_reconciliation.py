@@ -2,14 +2,16 @@ import json
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
 from audit import log_audit
-from db import SessionLocal
+from db import get_db
+from id_allocator import add_with_ids
+from queries import batch_transactions, correction_statuses, existing_recon, final_recon_results, open_exceptions
 from utils_approval import safe_json_loads_clob
 from models import (
     BankStoreMaster,
-    CanonicalTransaction,
     ExceptionRecord,
     FinacleUploadBatch,
     MonthLock,
@@ -26,16 +28,17 @@ router = APIRouter(prefix="/api/reconciliation", tags=["reconciliation"])
 
 
 @router.post("/run")
-def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MAKER", "ADMIN", "CHECKER"))):
-    db = SessionLocal()
+def run_reconciliation(
+    payload: dict,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN", "CHECKER")),
+    db: Session = Depends(get_db),
+):
     mis_date_raw = payload.get("misDate")
     if not mis_date_raw:
-        db.close()
         raise HTTPException(status_code=400, detail="misDate is required")
     try:
         mis_date = datetime.strptime(mis_date_raw, "%Y-%m-%d").date()
     except ValueError:
-        db.close()
         raise HTTPException(status_code=400, detail="misDate must be YYYY-MM-DD")
 
     month_key = mis_date.strftime("%Y%m")
@@ -43,7 +46,6 @@ def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MA
         lock.month_key for lock in db.query(MonthLock).filter(MonthLock.status == "LOCKED").all()
     }
     if month_key in locked_months:
-        db.close()
         raise HTTPException(status_code=409, detail="Month is locked for reconciliation")
 
     finacle_batch = (
@@ -52,7 +54,6 @@ def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MA
         .first()
     )
     if not finacle_batch:
-        db.close()
         raise HTTPException(status_code=404, detail="Finacle MIS not uploaded for date")
 
     vendor_batches = (
@@ -61,19 +62,9 @@ def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MA
         .all()
     )
 
-    finacle = (
-        db.query(CanonicalTransaction)
-        .filter(CanonicalTransaction.source == "FINACLE")
-        .filter(CanonicalTransaction.raw_batch_id == finacle_batch.batch_id)
-        .all()
-    )
+    finacle = batch_transactions(db, "FINACLE", [finacle_batch.batch_id], mis_date).all()
     if vendor_batches:
-        vendor = (
-            db.query(CanonicalTransaction)
-            .filter(CanonicalTransaction.source == "VENDOR")
-            .filter(CanonicalTransaction.raw_batch_id.in_([b.batch_id for b in vendor_batches]))
-            .all()
-        )
+        vendor = batch_transactions(db, "VENDOR", [b.batch_id for b in vendor_batches], mis_date).all()
     else:
         vendor = []
 
@@ -137,13 +128,7 @@ def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MA
                 reason = "Amount mismatch"
 
         existing = (
-            db.query(ReconciliationResult)
-            .filter(ReconciliationResult.bank_store_code == bank_store_code)
-            .filter(ReconciliationResult.mis_date == mis_date)
-            .filter(
-                (ReconciliationResult.pickup_date == date_key)
-                | (ReconciliationResult.remittance_date == date_key)
-            )
+            existing_recon(db, bank_store_code, mis_date, date_key)
             .order_by(ReconciliationResult.created_date.desc())
             .first()
         )
@@ -189,19 +174,14 @@ def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MA
                 reason=reason,
                 is_final=0,
             )
-            db.add(recon)
-            db.flush()
+            # Keys are unique per run, so the row needn't be flushed for later lookups
+            add_with_ids(db, [recon])
         extra_by_id[recon.recon_id] = {
             "vendor_names": ", ".join(vendor_names) if vendor_names else None,
             "store_name": store_name,
         }
         if recon.status != "MATCHED":
-            existing_exception = (
-                db.query(ExceptionRecord)
-                .filter(ExceptionRecord.recon_id == recon.recon_id)
-                .filter(ExceptionRecord.status == "OPEN")
-                .first()
-            )
+            existing_exception = open_exceptions(db, recon.recon_id).first()
             if not existing_exception:
                 db.add(
                     ExceptionRecord(
@@ -216,18 +196,13 @@ def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MA
                 existing_exception.exception_type = status
                 existing_exception.details = reason
         else:
-            (
-                db.query(ExceptionRecord)
-                .filter(ExceptionRecord.recon_id == recon.recon_id)
-                .filter(ExceptionRecord.status == "OPEN")
-                .update(
-                    {
-                        "status": "RESOLVED",
-                        "resolved_by": user.employee_id,
-                        "resolved_date": datetime.utcnow(),
-                        "remarks": "Auto-resolved after reconciliation rerun",
-                    }
-                )
+            open_exceptions(db, recon.recon_id).update(
+                {
+                    "status": "RESOLVED",
+                    "resolved_by": user.employee_id,
+                    "resolved_date": datetime.utcnow(),
+                    "remarks": "Auto-resolved after reconciliation rerun",
+                }
             )
         results.append(recon)
 
@@ -246,14 +221,7 @@ def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MA
     recon_ids = [r.recon_id for r in results]
     correction_status_by_recon = {}
     if recon_ids:
-        correction_rows = (
-            db.query(ReconciliationCorrection.recon_id, ApprovalRequest.status, ApprovalRequest.reason)
-            .join(ApprovalRequest, ApprovalRequest.approval_id == ReconciliationCorrection.approval_id)
-            .filter(ReconciliationCorrection.recon_id.in_(recon_ids))
-            .order_by(ReconciliationCorrection.created_date.desc())
-            .all()
-        )
-        for recon_id, approval_status, approval_reason in correction_rows:
+        for recon_id, approval_status, approval_reason in correction_statuses(db, recon_ids):
             if recon_id not in correction_status_by_recon:
                 correction_status_by_recon[recon_id] = {
                     "correction_status": approval_status,
@@ -282,25 +250,23 @@ def run_reconciliation(payload: dict, user: AuthUser = Depends(require_roles("MA
                 "correction_reason": corr.get("correction_reason"),
             }
         )
-    db.close()
     return payload
 
 
 @router.post("/save")
 def save_reconciliation_final(
-    payload: dict, user: AuthUser = Depends(require_roles("MAKER", "ADMIN", "CHECKER"))
+    payload: dict,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN", "CHECKER")),
+    db: Session = Depends(get_db),
 ):
     """Save reconciliation as final when all rows are MATCHED."""
-    db = SessionLocal()
     mis_date_raw = payload.get("misDate")
     recon_ids = payload.get("recon_ids") or []
     if not mis_date_raw:
-        db.close()
         raise HTTPException(status_code=400, detail="misDate is required")
     try:
         mis_date = datetime.strptime(mis_date_raw, "%Y-%m-%d").date()
     except ValueError:
-        db.close()
         raise HTTPException(status_code=400, detail="misDate must be YYYY-MM-DD")
 
     if recon_ids:
@@ -325,12 +291,10 @@ def save_reconciliation_final(
         rows = list(unique_results.values())
 
     if not rows:
-        db.close()
         raise HTTPException(status_code=404, detail="No reconciliation results found for this date")
 
     not_matched = [r for r in rows if r.status != "MATCHED"]
     if not_matched:
-        db.close()
         raise HTTPException(
             status_code=400,
             detail="Cannot save: all rows must be MATCHED. Resolve mismatches first.",
@@ -361,33 +325,23 @@ def save_reconciliation_final(
         changed_by=user.employee_id,
     )
     db.commit()
-    db.close()
     return {"status": "SAVED", "message": f"Reconciliation saved as final for {mis_date_raw}"}
 
 
 @router.get("/results")
-def list_results(misDate: str, user: AuthUser = Depends(require_roles("MAKER", "ADMIN", "CHECKER", "AUDITOR"))):
-    db = SessionLocal()
+def list_results(
+    misDate: str,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN", "CHECKER", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
     try:
         mis_date = datetime.strptime(misDate, "%Y-%m-%d").date()
     except ValueError:
-        db.close()
         raise HTTPException(status_code=400, detail="misDate must be YYYY-MM-DD")
 
     # Filter by mis_date; include legacy rows (mis_date NULL) where pickup/remittance matches
     results = (
-        db.query(ReconciliationResult)
-        .filter(ReconciliationResult.is_final == 1)
-        .filter(
-            (ReconciliationResult.mis_date == mis_date)
-            | (
-                (ReconciliationResult.mis_date.is_(None))
-                & (
-                    (ReconciliationResult.pickup_date == mis_date)
-                    | (ReconciliationResult.remittance_date == mis_date)
-                )
-            )
-        )
+        final_recon_results(db, mis_date, mis_date)
         .order_by(ReconciliationResult.created_date.desc())
         .all()
     )
@@ -454,5 +408,4 @@ def list_results(misDate: str, user: AuthUser = Depends(require_roles("MAKER", "
             }
         )
 
-    db.close()
     return payload
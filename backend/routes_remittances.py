@@ -2,10 +2,11 @@ import json
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest, CanonicalTransaction, RemittanceEntry
 from schemas import ApprovalDecision, RemittanceApprovalRequest, RemittanceRequest, RemittanceStatusRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history, safe_json_loads_clob
@@ -19,8 +20,8 @@ router = APIRouter(prefix="/api/remittances", tags=["remittances"])
 def list_remittances(
     status_filter: str | None = None,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     query = db.query(RemittanceEntry)
     if status_filter:
         query = query.filter(RemittanceEntry.status == status_filter)
@@ -34,18 +35,19 @@ def list_remittances(
         }
         for r in rows
     ]
-    log_audit(db, "REMITTANCE", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("REMITTANCE", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("/initialize")
-def initialize(payload: RemittanceRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def initialize(
+    payload: RemittanceRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     created = 0
     for canonical_id in payload.canonical_ids:
         existing = db.query(RemittanceEntry).filter(RemittanceEntry.canonical_id == canonical_id).first()
@@ -68,18 +70,19 @@ def initialize(payload: RemittanceRequest, user: AuthUser = Depends(require_role
 
     log_audit(db, "REMITTANCE", "INIT", "CREATE", None, f"count={created}", user.employee_id)
     db.commit()
-    db.close()
     return {"created": created}
 
 
 @router.post("/validate")
-def validate_remittance(payload: RemittanceStatusRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def validate_remittance(
+    payload: RemittanceStatusRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
-    db = SessionLocal()
     entry = db.query(RemittanceEntry).filter(RemittanceEntry.remittance_id == payload.remittance_id).first()
     if not entry:
-        db.close()
         raise HTTPException(status_code=404, detail="Remittance not found")
     txn = db.query(CanonicalTransaction).filter(CanonicalTransaction.canonical_id == entry.canonical_id).first()
     if txn and (txn.remittance_date or txn.pickup_date):
@@ -87,18 +90,19 @@ def validate_remittance(payload: RemittanceStatusRequest, user: AuthUser = Depen
     entry.status = "VALIDATED"
     log_audit(db, "REMITTANCE", entry.remittance_id, "VALIDATE", None, None, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "VALIDATED"}
 
 
 @router.post("/close")
-def close_remittance(payload: RemittanceStatusRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def close_remittance(
+    payload: RemittanceStatusRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
-    db = SessionLocal()
     entry = db.query(RemittanceEntry).filter(RemittanceEntry.remittance_id == payload.remittance_id).first()
     if not entry:
-        db.close()
         raise HTTPException(status_code=404, detail="Remittance not found")
     txn = db.query(CanonicalTransaction).filter(CanonicalTransaction.canonical_id == entry.canonical_id).first()
     if txn and (txn.remittance_date or txn.pickup_date):
@@ -107,20 +111,19 @@ def close_remittance(payload: RemittanceStatusRequest, user: AuthUser = Depends(
     entry.closed_date = datetime.utcnow()
     log_audit(db, "REMITTANCE", entry.remittance_id, "CLOSE", None, None, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "CLOSED"}
 
 
 @router.post("/requests")
 def request_remittance_action(
-    payload: RemittanceApprovalRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))
+    payload: RemittanceApprovalRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
-    db = SessionLocal()
     entry = db.query(RemittanceEntry).filter(RemittanceEntry.remittance_id == payload.remittance_id).first()
     if not entry:
-        db.close()
         raise HTTPException(status_code=404, detail="Remittance not found")
     txn = db.query(CanonicalTransaction).filter(CanonicalTransaction.canonical_id == entry.canonical_id).first()
     if txn and (txn.remittance_date or txn.pickup_date):
@@ -146,7 +149,6 @@ def request_remittance_action(
         user.employee_id,
     )
     db.commit()
-    db.close()
     return {"approval_id": approval.approval_id}
 
 
@@ -155,16 +157,14 @@ def approve_remittance(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "REMITTANCE":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
     entry = db.query(RemittanceEntry).filter(RemittanceEntry.remittance_id == approval.entity_id).first()
     if not entry:
-        db.close()
         raise HTTPException(status_code=404, detail="Remittance not found")
     entry.status = "APPROVED"
     entry.approved_by = decision.checker_id
@@ -178,7 +178,6 @@ def approve_remittance(
     approval.approved_date = datetime.utcnow()
     log_audit(db, "REMITTANCE", entry.remittance_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -187,16 +186,14 @@ def reject_remittance(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "REMITTANCE":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
     entry = db.query(RemittanceEntry).filter(RemittanceEntry.remittance_id == approval.entity_id).first()
     if not entry:
-        db.close()
         raise HTTPException(status_code=404, detail="Remittance not found")
     entry.status = "REJECTED"
     proposed = safe_json_loads_clob(approval.proposed_data, raise_on_error=False)
@@ -212,5 +209,4 @@ def reject_remittance(
     approval.approved_date = datetime.utcnow()
     log_audit(db, "REMITTANCE", entry.remittance_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
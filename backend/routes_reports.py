@@ -1,45 +1,82 @@
-import csv
-import io
-from datetime import datetime
-
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import StreamingResponse
-import pandas as pd
-
+import os
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import FileResponse
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+import data_version
+import queries
+import report_cache
+import report_jobs
+import report_snapshots
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import AUDIT_LOG_KEY, enqueue_audit, filter_audit_query
+from charge_engine import month_bounds
+from db import get_db
 from models import (
-    ApprovalRequest,
     AuditLog,
     BankStoreMaster,
     CanonicalTransaction,
     CustomerChargeSummary,
     ExceptionRecord,
-    ReconciliationCorrection,
     ReconciliationResult,
     VendorChargeSummary,
     VendorMaster,
     VendorStoreMappingMaster,
 )
+from schemas import ReportJobRequest
+from report_export import (
+    PAGE_SIZE,
+    XLSX_MEDIA_TYPE,
+    csv_streaming_response,
+    decode_cursor,
+    keyset_iter,
+    keyset_pages,
+    preview_limit,
+    preview_page,
+    row_key,
+    rows_only,
+    write_xlsx,
+    xlsx_streaming_response,
+)
 
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
 
-def _csv_response(filename: str, rows: list[list[str]]):
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerows(rows)
-    content = buffer.getvalue().encode("utf-8-sig")  # BOM for Excel compatibility
-    return Response(
-        content=content,
-        media_type="text/csv; charset=utf-8",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+def _result_key(db, report: str, **params) -> str:
+    return report_cache.result_key(report, params, data_version.current(db))
+
+
+def _range_month(from_dt, to_dt) -> str | None:
+    """Month key when from_dt..to_dt is exactly one calendar month (snapshot-eligible)."""
+    month_key = from_dt.strftime("%Y%m")
+    return month_key if (from_dt, to_dt) == month_bounds(month_key) else None
+
+
+def _charges_month(from_date: str | None, to_date: str | None) -> str | None:
+    """Month key when a charges range covers a single month (charges filter by month only)."""
+    try:
+        month_from = datetime.strptime(from_date, "%Y-%m-%d").strftime("%Y%m")
+        month_to = datetime.strptime(to_date, "%Y-%m-%d").strftime("%Y%m")
+    except (TypeError, ValueError):
+        return None
+    return month_from if month_from == month_to else None
+
 
+VENDOR_CHARGES_KEY = [VendorChargeSummary.month_key, VendorChargeSummary.vendor_id, VendorChargeSummary.summary_id]
+CUSTOMER_CHARGES_KEY = [
+    CustomerChargeSummary.month_key,
+    CustomerChargeSummary.customer_id,
+    CustomerChargeSummary.summary_id,
+]
+CHARGES_KEY_DESCENDING = [True, False, False]  # newest month first
 
-def _vendor_charges_rows(db, from_date: str | None, to_date: str | None):
+
+def _vendor_charges_rows(db, from_date: str | None, to_date: str | None, after=None, page_size=PAGE_SIZE):
+    """(row_key, row) pairs, read lazily in keyset pages."""
     import calendar as cal
     q = db.query(VendorChargeSummary, VendorMaster.vendor_name).outerjoin(
         VendorMaster, VendorChargeSummary.vendor_id == VendorMaster.vendor_id
@@ -55,14 +92,13 @@ def _vendor_charges_rows(db, from_date: str | None, to_date: str | None):
             q = q.filter(VendorChargeSummary.month_key >= month_from, VendorChargeSummary.month_key <= month_to)
         except ValueError:
             pass
-    items = q.order_by(VendorChargeSummary.month_key.desc(), VendorChargeSummary.vendor_id).all()
-    rows = []
-    for item, vendor_name in items:
+    for result in keyset_iter(q, VENDOR_CHARGES_KEY, page_size, CHARGES_KEY_DESCENDING, after):
+        item, vendor_name = result
         month_key = item.month_key or ""
         y, m = (int(month_key[:4]), int(month_key[4:6])) if len(month_key) >= 6 else (None, None)
         from_str = f"{y}-{m:02d}-01" if y and m else ""
         to_str = f"{y}-{m:02d}-{cal.monthrange(y, m)[1]:02d}" if y and m else ""
-        rows.append({
+        yield row_key(result, VENDOR_CHARGES_KEY), {
             "Vendor": vendor_name or "",
             "Vendor ID": str(item.vendor_id),
             "Month": month_key,
@@ -74,104 +110,73 @@ def _vendor_charges_rows(db, from_date: str | None, to_date: str | None):
             "Enhancement (₹)": str(item.enhancement_charge),
             "Tax (₹)": str(item.tax_amount),
             "Total (₹)": str(item.total_with_tax),
-        })
-    return rows
+        }
 
 
 @router.get("/vendor-charges")
 def vendor_charges(
     from_date: str | None = None,
     to_date: str | None = None,
+    gzip: bool = False,
+    if_none_match: str | None = Header(None),
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    data_rows = _vendor_charges_rows(db, from_date, to_date)
-    rows = [
-        ["VENDOR_ID", "VENDOR_NAME", "MONTH_KEY", "FROM_DATE", "TO_DATE", "BEAT_PICKUPS", "CALL_PICKUPS", "BASE_CHARGE", "ENHANCEMENT_CHARGE", "TAX_AMOUNT", "TOTAL_WITH_TAX"]
-    ]
-    for r in data_rows:
-        rows.append([
+    snapshot = report_snapshots.lookup(db, "vendor-charges", _charges_month(from_date, to_date))
+    etag = snapshot.etag("csv-gzip" if gzip else "csv") if snapshot else None
+    cached = report_snapshots.not_modified(if_none_match, etag)
+    if cached is not None:
+        return cached
+    enqueue_audit("REPORT", "VENDOR_CHARGES", "DOWNLOAD", None, f"from={from_date},to={to_date}", user.employee_id)
+    header = ["VENDOR_ID", "VENDOR_NAME", "MONTH_KEY", "FROM_DATE", "TO_DATE", "BEAT_PICKUPS", "CALL_PICKUPS", "BASE_CHARGE", "ENHANCEMENT_CHARGE", "TAX_AMOUNT", "TOTAL_WITH_TAX"]
+    rows = (
+        [
             r["Vendor ID"], r["Vendor"], r["Month"], r["From Date"], r["To Date"],
             r["Beat"], r["Call"], r["Base (₹)"], r["Enhancement (₹)"], r["Tax (₹)"], r["Total (₹)"],
-        ])
-    log_audit(db, "REPORT", "VENDOR_CHARGES", "DOWNLOAD", None, f"from={from_date},to={to_date}", user.employee_id)
-    db.commit()
-    db.close()
-    return _csv_response("vendor-charges.csv", rows)
+        ]
+        for r in (
+            snapshot.rows()
+            if snapshot
+            else report_cache.cached_rows(
+                _result_key(db, "vendor-charges", from_date=from_date, to_date=to_date),
+                lambda: rows_only(_vendor_charges_rows(db, from_date, to_date)),
+            )
+        )
+    )
+    response = csv_streaming_response("vendor-charges.csv", header, rows, gzip=gzip)
+    if etag:
+        response.headers["ETag"] = etag
+    return response
 
 
 @router.get("/vendor-charges/preview")
 def vendor_charges_preview(
+    response: Response,
     from_date: str | None = None,
     to_date: str | None = None,
+    cursor: str | None = None,
+    limit: int = 100,
+    warm: bool = False,
+    if_none_match: str | None = Header(None),
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    rows = _vendor_charges_rows(db, from_date, to_date)
-    db.close()
-    return rows[:100]
-
-
-@router.get("/customer-charges")
-def customer_charges(
-    from_date: str | None = None,
-    to_date: str | None = None,
-    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
-):
-    db = SessionLocal()
-    q = db.query(CustomerChargeSummary)
-    if from_date and to_date:
-        try:
-            from_dt = datetime.strptime(from_date, "%Y-%m-%d").date()
-            to_dt = datetime.strptime(to_date, "%Y-%m-%d").date()
-            month_from = from_dt.strftime("%Y%m")
-            month_to = to_dt.strftime("%Y%m")
-            if month_from > month_to:
-                month_from, month_to = month_to, month_from
-            q = q.filter(CustomerChargeSummary.month_key >= month_from, CustomerChargeSummary.month_key <= month_to)
-        except ValueError:
-            pass
-    items = q.order_by(CustomerChargeSummary.month_key.desc(), CustomerChargeSummary.customer_id).all()
-    rows = [
-        [
-            "CUSTOMER_ID",
-            "MONTH_KEY",
-            "TOTAL_REMITTANCE",
-            "BASE_CHARGE",
-            "ENHANCEMENT_CHARGE",
-            "WAIVER_AMOUNT",
-            "NET_CHARGE",
-            "TAX_AMOUNT",
-            "TOTAL_WITH_TAX",
-        ]
-    ]
-    for item in items:
-        rows.append(
-            [
-                item.customer_id,
-                item.month_key,
-                str(item.total_remittance),
-                str(item.base_charge_amount),
-                str(item.enhancement_charge or 0),
-                str(item.waiver_amount),
-                str(item.net_charge_amount),
-                str(item.tax_amount),
-                str(item.total_with_tax),
-            ]
+    limit = preview_limit(limit)
+    after = decode_cursor(cursor)
+    snapshot = report_snapshots.lookup(db, "vendor-charges", _charges_month(from_date, to_date))
+    if snapshot:
+        return report_snapshots.preview(snapshot, cursor, limit, if_none_match, response)
+    if warm and cursor is None:
+        report_cache.warm(
+            _result_key(db, "vendor-charges", from_date=from_date, to_date=to_date),
+            lambda session: rows_only(_vendor_charges_rows(session, from_date, to_date)),
         )
-    log_audit(db, "REPORT", "CUSTOMER_CHARGES", "DOWNLOAD", None, f"from={from_date},to={to_date}", user.employee_id)
-    db.commit()
-    db.close()
-    return _csv_response("customer-charges.csv", rows)
+    rows = _vendor_charges_rows(db, from_date, to_date, after=after, page_size=limit + 1)
+    return preview_page(rows, limit, response)
 
 
-@router.get("/customer-charges/preview")
-def customer_charges_preview(
-    from_date: str | None = None,
-    to_date: str | None = None,
-    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
-):
-    db = SessionLocal()
+def _customer_charges_rows(db, from_date: str | None, to_date: str | None, after=None, page_size=PAGE_SIZE):
+    """(row_key, row) pairs, read lazily in keyset pages."""
     q = db.query(CustomerChargeSummary)
     if from_date and to_date:
         try:
@@ -184,9 +189,8 @@ def customer_charges_preview(
             q = q.filter(CustomerChargeSummary.month_key >= month_from, CustomerChargeSummary.month_key <= month_to)
         except ValueError:
             pass
-    items = q.order_by(CustomerChargeSummary.month_key.desc(), CustomerChargeSummary.customer_id).all()
-    rows = [
-        {
+    for item in keyset_iter(q, CUSTOMER_CHARGES_KEY, page_size, CHARGES_KEY_DESCENDING, after):
+        yield row_key(item, CUSTOMER_CHARGES_KEY), {
             "Customer ID": item.customer_id,
             "Month": item.month_key,
             "Total Remittance (₹)": str(item.total_remittance),
@@ -197,189 +201,330 @@ def customer_charges_preview(
             "Tax (₹)": str(item.tax_amount),
             "Total (₹)": str(item.total_with_tax),
         }
-        for item in items
+
+
+@router.get("/customer-charges")
+def customer_charges(
+    from_date: str | None = None,
+    to_date: str | None = None,
+    gzip: bool = False,
+    if_none_match: str | None = Header(None),
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    snapshot = report_snapshots.lookup(db, "customer-charges", _charges_month(from_date, to_date))
+    etag = snapshot.etag("csv-gzip" if gzip else "csv") if snapshot else None
+    cached = report_snapshots.not_modified(if_none_match, etag)
+    if cached is not None:
+        return cached
+    enqueue_audit("REPORT", "CUSTOMER_CHARGES", "DOWNLOAD", None, f"from={from_date},to={to_date}", user.employee_id)
+    header = [
+        "CUSTOMER_ID",
+        "MONTH_KEY",
+        "TOTAL_REMITTANCE",
+        "BASE_CHARGE",
+        "ENHANCEMENT_CHARGE",
+        "WAIVER_AMOUNT",
+        "NET_CHARGE",
+        "TAX_AMOUNT",
+        "TOTAL_WITH_TAX",
     ]
-    db.close()
-    return rows[:100]
+    rows = (
+        [
+            r["Customer ID"], r["Month"], r["Total Remittance (₹)"], r["Base (₹)"], r["Enhancement (₹)"],
+            r["Waiver (₹)"], r["Net (₹)"], r["Tax (₹)"], r["Total (₹)"],
+        ]
+        for r in (
+            snapshot.rows()
+            if snapshot
+            else report_cache.cached_rows(
+                _result_key(db, "customer-charges", from_date=from_date, to_date=to_date),
+                lambda: rows_only(_customer_charges_rows(db, from_date, to_date)),
+            )
+        )
+    )
+    response = csv_streaming_response("customer-charges.csv", header, rows, gzip=gzip)
+    if etag:
+        response.headers["ETag"] = etag
+    return response
 
 
-@router.get("/store-summary")
-def store_summary(user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR"))):
-    db = SessionLocal()
-    rows = [["BANK_STORE_CODE", "STATUS", "REASON", "REMITTANCE_DATE", "PICKUP_DATE"]]
-    for item in db.query(ReconciliationResult).all():
-        rows.append(
-            [
-                item.bank_store_code,
-                item.status,
-                item.reason or "",
-                str(item.remittance_date) if item.remittance_date else "",
-                str(item.pickup_date) if item.pickup_date else "",
-            ]
+@router.get("/customer-charges/preview")
+def customer_charges_preview(
+    response: Response,
+    from_date: str | None = None,
+    to_date: str | None = None,
+    cursor: str | None = None,
+    limit: int = 100,
+    warm: bool = False,
+    if_none_match: str | None = Header(None),
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    limit = preview_limit(limit)
+    after = decode_cursor(cursor)
+    snapshot = report_snapshots.lookup(db, "customer-charges", _charges_month(from_date, to_date))
+    if snapshot:
+        return report_snapshots.preview(snapshot, cursor, limit, if_none_match, response)
+    if warm and cursor is None:
+        report_cache.warm(
+            _result_key(db, "customer-charges", from_date=from_date, to_date=to_date),
+            lambda session: rows_only(_customer_charges_rows(session, from_date, to_date)),
         )
-    log_audit(db, "REPORT", "STORE_SUMMARY", "DOWNLOAD", None, None, user.employee_id)
-    db.commit()
-    db.close()
-    return _csv_response("store-summary.csv", rows)
+    rows = _customer_charges_rows(db, from_date, to_date, after=after, page_size=limit + 1)
+    return preview_page(rows, limit, response)
+
+
+@router.get("/store-summary")
+def store_summary(
+    gzip: bool = False,
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    enqueue_audit("REPORT", "STORE_SUMMARY", "DOWNLOAD", None, None, user.employee_id)
+    rows = (
+        [
+            item.bank_store_code,
+            item.status,
+            item.reason or "",
+            str(item.remittance_date) if item.remittance_date else "",
+            str(item.pickup_date) if item.pickup_date else "",
+        ]
+        for item in keyset_iter(db.query(ReconciliationResult), [ReconciliationResult.recon_id])
+    )
+    header = ["BANK_STORE_CODE", "STATUS", "REASON", "REMITTANCE_DATE", "PICKUP_DATE"]
+    return csv_streaming_response("store-summary.csv", header, rows, gzip=gzip)
 
 
 @router.get("/reconciliation-status")
-def reconciliation_status(user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR"))):
-    db = SessionLocal()
-    rows = [["RECON_ID", "STATUS", "REASON", "REMITTANCE_DATE", "PICKUP_DATE"]]
-    for item in db.query(ReconciliationResult).all():
-        rows.append(
-            [
-                str(item.recon_id),
-                item.status,
-                item.reason or "",
-                str(item.remittance_date) if item.remittance_date else "",
-                str(item.pickup_date) if item.pickup_date else "",
-            ]
-        )
-    log_audit(db, "REPORT", "RECON_STATUS", "DOWNLOAD", None, None, user.employee_id)
-    db.commit()
-    db.close()
-    return _csv_response("reconciliation-status.csv", rows)
+def reconciliation_status(
+    gzip: bool = False,
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    enqueue_audit("REPORT", "RECON_STATUS", "DOWNLOAD", None, None, user.employee_id)
+    rows = (
+        [
+            str(item.recon_id),
+            item.status,
+            item.reason or "",
+            str(item.remittance_date) if item.remittance_date else "",
+            str(item.pickup_date) if item.pickup_date else "",
+        ]
+        for item in keyset_iter(db.query(ReconciliationResult), [ReconciliationResult.recon_id])
+    )
+    header = ["RECON_ID", "STATUS", "REASON", "REMITTANCE_DATE", "PICKUP_DATE"]
+    return csv_streaming_response("reconciliation-status.csv", header, rows, gzip=gzip)
+
+
+# (label, min age days, max age days); age is whole days since created_date
+AGING_BUCKETS = [("0-7", 0, 7), ("8-30", 8, 30), ("31-90", 31, 90), ("90+", 91, None)]
+
+
+def _aging_bucket(now):
+    """SQL CASE giving each exception's aging bucket label, from datetime cut-offs."""
+    whens = [
+        (ExceptionRecord.created_date > now - timedelta(days=max_days + 1), label)
+        for label, _, max_days in AGING_BUCKETS
+        if max_days is not None
+    ]
+    return case(*whens, else_=AGING_BUCKETS[-1][0])
+
+
+def _aging_filters(query, now, status_filter: str | None, bucket: str | None):
+    if status_filter:
+        query = query.filter(ExceptionRecord.status == status_filter)
+    if bucket:
+        bounds = {label: (min_days, max_days) for label, min_days, max_days in AGING_BUCKETS}
+        if bucket not in bounds:
+            raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(bounds)}")
+        min_days, max_days = bounds[bucket]
+        query = query.filter(ExceptionRecord.created_date <= now - timedelta(days=min_days))
+        if max_days is not None:
+            query = query.filter(ExceptionRecord.created_date > now - timedelta(days=max_days + 1))
+    return query
+
+
+def _exception_aging_row(item, now):
+    age = max((now - item.created_date).days, 0) if item.created_date else 0
+    label = next(
+        label for label, min_days, max_days in AGING_BUCKETS if age >= min_days and (max_days is None or age <= max_days)
+    )
+    return [str(item.exception_id), item.status, str(age), item.exception_type, label]
 
 
 @router.get("/exception-aging")
-def exception_aging(user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR"))):
-    db = SessionLocal()
-    rows = [["EXCEPTION_ID", "STATUS", "AGE_DAYS"]]
+def exception_aging(
+    status_filter: str | None = None,
+    bucket: str | None = None,
+    gzip: bool = False,
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
     now = datetime.utcnow()
-    for item in db.query(ExceptionRecord).all():
-        age_days = (now - item.created_date).days if item.created_date else 0
-        rows.append([str(item.exception_id), item.status, str(age_days)])
-    log_audit(db, "REPORT", "EXCEPTION_AGING", "DOWNLOAD", None, None, user.employee_id)
-    db.commit()
-    db.close()
-    return _csv_response("exception-aging.csv", rows)
+    query = _aging_filters(db.query(ExceptionRecord), now, status_filter, bucket)
+    enqueue_audit(
+        "REPORT", "EXCEPTION_AGING", "DOWNLOAD", None, f"status={status_filter},bucket={bucket}", user.employee_id
+    )
+    rows = (_exception_aging_row(item, now) for item in keyset_iter(query, [ExceptionRecord.exception_id]))
+    header = ["EXCEPTION_ID", "STATUS", "AGE_DAYS", "EXCEPTION_TYPE", "AGING_BUCKET"]
+    return csv_streaming_response("exception-aging.csv", header, rows, gzip=gzip)
+
+
+@router.get("/exception-aging/summary")
+def exception_aging_summary(
+    status_filter: str | None = None,
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    """Aging bucket counts overall, per exception type and per status, from one grouped query."""
+    now = datetime.utcnow()
+    # Bucket in a subquery so Oracle can group by it (bound CASE cut-offs can't be repeated in GROUP BY)
+    aged = _aging_filters(
+        db.query(
+            ExceptionRecord.exception_type,
+            ExceptionRecord.status,
+            _aging_bucket(now).label("aging_bucket"),
+        ),
+        now,
+        status_filter,
+        None,
+    ).subquery()
+    rows = (
+        db.query(aged.c.exception_type, aged.c.status, aged.c.aging_bucket, func.count())
+        .group_by(aged.c.exception_type, aged.c.status, aged.c.aging_bucket)
+        .all()
+    )
+
+    def empty():
+        return {"total": 0, "buckets": {label: 0 for label, _, _ in AGING_BUCKETS}}
+
+    overall = empty()
+    by_type = {}
+    by_status = {}
+    for exception_type, status, label, count in rows:
+        for entry in (overall, by_type.setdefault(exception_type, empty()), by_status.setdefault(status, empty())):
+            entry["total"] += count
+            entry["buckets"][label] += count
+    return {
+        "as_of": now,
+        "total": overall["total"],
+        "buckets": overall["buckets"],
+        "by_type": [{"exception_type": key, **by_type[key]} for key in sorted(by_type)],
+        "by_status": [{"status": key, **by_status[key]} for key in sorted(by_status)],
+    }
+
+
+def _audit_log_row(item):
+    changed_at = item.changed_at
+    return [
+        item.entity_type,
+        item.entity_id or "",
+        item.action,
+        item.changed_by,
+        changed_at.date().isoformat() if changed_at else "",
+        changed_at.time().isoformat(timespec="seconds") if changed_at else "",
+    ]
 
 
 @router.get("/audit-logs")
-def audit_logs(user: AuthUser = Depends(require_roles("ADMIN", "AUDITOR"))):
-    db = SessionLocal()
-    rows = [["ENTITY_TYPE", "ENTITY_ID", "ACTION", "CHANGED_BY", "CHANGED_DATE", "CHANGED_TIME"]]
-    for item in db.query(AuditLog).order_by(AuditLog.changed_at.desc()).all():
-        changed_at = item.changed_at
-        changed_date = changed_at.date().isoformat() if changed_at else ""
-        changed_time = changed_at.time().isoformat(timespec="seconds") if changed_at else ""
-        rows.append(
-            [
-                item.entity_type,
-                item.entity_id or "",
-                item.action,
-                item.changed_by,
-                changed_date,
-                changed_time,
-            ]
+def audit_logs(
+    gzip: bool = False,
+    from_date: str | None = None,
+    to_date: str | None = None,
+    entity_type: str | None = None,
+    changed_by: str | None = None,
+    user: AuthUser = Depends(require_roles("ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    """All matching entries, newest first. A from/to date range reads only those months' partitions."""
+    changed_from = changed_before = None
+    if from_date or to_date:
+        if not (from_date and to_date):
+            raise HTTPException(status_code=400, detail="from_date and to_date go together")
+        start, end = _parse_range(from_date, to_date)
+        changed_from, changed_before = start, end + timedelta(days=1)
+    enqueue_audit("REPORT", "AUDIT_LOGS", "DOWNLOAD", None, None, user.employee_id)
+    query = filter_audit_query(
+        db.query(AuditLog),
+        entity_type=entity_type,
+        changed_by=changed_by,
+        changed_from=changed_from,
+        changed_before=changed_before,
+    )
+    rows = (_audit_log_row(item) for item in keyset_iter(query, AUDIT_LOG_KEY, descending=True))
+    header = ["ENTITY_TYPE", "ENTITY_ID", "ACTION", "CHANGED_BY", "CHANGED_DATE", "CHANGED_TIME"]
+    return csv_streaming_response("audit-logs.csv", header, rows, gzip=gzip)
+
+
+RECON_FINAL_KEY = [ReconciliationResult.created_date, ReconciliationResult.recon_id]
+IN_LIST_MAX = 1000  # Oracle limit on IN (...) list length
+
+
+def _in_chunks(values):
+    values = list(values)
+    for start in range(0, len(values), IN_LIST_MAX):
+        yield values[start : start + IN_LIST_MAX]
+
+
+def _parse_range(from_date: str, to_date: str):
+    try:
+        return (
+            datetime.strptime(from_date, "%Y-%m-%d").date(),
+            datetime.strptime(to_date, "%Y-%m-%d").date(),
         )
-    log_audit(db, "REPORT", "AUDIT_LOGS", "DOWNLOAD", None, None, user.employee_id)
-    db.commit()
-    db.close()
-    return _csv_response("audit-logs.csv", rows)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
 
 
-@router.get("/vendor-pickups")
-def _vendor_pickups_rows(db, vendor_id: int, from_dt, to_dt):
+def _snapshot_xlsx(snapshot, filename: str):
+    return FileResponse(
+        snapshot.xlsx_path, media_type=XLSX_MEDIA_TYPE, filename=filename, headers={"ETag": snapshot.etag("xlsx")}
+    )
+
+
+def _get_vendor(db, vendor_id: int):
     vendor = db.query(VendorMaster).filter(VendorMaster.vendor_id == vendor_id).first()
     if not vendor:
         raise HTTPException(status_code=404, detail="Vendor not found")
+    return vendor
+
 
-    rows = [
-        {
+def _vendor_pickups_rows(db, vendor, from_dt, to_dt, after=None, page_size=PAGE_SIZE):
+    """(row_key, row) pairs, read lazily in keyset pages."""
+    query = queries.vendor_pickups(db, vendor.vendor_id, from_dt, to_dt)
+    for result in keyset_iter(query, queries.PICKUPS_KEY, page_size, after=after):
+        txn, store_name = result
+        yield row_key(result, queries.PICKUPS_KEY), {
             "Vendor Name": vendor.vendor_name,
-            "Bank Store Code": "",
-            "Store Name": "",
-            "Vendor Store Code": "",
-            "Pickup Date": "",
-            "Pickup Amount": "",
-            "Pickup Type": "",
-            "Account No": "",
-            "Customer ID": "",
+            "Bank Store Code": txn.bank_store_code,
+            "Store Name": store_name or "",
+            "Vendor Store Code": txn.vendor_store_code or "",
+            "Pickup Date": str(txn.pickup_date) if txn.pickup_date else "",
+            "Pickup Amount": str(txn.pickup_amount) if txn.pickup_amount is not None else "",
+            "Pickup Type": txn.pickup_type or "",
+            "Account No": txn.account_no or "",
+            "Customer ID": txn.customer_id or "",
         }
-    ]
-
-    txns = (
-        db.query(CanonicalTransaction)
-        .filter(CanonicalTransaction.source == "VENDOR")
-        .filter(CanonicalTransaction.pickup_date >= from_dt)
-        .filter(CanonicalTransaction.pickup_date <= to_dt)
-        .all()
-    )
-
-    rows = []
-    for txn in txns:
-        mapping = (
-            db.query(VendorStoreMappingMaster)
-            .filter(VendorStoreMappingMaster.vendor_id == vendor_id)
-            .filter(VendorStoreMappingMaster.vendor_store_code == txn.vendor_store_code)
-            .filter(VendorStoreMappingMaster.bank_store_code == txn.bank_store_code)
-            .filter(VendorStoreMappingMaster.status == "ACTIVE")
-            .filter(VendorStoreMappingMaster.effective_from <= txn.pickup_date)
-            .filter(
-                (VendorStoreMappingMaster.effective_to.is_(None))
-                | (VendorStoreMappingMaster.effective_to >= txn.pickup_date)
-            )
-            .first()
-        )
-        if not mapping:
-            continue
-
-        store_row = (
-            db.query(BankStoreMaster.store_name)
-            .filter(BankStoreMaster.bank_store_code == txn.bank_store_code)
-            .filter(BankStoreMaster.status == "ACTIVE")
-            .filter(BankStoreMaster.effective_from <= txn.pickup_date)
-            .filter(
-                (BankStoreMaster.effective_to.is_(None))
-                | (BankStoreMaster.effective_to >= txn.pickup_date)
-            )
-            .first()
-        )
-        store_name = store_row[0] if store_row else ""
-
-        rows.append(
-            {
-                "Vendor Name": vendor.vendor_name,
-                "Bank Store Code": txn.bank_store_code,
-                "Store Name": store_name,
-                "Vendor Store Code": txn.vendor_store_code or "",
-                "Pickup Date": str(txn.pickup_date) if txn.pickup_date else "",
-                "Pickup Amount": str(txn.pickup_amount) if txn.pickup_amount is not None else "",
-                "Pickup Type": txn.pickup_type or "",
-                "Account No": txn.account_no or "",
-                "Customer ID": txn.customer_id or "",
-            }
-        )
-    return vendor, rows
 
 
+@router.get("/vendor-pickups")
 def vendor_pickups(
     vendor_id: int,
     from_date: str,
     to_date: str,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        from_dt = datetime.strptime(from_date, "%Y-%m-%d").date()
-        to_dt = datetime.strptime(to_date, "%Y-%m-%d").date()
-    except ValueError:
-        db.close()
-        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
-
-    vendor, rows = _vendor_pickups_rows(db, vendor_id, from_dt, to_dt)
-
-    df = pd.DataFrame(rows)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Vendor Pickups")
-    output.seek(0)
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    vendor = _get_vendor(db, vendor_id)
+    rows = report_cache.cached_rows(
+        _result_key(db, "vendor-pickups", vendor_id=vendor_id, from_dt=from_dt, to_dt=to_dt),
+        lambda: rows_only(_vendor_pickups_rows(db, vendor, from_dt, to_dt)),
+    )
+    spool, _ = write_xlsx(rows, sheet_name="Vendor Pickups")
 
-    log_audit(
-        db,
+    enqueue_audit(
         "REPORT",
         "VENDOR_PICKUPS",
         "DOWNLOAD",
@@ -387,38 +532,39 @@ def vendor_pickups(
         f"vendor_id={vendor_id},from={from_date},to={to_date}",
         user.employee_id,
     )
-    db.commit()
-    db.close()
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": 'attachment; filename="vendor-pickups.xlsx"'},
-    )
+    return xlsx_streaming_response("vendor-pickups.xlsx", spool)
 
 
 @router.get("/vendor-pickups/preview")
 def vendor_pickups_preview(
+    response: Response,
     vendor_id: int,
     from_date: str,
     to_date: str,
+    cursor: str | None = None,
+    limit: int = 50,
+    warm: bool = False,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        from_dt = datetime.strptime(from_date, "%Y-%m-%d").date()
-        to_dt = datetime.strptime(to_date, "%Y-%m-%d").date()
-    except ValueError:
-        db.close()
-        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
-
-    _, rows = _vendor_pickups_rows(db, vendor_id, from_dt, to_dt)
-    db.close()
-    return rows[:50]
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    limit = preview_limit(limit)
+    after = decode_cursor(cursor)
+    vendor = _get_vendor(db, vendor_id)
+    if warm and cursor is None:
+        report_cache.warm(
+            _result_key(db, "vendor-pickups", vendor_id=vendor_id, from_dt=from_dt, to_dt=to_dt),
+            lambda session: rows_only(_vendor_pickups_rows(session, _get_vendor(session, vendor_id), from_dt, to_dt)),
+        )
+    rows = _vendor_pickups_rows(db, vendor, from_dt, to_dt, after=after, page_size=limit + 1)
+    return preview_page(rows, limit, response)
 
 
 @router.get("/customers")
-def list_customers(user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR"))):
-    db = SessionLocal()
+def list_customers(
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
     rows = (
         db.query(VendorStoreMappingMaster.customer_id, VendorStoreMappingMaster.customer_name)
         .filter(VendorStoreMappingMaster.customer_id.is_not(None))
@@ -428,67 +574,43 @@ def list_customers(user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "A
     payload = [
         {"customer_id": row[0], "customer_name": row[1] or ""} for row in rows if row and row[0]
     ]
-    db.close()
     return payload
 
 
-def _customer_pickups_rows(db, customer_id: str, from_dt, to_dt):
-    rows = []
-    txns = (
-        db.query(CanonicalTransaction)
+def _customer_pickups_rows(db, customer_id: str, from_dt, to_dt, after=None, page_size=PAGE_SIZE):
+    """(row_key, row) pairs, read lazily in keyset pages."""
+    query = (
+        db.query(CanonicalTransaction, VendorStoreMappingMaster, VendorMaster, BankStoreMaster.store_name)
+        .join(VendorStoreMappingMaster, queries.mapping_in_effect())
+        .join(VendorMaster, VendorStoreMappingMaster.vendor_id == VendorMaster.vendor_id)
+        .outerjoin(BankStoreMaster, queries.store_name_join(CanonicalTransaction.pickup_date))
+        .filter(VendorStoreMappingMaster.customer_id == customer_id)
         .filter(CanonicalTransaction.source == "VENDOR")
         .filter(CanonicalTransaction.pickup_date >= from_dt)
         .filter(CanonicalTransaction.pickup_date <= to_dt)
-        .all()
     )
-
-    for txn in txns:
-        mapping = (
-            db.query(VendorStoreMappingMaster, VendorMaster)
-            .join(VendorMaster, VendorStoreMappingMaster.vendor_id == VendorMaster.vendor_id)
-            .filter(VendorStoreMappingMaster.customer_id == customer_id)
-            .filter(VendorStoreMappingMaster.vendor_store_code == txn.vendor_store_code)
-            .filter(VendorStoreMappingMaster.bank_store_code == txn.bank_store_code)
-            .filter(VendorStoreMappingMaster.status == "ACTIVE")
-            .filter(VendorStoreMappingMaster.effective_from <= txn.pickup_date)
-            .filter(
-                (VendorStoreMappingMaster.effective_to.is_(None))
-                | (VendorStoreMappingMaster.effective_to >= txn.pickup_date)
-            )
-            .first()
-        )
-        if not mapping:
+    last_id = None
+    for result in keyset_iter(
+        query, queries.PICKUPS_KEY, page_size, after=after, then_by=[VendorStoreMappingMaster.mapping_id]
+    ):
+        txn, mapping_row, vendor, store_name = result
+        # Overlapping mappings would repeat the transaction; keep the first, as before.
+        # The next page starts after this key, so repeats never straddle pages.
+        if txn.canonical_id == last_id:
             continue
-        mapping_row, vendor = mapping
-
-        store_row = (
-            db.query(BankStoreMaster.store_name)
-            .filter(BankStoreMaster.bank_store_code == txn.bank_store_code)
-            .filter(BankStoreMaster.status == "ACTIVE")
-            .filter(BankStoreMaster.effective_from <= txn.pickup_date)
-            .filter(
-                (BankStoreMaster.effective_to.is_(None))
-                | (BankStoreMaster.effective_to >= txn.pickup_date)
-            )
-            .first()
-        )
-        store_name = store_row[0] if store_row else ""
-
-        rows.append(
-            {
-                "Customer ID": mapping_row.customer_id or "",
-                "Customer Name": mapping_row.customer_name or "",
-                "Vendor Name": vendor.vendor_name,
-                "Bank Store Code": txn.bank_store_code,
-                "Store Name": store_name,
-                "Vendor Store Code": txn.vendor_store_code or "",
-                "Pickup Date": str(txn.pickup_date) if txn.pickup_date else "",
-                "Pickup Amount": str(txn.pickup_amount) if txn.pickup_amount is not None else "",
-                "Pickup Type": txn.pickup_type or "",
-                "Account No": txn.account_no or "",
-            }
-        )
-    return rows
+        last_id = txn.canonical_id
+        yield row_key(result, queries.PICKUPS_KEY), {
+            "Customer ID": mapping_row.customer_id or "",
+            "Customer Name": mapping_row.customer_name or "",
+            "Vendor Name": vendor.vendor_name,
+            "Bank Store Code": txn.bank_store_code,
+            "Store Name": store_name or "",
+            "Vendor Store Code": txn.vendor_store_code or "",
+            "Pickup Date": str(txn.pickup_date) if txn.pickup_date else "",
+            "Pickup Amount": str(txn.pickup_amount) if txn.pickup_amount is not None else "",
+            "Pickup Type": txn.pickup_type or "",
+            "Account No": txn.account_no or "",
+        }
 
 
 @router.get("/customer-pickups")
@@ -497,24 +619,16 @@ def customer_pickups(
     from_date: str,
     to_date: str,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        from_dt = datetime.strptime(from_date, "%Y-%m-%d").date()
-        to_dt = datetime.strptime(to_date, "%Y-%m-%d").date()
-    except ValueError:
-        db.close()
-        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
-
-    rows = _customer_pickups_rows(db, customer_id, from_dt, to_dt)
-    df = pd.DataFrame(rows)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Customer Pickups")
-    output.seek(0)
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    rows = report_cache.cached_rows(
+        _result_key(db, "customer-pickups", customer_id=customer_id, from_dt=from_dt, to_dt=to_dt),
+        lambda: rows_only(_customer_pickups_rows(db, customer_id, from_dt, to_dt)),
+    )
+    spool, _ = write_xlsx(rows, sheet_name="Customer Pickups")
 
-    log_audit(
-        db,
+    enqueue_audit(
         "REPORT",
         "CUSTOMER_PICKUPS",
         "DOWNLOAD",
@@ -522,113 +636,113 @@ def customer_pickups(
         f"customer_id={customer_id},from={from_date},to={to_date}",
         user.employee_id,
     )
-    db.commit()
-    db.close()
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": 'attachment; filename="customer-pickups.xlsx"'},
-    )
+    return xlsx_streaming_response("customer-pickups.xlsx", spool)
 
 
 @router.get("/customer-pickups/preview")
 def customer_pickups_preview(
+    response: Response,
     customer_id: str,
     from_date: str,
     to_date: str,
+    cursor: str | None = None,
+    limit: int = 50,
+    warm: bool = False,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        from_dt = datetime.strptime(from_date, "%Y-%m-%d").date()
-        to_dt = datetime.strptime(to_date, "%Y-%m-%d").date()
-    except ValueError:
-        db.close()
-        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    limit = preview_limit(limit)
+    after = decode_cursor(cursor)
+    if warm and cursor is None:
+        report_cache.warm(
+            _result_key(db, "customer-pickups", customer_id=customer_id, from_dt=from_dt, to_dt=to_dt),
+            lambda session: rows_only(_customer_pickups_rows(session, customer_id, from_dt, to_dt)),
+        )
+    rows = _customer_pickups_rows(db, customer_id, from_dt, to_dt, after=after, page_size=limit + 1)
+    return preview_page(rows, limit, response)
 
-    rows = _customer_pickups_rows(db, customer_id, from_dt, to_dt)
-    db.close()
-    return rows[:50]
 
+def _effective_on(effective_from, effective_to, as_of_date) -> bool:
+    return effective_from <= as_of_date and (effective_to is None or effective_to >= as_of_date)
 
-def _recon_final_rows(db, from_dt, to_dt):
-    # Final results only; date range on mis_date when set, else pickup/remittance for legacy
-    results = (
-        db.query(ReconciliationResult)
-        .filter(ReconciliationResult.is_final == 1)
-        .filter(
-            (
-                (ReconciliationResult.mis_date >= from_dt)
-                & (ReconciliationResult.mis_date <= to_dt)
-            )
-            | (
-                (ReconciliationResult.mis_date.is_(None))
-                & (
-                    (
-                        (ReconciliationResult.pickup_date >= from_dt)
-                        & (ReconciliationResult.pickup_date <= to_dt)
-                    )
-                    | (
-                        (ReconciliationResult.remittance_date >= from_dt)
-                        & (ReconciliationResult.remittance_date <= to_dt)
-                    )
-                )
-            )
-        )
-        .order_by(ReconciliationResult.created_date.desc())
-        .all()
-    )
-
-    latest_status = {}
-    correction_rows = (
-        db.query(ReconciliationCorrection, ApprovalRequest)
-        .join(ApprovalRequest, ApprovalRequest.approval_id == ReconciliationCorrection.approval_id)
-        .order_by(ReconciliationCorrection.created_date.desc())
-        .all()
-    )
-    for correction, approval in correction_rows:
-        if correction.recon_id not in latest_status:
-            latest_status[correction.recon_id] = approval.status
-
-    rows = []
-    for item in results:
-        status = latest_status.get(item.recon_id)
-        if status and status != "APPROVED":
-            continue
 
-        date_key = item.remittance_date or item.pickup_date
-        store_row = (
-            db.query(BankStoreMaster.store_name)
-            .filter(BankStoreMaster.bank_store_code == item.bank_store_code)
-            .filter(BankStoreMaster.status == "ACTIVE")
-            .filter(BankStoreMaster.effective_from <= date_key)
-            .filter(
-                (BankStoreMaster.effective_to.is_(None))
-                | (BankStoreMaster.effective_to >= date_key)
+def _load_store_names(db, codes, stores, store_vendors):
+    """Add store names and in-effect vendor lists for codes to the lookup dicts."""
+    for chunk in _in_chunks(codes):
+        for code, name, eff_from, eff_to in (
+            db.query(
+                BankStoreMaster.bank_store_code,
+                BankStoreMaster.store_name,
+                BankStoreMaster.effective_from,
+                BankStoreMaster.effective_to,
             )
-            .first()
-        )
-        store_name = store_row[0] if store_row else ""
-
-        vendor_rows = (
-            db.query(VendorMaster.vendor_name)
-            .join(
-                VendorStoreMappingMaster,
-                VendorStoreMappingMaster.vendor_id == VendorMaster.vendor_id,
+            .filter(BankStoreMaster.bank_store_code.in_(chunk))
+            .filter(BankStoreMaster.status == "ACTIVE")
+            .all()
+        ):
+            stores[code] = (name, eff_from, eff_to)
+        for code, vendor_name, eff_from, eff_to in (
+            db.query(
+                VendorStoreMappingMaster.bank_store_code,
+                VendorMaster.vendor_name,
+                VendorStoreMappingMaster.effective_from,
+                VendorStoreMappingMaster.effective_to,
             )
-            .filter(VendorStoreMappingMaster.bank_store_code == item.bank_store_code)
+            .join(VendorMaster, VendorStoreMappingMaster.vendor_id == VendorMaster.vendor_id)
+            .filter(VendorStoreMappingMaster.bank_store_code.in_(chunk))
             .filter(VendorStoreMappingMaster.status == "ACTIVE")
-            .filter(VendorStoreMappingMaster.effective_from <= date_key)
-            .filter(
-                (VendorStoreMappingMaster.effective_to.is_(None))
-                | (VendorStoreMappingMaster.effective_to >= date_key)
-            )
             .all()
-        )
-        vendor_names = ", ".join(sorted({row[0] for row in vendor_rows if row and row[0]}))
+        ):
+            if vendor_name:
+                store_vendors.setdefault(code, []).append((vendor_name, eff_from, eff_to))
 
-        rows.append(
-            {
+
+def _latest_correction_status(db, recon_ids):
+    latest_status = {}
+    for chunk in _in_chunks(recon_ids):
+        for recon_id, approval_status, _ in queries.correction_statuses(db, chunk):
+            if recon_id not in latest_status:
+                latest_status[recon_id] = approval_status
+    return latest_status
+
+
+def _recon_final_rows(db, from_dt, to_dt, after=None, page_size=PAGE_SIZE):
+    """(row_key, row) pairs, newest first. Names and corrections are resolved per page."""
+    selected = queries.final_recon_results(db, from_dt, to_dt)
+
+    stores = {}
+    store_vendors = {}
+    loaded_codes = set()
+    for page in keyset_pages(selected, RECON_FINAL_KEY, page_size, descending=True, after=after):
+        latest_status = _latest_correction_status(db, [item.recon_id for item in page])
+        new_codes = {item.bank_store_code for item in page} - loaded_codes
+        _load_store_names(db, new_codes, stores, store_vendors)
+        loaded_codes |= new_codes
+
+        for item in page:
+            status = latest_status.get(item.recon_id)
+            if status and status != "APPROVED":
+                continue
+
+            date_key = item.remittance_date or item.pickup_date
+            store_name = ""
+            vendor_names = ""
+            if date_key:
+                store = stores.get(item.bank_store_code)
+                if store and _effective_on(store[1], store[2], date_key):
+                    store_name = store[0] or ""
+                vendor_names = ", ".join(
+                    sorted(
+                        {
+                            name
+                            for name, eff_from, eff_to in store_vendors.get(item.bank_store_code, [])
+                            if _effective_on(eff_from, eff_to, date_key)
+                        }
+                    )
+                )
+
+            yield row_key(item, RECON_FINAL_KEY), {
                 "Bank Store Code": item.bank_store_code,
                 "Store Name": store_name,
                 "Vendor Names": vendor_names,
@@ -639,33 +753,30 @@ def _recon_final_rows(db, from_dt, to_dt):
                 "Status": item.status,
                 "Reason": item.reason or "",
             }
-        )
-    return rows
 
 
 @router.get("/reconciliation-final")
 def reconciliation_final(
     from_date: str,
     to_date: str,
+    if_none_match: str | None = Header(None),
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        from_dt = datetime.strptime(from_date, "%Y-%m-%d").date()
-        to_dt = datetime.strptime(to_date, "%Y-%m-%d").date()
-    except ValueError:
-        db.close()
-        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
-
-    rows = _recon_final_rows(db, from_dt, to_dt)
-    df = pd.DataFrame(rows)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Reconciliation Final")
-    output.seek(0)
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    snapshot = report_snapshots.lookup(db, "reconciliation-final", _range_month(from_dt, to_dt))
+    if snapshot:
+        cached = report_snapshots.not_modified(if_none_match, snapshot.etag("xlsx"))
+        if cached is not None:
+            return cached
+    else:
+        rows = report_cache.cached_rows(
+            _result_key(db, "reconciliation-final", from_dt=from_dt, to_dt=to_dt),
+            lambda: rows_only(_recon_final_rows(db, from_dt, to_dt)),
+        )
+        spool, _ = write_xlsx(rows, sheet_name="Reconciliation Final")
 
-    log_audit(
-        db,
+    enqueue_audit(
         "REPORT",
         "RECON_FINAL",
         "DOWNLOAD",
@@ -673,29 +784,135 @@ def reconciliation_final(
         f"from={from_date},to={to_date}",
         user.employee_id,
     )
-    db.commit()
-    db.close()
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": 'attachment; filename="reconciliation-final.xlsx"'},
-    )
+    if snapshot:
+        return _snapshot_xlsx(snapshot, "reconciliation-final.xlsx")
+    return xlsx_streaming_response("reconciliation-final.xlsx", spool)
 
 
 @router.get("/reconciliation-final/preview")
 def reconciliation_final_preview(
+    response: Response,
     from_date: str,
     to_date: str,
+    cursor: str | None = None,
+    limit: int = 50,
+    warm: bool = False,
+    if_none_match: str | None = Header(None),
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
-    try:
-        from_dt = datetime.strptime(from_date, "%Y-%m-%d").date()
-        to_dt = datetime.strptime(to_date, "%Y-%m-%d").date()
-    except ValueError:
-        db.close()
-        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    from_dt, to_dt = _parse_range(from_date, to_date)
+    limit = preview_limit(limit)
+    after = decode_cursor(cursor)
+    snapshot = report_snapshots.lookup(db, "reconciliation-final", _range_month(from_dt, to_dt))
+    if snapshot:
+        return report_snapshots.preview(snapshot, cursor, limit, if_none_match, response)
+    if warm and cursor is None:
+        report_cache.warm(
+            _result_key(db, "reconciliation-final", from_dt=from_dt, to_dt=to_dt),
+            lambda session: rows_only(_recon_final_rows(session, from_dt, to_dt)),
+        )
+    rows = _recon_final_rows(db, from_dt, to_dt, after=after, page_size=limit + 1)
+    return preview_page(rows, limit, response)
+
+
+# Reports frozen when a month is locked (see report_snapshots). Only reports selected by
+# batch MIS month or charge month: the pickup reports filter on pickup_date, and late
+# pickups for a locked month can still arrive in a later, unlocked month's batch.
+report_snapshots.register(
+    "vendor-charges", lambda db, first_day, last_day, _: _vendor_charges_rows(db, str(first_day), str(last_day))
+)
+report_snapshots.register(
+    "customer-charges", lambda db, first_day, last_day, _: _customer_charges_rows(db, str(first_day), str(last_day))
+)
+report_snapshots.register(
+    "reconciliation-final",
+    lambda db, first_day, last_day, _: _recon_final_rows(db, first_day, last_day),
+    sheet_name="Reconciliation Final",
+)
+
 
-    rows = _recon_final_rows(db, from_dt, to_dt)
-    db.close()
-    return rows[:50]
+# Report job name -> entity id used when auditing the report's download
+JOB_AUDIT_NAMES = {
+    "reconciliation-final": "RECON_FINAL",
+    "vendor-pickups": "VENDOR_PICKUPS",
+    "customer-pickups": "CUSTOMER_PICKUPS",
+}
+
+
+def _job_spec(db, payload: ReportJobRequest):
+    """
+    (params, filename, sheet name, rows_factory) for a report job, validated the same
+    way as the direct download.
+    """
+    from_dt, to_dt = _parse_range(payload.from_date, payload.to_date)
+    if payload.report == "reconciliation-final":
+        return (
+            {"from_dt": from_dt, "to_dt": to_dt},
+            "reconciliation-final.xlsx",
+            "Reconciliation Final",
+            lambda session: rows_only(_recon_final_rows(session, from_dt, to_dt)),
+        )
+    if payload.report == "vendor-pickups":
+        if payload.vendor_id is None:
+            raise HTTPException(status_code=400, detail="vendor_id is required")
+        vendor_id = payload.vendor_id
+        _get_vendor(db, vendor_id)
+        return (
+            {"vendor_id": vendor_id, "from_dt": from_dt, "to_dt": to_dt},
+            "vendor-pickups.xlsx",
+            "Vendor Pickups",
+            lambda session: rows_only(
+                _vendor_pickups_rows(session, _get_vendor(session, vendor_id), from_dt, to_dt)
+            ),
+        )
+    if payload.report == "customer-pickups":
+        if not payload.customer_id:
+            raise HTTPException(status_code=400, detail="customer_id is required")
+        customer_id = payload.customer_id
+        return (
+            {"customer_id": customer_id, "from_dt": from_dt, "to_dt": to_dt},
+            "customer-pickups.xlsx",
+            "Customer Pickups",
+            lambda session: rows_only(_customer_pickups_rows(session, customer_id, from_dt, to_dt)),
+        )
+    raise HTTPException(status_code=400, detail=f"Unsupported report: {payload.report}")
+
+
+@router.post("/jobs")
+def submit_report_job(
+    payload: ReportJobRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    params, filename, sheet_name, rows_factory = _job_spec(db, payload)
+    key = _result_key(db, payload.report, **params)
+    job = report_jobs.submit(db, key, payload.report, filename, sheet_name, rows_factory, user.employee_id)
+    enqueue_audit("REPORT", JOB_AUDIT_NAMES[payload.report], "JOB_SUBMIT", None, payload.model_dump(), user.employee_id)
+    return job
+
+
+@router.get("/jobs/{job_id}")
+def get_report_job(
+    job_id: str,
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    return report_jobs.as_dict(report_jobs.get(db, job_id, user.employee_id, user.role))
+
+
+@router.get("/jobs/{job_id}/download")
+def download_report_job(
+    job_id: str,
+    user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
+):
+    job = report_jobs.get(db, job_id, user.employee_id, user.role)
+    if job.status != "DONE":
+        raise HTTPException(status_code=409, detail=f"Report job is {job.status}")
+    path = report_jobs.artifact_path(job)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Report file is no longer available")
+    rows = report_jobs.as_dict(job)["rows"]
+    enqueue_audit("REPORT", JOB_AUDIT_NAMES[job.report], "DOWNLOAD", None, f"job_id={job_id},rows={rows}", user.employee_id)
+    return FileResponse(path, media_type=XLSX_MEDIA_TYPE, filename=job.filename)
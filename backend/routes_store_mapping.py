@@ -2,11 +2,14 @@ import json
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest, VendorMaster, VendorStoreMappingMaster
+from queries import active_store_mappings
+from rollups import refresh_stores
 from schemas import ApprovalDecision, StoreMappingDeactivateRequest, StoreMappingRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history, safe_json_loads_clob
 from utils_month_lock import enforce_month_unlocked
@@ -19,8 +22,8 @@ router = APIRouter(prefix="/api/store-mappings", tags=["store-mappings"])
 def list_mappings(
     include_inactive: bool = False,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     enforce_month_unlocked(db, datetime.utcnow().strftime("%Y%m"))
     query = db.query(VendorStoreMappingMaster)
     if not include_inactive:
@@ -61,23 +64,23 @@ def list_mappings(
         }
         for m in mappings
     ]
-    log_audit(db, "STORE_MAPPING", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("STORE_MAPPING", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("/requests")
-def request_mapping(payload: StoreMappingRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def request_mapping(
+    payload: StoreMappingRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     approvals = []
     for row in payload.mappings:
         vendor = db.query(VendorMaster).filter(VendorMaster.vendor_id == row.vendor_id).first()
         if not vendor:
-            db.close()
             raise HTTPException(status_code=404, detail="Vendor not found")
         mapping = VendorStoreMappingMaster(
             vendor_id=row.vendor_id,
@@ -115,7 +118,6 @@ def request_mapping(payload: StoreMappingRequest, user: AuthUser = Depends(requi
         user.employee_id,
     )
     db.commit()
-    db.close()
     return {"approval_ids": approvals}
 
 
@@ -124,11 +126,10 @@ def approve_mapping(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "STORE_MAPPING":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -139,7 +140,6 @@ def approve_mapping(
         .first()
     )
     if not mapping:
-        db.close()
         raise HTTPException(status_code=404, detail="Mapping not found")
 
     proposed = safe_json_loads_clob(approval.proposed_data, raise_on_error=False)
@@ -158,16 +158,14 @@ def approve_mapping(
         )
         approval.approved_date = datetime.utcnow()
         log_audit(db, "STORE_MAPPING", mapping.mapping_id, "DEACTIVATE", None, decision.comment, user.employee_id)
+        db.flush()
+        refresh_stores(db, mapping.vendor_id, [mapping.bank_store_code])
         db.commit()
-        db.close()
         return {"status": "APPROVED"}
 
     active = (
-        db.query(VendorStoreMappingMaster)
-        .filter(VendorStoreMappingMaster.vendor_id == mapping.vendor_id)
-        .filter(VendorStoreMappingMaster.vendor_store_code == mapping.vendor_store_code)
+        active_store_mappings(db, mapping.vendor_id, mapping.vendor_store_code)
         .filter(VendorStoreMappingMaster.mapping_id != mapping.mapping_id)
-        .filter(VendorStoreMappingMaster.status == "ACTIVE")
         .all()
     )
     for row in active:
@@ -186,8 +184,10 @@ def approve_mapping(
     approval.approved_date = datetime.utcnow()
 
     log_audit(db, "STORE_MAPPING", mapping.mapping_id, "APPROVE", None, decision.comment, user.employee_id)
+    db.flush()
+    # Transactions without their own customer take it from the mapping in effect
+    refresh_stores(db, mapping.vendor_id, [mapping.bank_store_code] + [row.bank_store_code for row in active])
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -196,18 +196,17 @@ def request_deactivate_mapping(
     mapping_id: int,
     payload: StoreMappingDeactivateRequest,
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     mapping = (
         db.query(VendorStoreMappingMaster)
         .filter(VendorStoreMappingMaster.mapping_id == mapping_id)
         .first()
     )
     if not mapping:
-        db.close()
         raise HTTPException(status_code=404, detail="Mapping not found")
 
     approval = ApprovalRequest(
@@ -245,7 +244,6 @@ def request_deactivate_mapping(
         user.employee_id,
     )
     db.commit()
-    db.close()
     return {"approval_id": approval_id}
 
 
@@ -254,11 +252,10 @@ def reject_mapping(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "STORE_MAPPING":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -272,5 +269,4 @@ def reject_mapping(
 
     log_audit(db, "STORE_MAPPING", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
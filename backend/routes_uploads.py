@@ -1,16 +1,16 @@
-import io
 import json
 from datetime import datetime
+from itertools import islice
 from typing import Optional
 
 import pandas as pd
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import Session, joinedload
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
+from id_allocator import add_with_ids
 from models import (
     BankStoreMaster,
     CanonicalTransaction,
@@ -25,6 +25,10 @@ from models import (
     VendorFileFormatConfig,
     VendorMaster,
 )
+import staging_archive
+from queries import active_store_mappings, batch_remittances, batch_transactions
+from report_export import PAGE_SIZE, keyset_iter, write_xlsx, xlsx_streaming_response
+from rollups import refresh_month
 from schemas import UploadResponse
 from utils_approval import safe_json_loads_clob
 from utils_month_lock import enforce_month_unlocked
@@ -119,10 +123,7 @@ def _format_mapping_dict(format_config):
 
 def _lookup_mapping(db, vendor_id, vendor_store_code, as_of_date):
     return (
-        db.query(VendorStoreMappingMaster)
-        .filter(VendorStoreMappingMaster.vendor_id == vendor_id)
-        .filter(VendorStoreMappingMaster.vendor_store_code == vendor_store_code)
-        .filter(VendorStoreMappingMaster.status == "ACTIVE")
+        active_store_mappings(db, vendor_id, vendor_store_code)
         .filter(VendorStoreMappingMaster.effective_from <= as_of_date)
         .filter(
             (VendorStoreMappingMaster.effective_to.is_(None))
@@ -135,10 +136,7 @@ def _lookup_mapping(db, vendor_id, vendor_store_code, as_of_date):
 def _lookup_mapping_lenient(db, vendor_id, vendor_store_code):
     """Lookup store mapping without effective date check (for uploads with historical data)."""
     return (
-        db.query(VendorStoreMappingMaster)
-        .filter(VendorStoreMappingMaster.vendor_id == vendor_id)
-        .filter(VendorStoreMappingMaster.vendor_store_code == vendor_store_code)
-        .filter(VendorStoreMappingMaster.status == "ACTIVE")
+        active_store_mappings(db, vendor_id, vendor_store_code)
         .order_by(VendorStoreMappingMaster.effective_from.desc())
         .first()
     )
@@ -149,16 +147,15 @@ def validate_finacle_upload(
     misDate: str = Form(...),
     file: UploadFile = File(...),
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
     """Validate Finacle file before upload - returns missing store codes."""
-    db = SessionLocal()
     mis_date = pd.to_datetime(misDate).date()
     df = pd.read_excel(file.file)
     df.columns = [str(c).strip() for c in df.columns]
     headers = set(df.columns)
     missing_headers = FINACLE_REQUIRED_HEADERS - headers
     if missing_headers:
-        db.close()
         raise HTTPException(
             status_code=400, detail=f"Missing required headers: {', '.join(sorted(missing_headers))}"
         )
@@ -197,7 +194,6 @@ def validate_finacle_upload(
         )
         if not resolved:
             missing_store_codes.add(raw)
-    db.close()
     return {
         "total_rows": len(df.index),
         "missing_store_codes": sorted(missing_store_codes),
@@ -210,14 +206,13 @@ def upload_finacle(
     misDate: str = Form(...),
     file: UploadFile = File(...),
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     mis_date = pd.to_datetime(misDate).date()
     enforce_month_unlocked(db, mis_date.strftime("%Y%m"))
 
     existing = db.query(FinacleUploadBatch).filter(FinacleUploadBatch.mis_date == mis_date).first()
     if existing:
-        db.close()
         raise HTTPException(status_code=409, detail="Finacle MIS already uploaded for this date")
 
     df = pd.read_excel(file.file)
@@ -225,7 +220,6 @@ def upload_finacle(
     headers = set(df.columns)
     missing_headers = FINACLE_REQUIRED_HEADERS - headers
     if missing_headers:
-        db.close()
         raise HTTPException(
             status_code=400, detail=f"Missing required headers: {', '.join(sorted(missing_headers))}"
         )
@@ -268,11 +262,15 @@ def upload_finacle(
     invalid_rows = 0
     has_unmapped_stores = False
     missing_store_codes = set()
+    # Rows get their ids in blocks and are inserted in batches at the final flush
+    staged_rows = []
+    txns = []
     for index, row in df.iterrows():
         row_payload = _truncate_payload(json.dumps(row.to_dict(), default=str))
-        db.add(
+        staged_rows.append(
             FinacleRawStaging(
                 batch_id=batch.batch_id,
+                mis_date=batch.mis_date,
                 row_number=index + 1,
                 row_payload=row_payload,
             )
@@ -287,7 +285,7 @@ def upload_finacle(
 
         if not bank_store_code_raw or remittance_amount is None or remittance_date is None:
             invalid_rows += 1
-            db.add(
+            staged_rows.append(
                 FinacleInvalidRecord(
                     batch_id=batch.batch_id,
                     row_number=index + 1,
@@ -308,7 +306,7 @@ def upload_finacle(
             missing_store_codes.add(bank_store_code_raw)
             invalid_rows += 1
             has_unmapped_stores = True
-            db.add(
+            staged_rows.append(
                 FinacleInvalidRecord(
                     batch_id=batch.batch_id,
                     row_number=index + 1,
@@ -318,29 +316,37 @@ def upload_finacle(
             )
             continue
 
-        txn = CanonicalTransaction(
-            source="FINACLE",
-            bank_store_code=bank_store_code,
-            vendor_store_code=None,
-            account_no=account_no,
-            customer_id=customer_id,
-            pickup_date=remittance_date,
-            remittance_date=remittance_date,
-            pickup_amount=remittance_amount,
-            remittance_amount=remittance_amount,
-            pickup_type=None,
-            raw_batch_id=batch.batch_id,
+        txns.append(
+            CanonicalTransaction(
+                source="FINACLE",
+                bank_store_code=bank_store_code,
+                vendor_store_code=None,
+                account_no=account_no,
+                customer_id=customer_id,
+                pickup_date=remittance_date,
+                remittance_date=remittance_date,
+                pickup_amount=remittance_amount,
+                remittance_amount=remittance_amount,
+                pickup_type=None,
+                raw_batch_id=batch.batch_id,
+                mis_date=batch.mis_date,
+            )
         )
-        db.add(txn)
-        db.flush()
-        db.add(
+
+    add_with_ids(db, staged_rows)
+    add_with_ids(db, txns)
+    add_with_ids(
+        db,
+        (
             RemittanceEntry(
                 canonical_id=txn.canonical_id,
                 source="FINACLE",
                 status="UPLOADED",
                 created_by=user.employee_id,
             )
-        )
+            for txn in txns
+        ),
+    )
 
     if has_unmapped_stores:
         batch.status = "FAILED"
@@ -362,7 +368,6 @@ def upload_finacle(
     batch_id = batch.batch_id
     batch_status = batch.status
     db.commit()
-    db.close()
     return UploadResponse(
         batch_id=batch_id,
         total_rows=len(df.index),
@@ -378,8 +383,8 @@ def list_finacle_batches(
     date_from: str | None = None,
     date_to: str | None = None,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     q = db.query(FinacleUploadBatch)
     if date_from:
         try:
@@ -407,9 +412,7 @@ def list_finacle_batches(
         }
         for b in rows
     ]
-    log_audit(db, "UPLOAD", "FINACLE_BATCHES", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("UPLOAD", "FINACLE_BATCHES", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
@@ -424,35 +427,67 @@ def _format_finacle_cell(key, val):
     return val if val is not None and not (isinstance(val, float) and pd.isna(val)) else ""
 
 
+def _excel_serial_to_date(val):
+    if isinstance(val, (int, float)) and 1000 < val < 1000000:
+        try:
+            return (pd.Timestamp("1899-12-30") + pd.Timedelta(days=float(val))).strftime("%Y-%m-%d")
+        except Exception:
+            pass
+    return val
+
+
+def _batch_staging(db, staging_model, batch):
+    """Staging rows of a batch, pruned to its MIS month's partition."""
+    return (
+        db.query(staging_model)
+        .filter(staging_model.batch_id == batch.batch_id)
+        .filter(staging_model.mis_date == batch.mis_date)
+    )
+
+
+def _delete_batch_transactions(db, source, batch):
+    transactions = batch_transactions(db, source, [batch.batch_id], batch.mis_date)
+    canon_ids = [row[0] for row in transactions.with_entities(CanonicalTransaction.canonical_id)]
+    if canon_ids:
+        batch_remittances(db, canon_ids).delete(synchronize_session=False)
+    transactions.delete(synchronize_session=False)
+
+
+def _staged_payloads(db, source, batch, page_size=PAGE_SIZE):
+    """
+    Parsed row payloads of a batch in file order: from the staging table in keyset pages,
+    or from the batch's archive file once staging_archive.py has moved it there.
+    """
+    entry = staging_archive.archive_entry(db, source, batch.batch_id)
+    if entry is not None:
+        try:
+            raws = (row["row_payload"] for row in staging_archive.archived_rows(entry))
+        except FileNotFoundError:
+            raise HTTPException(status_code=410, detail="Archived batch file is missing")
+    else:
+        staging_model = staging_archive.SOURCES[source][1]
+        query = _batch_staging(db, staging_model, batch)
+        raws = (
+            row.row_payload.read() if hasattr(row.row_payload, "read") else row.row_payload
+            for row in keyset_iter(query, [staging_model.row_number, staging_model.raw_id], page_size)
+        )
+    return (safe_json_loads_clob(raw, default={}, raise_on_error=False) for raw in raws)
+
+
 @router.get("/finacle/{batch_id}/preview")
 def preview_finacle_batch(
     batch_id: int,
     limit: int = 25,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     batch = db.query(FinacleUploadBatch).filter(FinacleUploadBatch.batch_id == batch_id).first()
     if not batch:
-        db.close()
         raise HTTPException(status_code=404, detail="Batch not found")
-    rows = (
-        db.query(FinacleRawStaging)
-        .filter(FinacleRawStaging.batch_id == batch_id)
-        .order_by(FinacleRawStaging.row_number)
-        .limit(limit)
-        .all()
-    )
-    parsed = []
-    for row in rows:
-        raw = row.row_payload
-        if hasattr(raw, "read"):
-            raw = raw.read()
-        parsed.append(safe_json_loads_clob(raw, default={}, raise_on_error=False))
+    parsed = list(islice(_staged_payloads(db, "FINACLE", batch, page_size=max(limit, 1)), max(limit, 0)))
     headers = list(parsed[0].keys()) if parsed else []
     data_rows = [[_format_finacle_cell(key, item.get(key)) for key in headers] for item in parsed]
-    log_audit(db, "UPLOAD", batch_id, "PREVIEW", None, f"rows={len(parsed)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("UPLOAD", batch_id, "PREVIEW", None, f"rows={len(parsed)}", user.employee_id)
     return {"headers": headers, "rows": data_rows}
 
 
@@ -460,82 +495,40 @@ def preview_finacle_batch(
 def download_finacle_batch(
     batch_id: int,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     batch = db.query(FinacleUploadBatch).filter(FinacleUploadBatch.batch_id == batch_id).first()
     if not batch:
-        db.close()
         raise HTTPException(status_code=404, detail="Batch not found")
-    raw_rows = (
-        db.query(FinacleRawStaging)
-        .filter(FinacleRawStaging.batch_id == batch_id)
-        .order_by(FinacleRawStaging.row_number)
-        .all()
+    rows = (
+        {**item, "TRAN_DATE": _excel_serial_to_date(item["TRAN_DATE"])} if "TRAN_DATE" in item else item
+        for item in _staged_payloads(db, "FINACLE", batch)
     )
-    parsed = []
-    for row in raw_rows:
-        raw = row.row_payload
-        if hasattr(raw, "read"):
-            raw = raw.read()
-        parsed.append(safe_json_loads_clob(raw, default={}, raise_on_error=False))
-    headers = list(parsed[0].keys()) if parsed else []
-    df = pd.DataFrame(parsed, columns=headers if headers else None)
-    if "TRAN_DATE" in df.columns:
-        def _excel_serial_to_date(val):
-            if isinstance(val, (int, float)) and 1000 < val < 1000000:
-                try:
-                    return (pd.Timestamp("1899-12-30") + pd.Timedelta(days=float(val))).strftime("%Y-%m-%d")
-                except Exception:
-                    pass
-            return val
-        df["TRAN_DATE"] = df["TRAN_DATE"].apply(_excel_serial_to_date)
-    buffer = io.BytesIO()
-    df.to_excel(buffer, index=False)
-    buffer.seek(0)
+    spool, count = write_xlsx(rows)
     filename = f"finacle_upload_{batch_id}.xlsx"
-    log_audit(db, "UPLOAD", batch_id, "DOWNLOAD", None, f"rows={len(parsed)}", user.employee_id)
-    db.commit()
-    db.close()
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    enqueue_audit("UPLOAD", batch_id, "DOWNLOAD", None, f"rows={count}", user.employee_id)
+    return xlsx_streaming_response(filename, spool)
 
 
 @router.delete("/finacle/{batch_id}")
 def delete_finacle_batch(
     batch_id: int,
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     batch = db.query(FinacleUploadBatch).filter(FinacleUploadBatch.batch_id == batch_id).first()
     if not batch:
-        db.close()
         raise HTTPException(status_code=404, detail="Batch not found")
-    canon_ids = [
-        row[0]
-        for row in db.query(CanonicalTransaction.canonical_id)
-        .filter(CanonicalTransaction.raw_batch_id == batch_id)
-        .all()
-    ]
-    if canon_ids:
-        db.query(RemittanceEntry).filter(RemittanceEntry.canonical_id.in_(canon_ids)).delete(
-            synchronize_session=False
-        )
-    db.query(CanonicalTransaction).filter(CanonicalTransaction.raw_batch_id == batch_id).delete(
-        synchronize_session=False
-    )
+    _delete_batch_transactions(db, "FINACLE", batch)
     db.query(FinacleInvalidRecord).filter(FinacleInvalidRecord.batch_id == batch_id).delete(
         synchronize_session=False
     )
-    db.query(FinacleRawStaging).filter(FinacleRawStaging.batch_id == batch_id).delete(
-        synchronize_session=False
-    )
+    _batch_staging(db, FinacleRawStaging, batch).delete(synchronize_session=False)
+    archived_file = staging_archive.discard(db, "FINACLE", batch_id)
     db.delete(batch)
     log_audit(db, "UPLOAD", batch_id, "DELETE", None, None, user.employee_id)
     db.commit()
-    db.close()
+    staging_archive.remove_files([archived_file])
     return {"status": "DELETED"}
 
 
@@ -544,8 +537,8 @@ def list_vendor_batches(
     vendor_id: Optional[int] = None,
     limit: int = 50,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     query = (
         db.query(VendorUploadBatch, VendorMaster)
         .join(VendorMaster, VendorMaster.vendor_id == VendorUploadBatch.vendor_id)
@@ -568,9 +561,7 @@ def list_vendor_batches(
         }
         for b, v in rows
     ]
-    log_audit(db, "UPLOAD", "VENDOR_BATCHES", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("UPLOAD", "VENDOR_BATCHES", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
@@ -579,30 +570,15 @@ def preview_vendor_batch(
     batch_id: int,
     limit: int = 25,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     batch = db.query(VendorUploadBatch).filter(VendorUploadBatch.batch_id == batch_id).first()
     if not batch:
-        db.close()
         raise HTTPException(status_code=404, detail="Batch not found")
-    rows = (
-        db.query(VendorRawStaging)
-        .filter(VendorRawStaging.batch_id == batch_id)
-        .order_by(VendorRawStaging.row_number)
-        .limit(limit)
-        .all()
-    )
-    parsed = []
-    for row in rows:
-        raw = row.row_payload
-        if hasattr(raw, "read"):
-            raw = raw.read()
-        parsed.append(safe_json_loads_clob(raw, default={}, raise_on_error=False))
+    parsed = list(islice(_staged_payloads(db, "VENDOR", batch, page_size=max(limit, 1)), max(limit, 0)))
     headers = list(parsed[0].keys()) if parsed else []
     data_rows = [[item.get(key, "") for key in headers] for item in parsed]
-    log_audit(db, "UPLOAD", batch_id, "PREVIEW", None, f"rows={len(parsed)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("UPLOAD", batch_id, "PREVIEW", None, f"rows={len(parsed)}", user.employee_id)
     return {"headers": headers, "rows": data_rows}
 
 
@@ -610,73 +586,40 @@ def preview_vendor_batch(
 def download_vendor_batch(
     batch_id: int,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     batch = db.query(VendorUploadBatch).filter(VendorUploadBatch.batch_id == batch_id).first()
     if not batch:
-        db.close()
         raise HTTPException(status_code=404, detail="Batch not found")
-    raw_rows = (
-        db.query(VendorRawStaging)
-        .filter(VendorRawStaging.batch_id == batch_id)
-        .order_by(VendorRawStaging.row_number)
-        .all()
-    )
-    parsed = []
-    for row in raw_rows:
-        raw = row.row_payload
-        if hasattr(raw, "read"):
-            raw = raw.read()
-        parsed.append(safe_json_loads_clob(raw, default={}, raise_on_error=False))
-    headers = list(parsed[0].keys()) if parsed else []
-    df = pd.DataFrame(parsed, columns=headers if headers else None)
-    buffer = io.BytesIO()
-    df.to_excel(buffer, index=False)
-    buffer.seek(0)
+    spool, count = write_xlsx(_staged_payloads(db, "VENDOR", batch))
     filename = f"vendor_upload_{batch_id}.xlsx"
-    log_audit(db, "UPLOAD", batch_id, "DOWNLOAD", None, f"rows={len(parsed)}", user.employee_id)
-    db.commit()
-    db.close()
-    return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-    )
+    enqueue_audit("UPLOAD", batch_id, "DOWNLOAD", None, f"rows={count}", user.employee_id)
+    return xlsx_streaming_response(filename, spool)
 
 
 @router.delete("/vendor/{batch_id}")
 def delete_vendor_batch(
     batch_id: int,
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     batch = db.query(VendorUploadBatch).filter(VendorUploadBatch.batch_id == batch_id).first()
     if not batch:
-        db.close()
         raise HTTPException(status_code=404, detail="Batch not found")
-    canon_ids = [
-        row[0]
-        for row in db.query(CanonicalTransaction.canonical_id)
-        .filter(CanonicalTransaction.raw_batch_id == batch_id)
-        .all()
-    ]
-    if canon_ids:
-        db.query(RemittanceEntry).filter(RemittanceEntry.canonical_id.in_(canon_ids)).delete(
-            synchronize_session=False
-        )
-    db.query(CanonicalTransaction).filter(CanonicalTransaction.raw_batch_id == batch_id).delete(
-        synchronize_session=False
-    )
+    _delete_batch_transactions(db, "VENDOR", batch)
     db.query(VendorInvalidRecord).filter(VendorInvalidRecord.batch_id == batch_id).delete(
         synchronize_session=False
     )
-    db.query(VendorRawStaging).filter(VendorRawStaging.batch_id == batch_id).delete(
-        synchronize_session=False
-    )
+    _batch_staging(db, VendorRawStaging, batch).delete(synchronize_session=False)
+    archived_file = staging_archive.discard(db, "VENDOR", batch_id)
+    month_key = batch.mis_date.strftime("%Y%m")
+    vendor_id = batch.vendor_id
     db.delete(batch)
+    db.flush()
+    refresh_month(db, month_key, [vendor_id])
     log_audit(db, "UPLOAD", batch_id, "DELETE", None, None, user.employee_id)
     db.commit()
-    db.close()
+    staging_archive.remove_files([archived_file])
     return {"status": "DELETED"}
 
 
@@ -686,8 +629,8 @@ def upload_vendor(
     misDate: str = Form(...),
     file: UploadFile = File(...),
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     mis_date = pd.to_datetime(misDate).date()
     enforce_month_unlocked(db, mis_date.strftime("%Y%m"))
 
@@ -698,7 +641,6 @@ def upload_vendor(
         .first()
     )
     if not vendor:
-        db.close()
         raise HTTPException(status_code=404, detail="Vendor not found or inactive")
 
     existing = (
@@ -709,28 +651,15 @@ def upload_vendor(
         .first()
     )
     if existing and existing.status != "FAILED":
-        db.close()
         raise HTTPException(status_code=409, detail="Vendor MIS already uploaded for this date")
+    archived_file = None
     if existing and existing.status == "FAILED":
-        canon_ids = [
-            row[0]
-            for row in db.query(CanonicalTransaction.canonical_id)
-            .filter(CanonicalTransaction.raw_batch_id == existing.batch_id)
-            .all()
-        ]
-        if canon_ids:
-            db.query(RemittanceEntry).filter(RemittanceEntry.canonical_id.in_(canon_ids)).delete(
-                synchronize_session=False
-            )
-        db.query(CanonicalTransaction).filter(
-            CanonicalTransaction.raw_batch_id == existing.batch_id
-        ).delete(synchronize_session=False)
+        _delete_batch_transactions(db, "VENDOR", existing)
         db.query(VendorInvalidRecord).filter(
             VendorInvalidRecord.batch_id == existing.batch_id
         ).delete(synchronize_session=False)
-        db.query(VendorRawStaging).filter(VendorRawStaging.batch_id == existing.batch_id).delete(
-            synchronize_session=False
-        )
+        _batch_staging(db, VendorRawStaging, existing).delete(synchronize_session=False)
+        archived_file = staging_archive.discard(db, "VENDOR", existing.batch_id)
         existing.status = "RECEIVED"
         existing.file_name = file.filename
         existing.uploaded_by = user.employee_id
@@ -738,12 +667,10 @@ def upload_vendor(
 
     format_config = _load_vendor_format(db, vendor.vendor_id)
     if not format_config:
-        db.close()
         raise HTTPException(status_code=400, detail="Vendor file format config not active")
 
     mapping = _format_mapping_dict(format_config)
     if not mapping:
-        db.close()
         raise HTTPException(status_code=400, detail="Vendor file format has no header mapping")
 
     df = pd.read_excel(file.file)
@@ -755,7 +682,6 @@ def upload_vendor(
     ]
     missing = [col for col in required if col and col not in headers]
     if missing:
-        db.close()
         raise HTTPException(status_code=400, detail=f"Missing required headers: {', '.join(missing)}")
 
     if existing:
@@ -774,11 +700,14 @@ def upload_vendor(
     invalid_rows = 0
     has_unmapped = False
     valid_rows = []
+    # Rows get their ids in blocks and are inserted in batches at the final flush
+    staged_rows = []
     for index, row in df.iterrows():
         row_payload = _truncate_payload(json.dumps(row.to_dict(), default=str))
-        db.add(
+        staged_rows.append(
             VendorRawStaging(
                 batch_id=batch.batch_id,
+                mis_date=batch.mis_date,
                 row_number=index + 1,
                 row_payload=row_payload,
             )
@@ -816,7 +745,7 @@ def upload_vendor(
 
         if not vendor_store_code or pickup_date is None or pickup_amount is None:
             invalid_rows += 1
-            db.add(
+            staged_rows.append(
                 VendorInvalidRecord(
                     batch_id=batch.batch_id,
                     row_number=index + 1,
@@ -830,7 +759,7 @@ def upload_vendor(
         if not mapping_row:
             invalid_rows += 1
             has_unmapped = True
-            db.add(
+            staged_rows.append(
                 VendorInvalidRecord(
                     batch_id=batch.batch_id,
                     row_number=index + 1,
@@ -859,33 +788,42 @@ def upload_vendor(
             }
         )
 
+    add_with_ids(db, staged_rows)
     if has_unmapped:
         batch.status = "FAILED"
     else:
-        for row in valid_rows:
-            txn = CanonicalTransaction(
-                source="VENDOR",
-                bank_store_code=row["mapping_row"].bank_store_code,
-                vendor_store_code=row["vendor_store_code"],
-                account_no=row["account_no"] or row["mapping_row"].account_no,
-                customer_id=row["customer_id"] or row["mapping_row"].customer_id,
-                pickup_date=row["pickup_date"],
-                remittance_date=row["remittance_date"],
-                pickup_amount=row["pickup_amount"],
-                remittance_amount=row["remittance_amount"],
-                pickup_type=row["pickup_type"],
-                raw_batch_id=batch.batch_id,
-            )
-            db.add(txn)
-            db.flush()
-            db.add(
+        txns = add_with_ids(
+            db,
+            (
+                CanonicalTransaction(
+                    source="VENDOR",
+                    bank_store_code=row["mapping_row"].bank_store_code,
+                    vendor_store_code=row["vendor_store_code"],
+                    account_no=row["account_no"] or row["mapping_row"].account_no,
+                    customer_id=row["customer_id"] or row["mapping_row"].customer_id,
+                    pickup_date=row["pickup_date"],
+                    remittance_date=row["remittance_date"],
+                    pickup_amount=row["pickup_amount"],
+                    remittance_amount=row["remittance_amount"],
+                    pickup_type=row["pickup_type"],
+                    raw_batch_id=batch.batch_id,
+                    mis_date=batch.mis_date,
+                )
+                for row in valid_rows
+            ),
+        )
+        add_with_ids(
+            db,
+            (
                 RemittanceEntry(
                     canonical_id=txn.canonical_id,
                     source="VENDOR",
                     status="UPLOADED",
                     created_by=user.employee_id,
                 )
-            )
+                for txn in txns
+            ),
+        )
         batch.status = "PROCESSED" if invalid_rows < len(df.index) else "FAILED"
 
     log_audit(
@@ -898,10 +836,11 @@ def upload_vendor(
         changed_by=user.employee_id,
     )
     db.flush()
+    refresh_month(db, mis_date.strftime("%Y%m"), [vendor.vendor_id])
     batch_id = batch.batch_id
     batch_status = batch.status
     db.commit()
-    db.close()
+    staging_archive.remove_files([archived_file])
     return UploadResponse(
         batch_id=batch_id,
         total_rows=len(df.index),
@@ -916,8 +855,8 @@ def validate_vendor_upload(
     misDate: str = Form(...),
     file: UploadFile = File(...),
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     mis_date = pd.to_datetime(misDate).date()
 
     vendor = (
@@ -927,17 +866,14 @@ def validate_vendor_upload(
         .first()
     )
     if not vendor:
-        db.close()
         raise HTTPException(status_code=404, detail="Vendor not found or inactive")
 
     format_config = _load_vendor_format(db, vendor.vendor_id)
     if not format_config:
-        db.close()
         raise HTTPException(status_code=400, detail="Vendor file format config not active")
 
     mapping = _format_mapping_dict(format_config)
     if not mapping:
-        db.close()
         raise HTTPException(status_code=400, detail="Vendor file format has no header mapping")
 
     df = pd.read_excel(file.file)
@@ -955,7 +891,6 @@ def validate_vendor_upload(
     ]
     missing = [col for col in required if col and col not in headers]
     if missing:
-        db.close()
         raise HTTPException(status_code=400, detail=f"Missing required headers: {', '.join(missing)}")
 
     invalid_rows = 0
@@ -973,7 +908,6 @@ def validate_vendor_upload(
         if not mapping_row:
             unmapped_codes.add(vendor_store_code)
 
-    db.close()
     return {
         "total_rows": len(df.index),
         "invalid_rows": invalid_rows,
@@ -1,10 +1,11 @@
 """User management - add/remove access for AD users. ADMIN only."""
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
-from auth import AuthUser, require_roles
+from auth import AuthUser, invalidate_user, require_roles
 from audit import log_audit
-from db import SessionLocal
+from db import get_db
 from models import UserAccount
 
 
@@ -15,9 +16,8 @@ VALID_ROLES = ("MAKER", "CHECKER", "ADMIN", "AUDITOR")
 
 
 @router.get("")
-def list_users(user: AuthUser = Depends(require_roles("ADMIN"))):
+def list_users(user: AuthUser = Depends(require_roles("ADMIN")), db: Session = Depends(get_db)):
     """List all users with application access."""
-    db = SessionLocal()
     rows = db.query(UserAccount).order_by(UserAccount.employee_id).all()
     result = [
         {
@@ -30,7 +30,6 @@ def list_users(user: AuthUser = Depends(require_roles("ADMIN"))):
         }
         for r in rows
     ]
-    db.close()
     return result
 
 
@@ -38,6 +37,7 @@ def list_users(user: AuthUser = Depends(require_roles("ADMIN"))):
 def add_user(
     payload: dict,
     user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Grant application access to an AD user. User logs in with Bank AD; role from DB."""
     employee_id = (payload.get("employee_id") or "").strip()
@@ -54,14 +54,12 @@ def add_user(
             detail=f"role_code must be one of: {', '.join(VALID_ROLES)}",
         )
 
-    db = SessionLocal()
     existing = (
         db.query(UserAccount)
         .filter(UserAccount.employee_id == employee_id)
         .first()
     )
     if existing:
-        db.close()
         raise HTTPException(
             status_code=409,
             detail=f"User {employee_id} already has access. Use deactivate then add to change role.",
@@ -87,7 +85,6 @@ def add_user(
     )
     db.commit()
     db.refresh(new_user)
-    db.close()
     return {
         "user_id": new_user.user_id,
         "employee_id": new_user.employee_id,
@@ -101,18 +98,17 @@ def add_user(
 def deactivate_user(
     user_id: int,
     user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Revoke access by setting status to INACTIVE. User cannot log in until reactivated."""
-    db = SessionLocal()
     target = db.query(UserAccount).filter(UserAccount.user_id == user_id).first()
     if not target:
-        db.close()
         raise HTTPException(status_code=404, detail="User not found")
     if target.employee_id == user.employee_id:
-        db.close()
         raise HTTPException(status_code=400, detail="Cannot deactivate yourself")
 
     target.status = "INACTIVE"
+    employee_id = target.employee_id
     log_audit(
         db,
         "USER_ACCOUNT",
@@ -123,7 +119,7 @@ def deactivate_user(
         user.employee_id,
     )
     db.commit()
-    db.close()
+    invalidate_user(employee_id)
     return {"status": "ok", "user_id": user_id}
 
 
@@ -131,12 +127,11 @@ def deactivate_user(
 def activate_user(
     user_id: int,
     user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Reactivate a deactivated user."""
-    db = SessionLocal()
     target = db.query(UserAccount).filter(UserAccount.user_id == user_id).first()
     if not target:
-        db.close()
         raise HTTPException(status_code=404, detail="User not found")
 
     target.status = "ACTIVE"
@@ -150,7 +145,6 @@ def activate_user(
         user.employee_id,
     )
     db.commit()
-    db.close()
     return {"status": "ok", "user_id": user_id}
 
 
@@ -159,6 +153,7 @@ def update_user_role(
     user_id: int,
     payload: dict,
     user: AuthUser = Depends(require_roles("ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Update user role."""
     role_code = (payload.get("role_code") or "").strip().upper()
@@ -168,14 +163,13 @@ def update_user_role(
             detail=f"role_code must be one of: {', '.join(VALID_ROLES)}",
         )
 
-    db = SessionLocal()
     target = db.query(UserAccount).filter(UserAccount.user_id == user_id).first()
     if not target:
-        db.close()
         raise HTTPException(status_code=404, detail="User not found")
 
     old_role = target.role_code
     target.role_code = role_code
+    employee_id = target.employee_id
     log_audit(
         db,
         "USER_ACCOUNT",
@@ -186,5 +180,5 @@ def update_user_role(
         user.employee_id,
     )
     db.commit()
-    db.close()
+    invalidate_user(employee_id)
     return {"status": "ok", "user_id": user_id, "role_code": role_code}
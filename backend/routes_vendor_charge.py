@@ -2,10 +2,11 @@ import json
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
 from audit import log_audit
-from db import SessionLocal
+from db import get_db
 from models import ApprovalRequest, VendorChargeMaster, VendorMaster
 from schemas import ApprovalDecision, VendorChargeRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history
@@ -20,9 +21,9 @@ def list_vendor_charges(
     vendor_id: int | None = None,
     include_inactive: bool = False,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
     """List vendor charge configurations, optionally filtered by vendor."""
-    db = SessionLocal()
     query = (
         db.query(VendorChargeMaster, VendorMaster.vendor_name, VendorMaster.vendor_code)
         .outerjoin(VendorMaster, VendorChargeMaster.vendor_id == VendorMaster.vendor_id)
@@ -47,18 +48,18 @@ def list_vendor_charges(
         }
         for c, name, code in rows
     ]
-    db.close()
     return result
 
 
 @router.post("/requests")
 def request_vendor_charge(
-    payload: VendorChargeRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))
+    payload: VendorChargeRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     enforce_month_unlocked(db, payload.effective_from.strftime("%Y%m"))
     charge = VendorChargeMaster(
         vendor_id=payload.vendor_id,
@@ -87,7 +88,6 @@ def request_vendor_charge(
     approval_id = approval.approval_id
     vendor_charge_id = charge.vendor_charge_id
     db.commit()
-    db.close()
     return {"approval_id": approval_id, "vendor_charge_id": vendor_charge_id}
 
 
@@ -96,17 +96,15 @@ def approve_vendor_charge(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "VENDOR_CHARGE":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
     charge = db.query(VendorChargeMaster).filter(VendorChargeMaster.vendor_charge_id == approval.entity_id).first()
     if not charge:
-        db.close()
         raise HTTPException(status_code=404, detail="Charge not found")
 
     active = (
@@ -134,7 +132,6 @@ def approve_vendor_charge(
 
     log_audit(db, "VENDOR_CHARGE", charge.vendor_charge_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -143,11 +140,10 @@ def reject_vendor_charge(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "VENDOR_CHARGE":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -161,5 +157,4 @@ def reject_vendor_charge(
 
     log_audit(db, "VENDOR_CHARGE", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
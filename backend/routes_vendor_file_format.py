@@ -4,10 +4,11 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest, VendorFileFormatConfig, VendorFileFormatHeaderMapping
 from schemas import ApprovalDecision, VendorFileFormatRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history
@@ -27,8 +28,8 @@ def _header_mapping_to_json(mappings):
 def list_vendor_formats(
     vendor_id: Optional[int] = None,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     query = (
         db.query(VendorFileFormatConfig, VendorMaster)
         .options(joinedload(VendorFileFormatConfig.header_mappings))
@@ -51,20 +52,19 @@ def list_vendor_formats(
         }
         for c, v in rows
     ]
-    log_audit(db, "VENDOR_FILE_FORMAT", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("VENDOR_FILE_FORMAT", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("/requests")
 def request_vendor_format(
-    payload: VendorFileFormatRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))
+    payload: VendorFileFormatRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     config = VendorFileFormatConfig(
         vendor_id=payload.vendor_id,
         format_name=payload.format_name,
@@ -102,7 +102,6 @@ def request_vendor_format(
     format_id = config.format_id
     log_audit(db, "VENDOR_FILE_FORMAT", config.format_id, "REQUEST", None, payload.model_dump(), user.employee_id)
     db.commit()
-    db.close()
     return {"approval_id": approval_id, "format_id": format_id}
 
 
@@ -110,8 +109,8 @@ def request_vendor_format(
 def list_vendor_format_requests(
     vendor_id: Optional[int] = None,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     query = (
         db.query(ApprovalRequest, VendorFileFormatConfig, VendorMaster)
         .join(
@@ -139,9 +138,7 @@ def list_vendor_format_requests(
         }
         for a, c, v in rows
     ]
-    log_audit(db, "VENDOR_FILE_FORMAT", "REQUEST_LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("VENDOR_FILE_FORMAT", "REQUEST_LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
@@ -150,17 +147,15 @@ def approve_vendor_format(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "VENDOR_FILE_FORMAT":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
     config = db.query(VendorFileFormatConfig).filter(VendorFileFormatConfig.format_id == approval.entity_id).first()
     if not config:
-        db.close()
         raise HTTPException(status_code=404, detail="Config not found")
 
     active = (
@@ -187,7 +182,6 @@ def approve_vendor_format(
 
     log_audit(db, "VENDOR_FILE_FORMAT", config.format_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -195,26 +189,23 @@ def approve_vendor_format(
 def delete_vendor_format(
     format_id: int,
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Deactivate (delete) an active vendor file format config."""
-    db = SessionLocal()
     config = (
         db.query(VendorFileFormatConfig)
         .filter(VendorFileFormatConfig.format_id == format_id)
         .first()
     )
     if not config:
-        db.close()
         raise HTTPException(status_code=404, detail="Vendor file format not found")
     if config.status != "ACTIVE":
-        db.close()
         raise HTTPException(status_code=400, detail="Only ACTIVE formats can be deleted")
 
     config.status = "INACTIVE"
     config.effective_to = datetime.utcnow().date()
     log_audit(db, "VENDOR_FILE_FORMAT", format_id, "DELETE", None, "Deactivated by user", user.employee_id)
     db.commit()
-    db.close()
     return {"status": "DELETED", "format_id": format_id}
 
 
@@ -223,11 +214,10 @@ def reject_vendor_format(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "VENDOR_FILE_FORMAT":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -241,5 +231,4 @@ def reject_vendor_format(
 
     log_audit(db, "VENDOR_FILE_FORMAT", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
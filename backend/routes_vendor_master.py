@@ -2,10 +2,11 @@ import json
 from datetime import datetime, timedelta, date
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
-from audit import log_audit
-from db import SessionLocal
+from audit import enqueue_audit, log_audit
+from db import get_db
 from models import ApprovalRequest, VendorMaster
 from schemas import ApprovalDecision, VendorDeactivateRequest, VendorMasterRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history, safe_json_loads_clob
@@ -19,8 +20,8 @@ router = APIRouter(prefix="/api/vendors", tags=["vendors"])
 def list_vendors(
     include_inactive: bool = False,
     user: AuthUser = Depends(require_roles("MAKER", "CHECKER", "ADMIN", "AUDITOR")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     query = db.query(VendorMaster)
     if not include_inactive:
         query = query.filter(VendorMaster.status == "ACTIVE")
@@ -29,22 +30,22 @@ def list_vendors(
         {"vendor_id": v.vendor_id, "name": v.vendor_name, "code": v.vendor_code, "status": v.status}
         for v in vendors
     ]
-    log_audit(db, "VENDOR_MASTER", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
-    db.commit()
-    db.close()
+    enqueue_audit("VENDOR_MASTER", "LIST", "VIEW", None, f"count={len(result)}", user.employee_id)
     return result
 
 
 @router.post("")
-def request_vendor(payload: VendorMasterRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def request_vendor(
+    payload: VendorMasterRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     enforce_month_unlocked(db, payload.effective_from.strftime("%Y%m"))
     existing = db.query(VendorMaster).filter(VendorMaster.vendor_code == payload.vendor_code).first()
     if existing:
-        db.close()
         raise HTTPException(status_code=400, detail="Vendor code already exists or pending approval")
 
     vendor = VendorMaster(
@@ -73,7 +74,6 @@ def request_vendor(payload: VendorMasterRequest, user: AuthUser = Depends(requir
     vendor_id = vendor.vendor_id
     log_audit(db, "VENDOR_MASTER", vendor.vendor_id, "REQUEST", None, payload.model_dump(), user.employee_id)
     db.commit()
-    db.close()
     return {"approval_id": approval_id, "vendor_id": vendor_id}
 
 
@@ -82,18 +82,16 @@ def approve_vendor(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "VENDOR_MASTER":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
     db.refresh(approval)  # Force load CLOB columns (helps Oracle on Windows)
     vendor = db.query(VendorMaster).filter(VendorMaster.vendor_id == approval.entity_id).first()
     if not vendor:
-        db.close()
         raise HTTPException(status_code=404, detail="Vendor not found")
 
     proposed = safe_json_loads_clob(approval.proposed_data, raise_on_error=False)
@@ -126,7 +124,6 @@ def approve_vendor(
 
     log_audit(db, "VENDOR_MASTER", vendor.vendor_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -135,11 +132,10 @@ def reject_vendor(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "VENDOR_MASTER":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -153,7 +149,6 @@ def reject_vendor(
 
     log_audit(db, "VENDOR_MASTER", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
 
 
@@ -162,6 +157,7 @@ def request_deactivate_vendor(
     vendor_id: int,
     payload: VendorDeactivateRequest,
     user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
     """Request vendor deactivation. Requires maker-checker approval."""
     if payload.vendor_id != vendor_id:
@@ -169,13 +165,10 @@ def request_deactivate_vendor(
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     vendor = db.query(VendorMaster).filter(VendorMaster.vendor_id == vendor_id).first()
     if not vendor:
-        db.close()
         raise HTTPException(status_code=404, detail="Vendor not found")
     if vendor.status != "ACTIVE":
-        db.close()
         raise HTTPException(status_code=400, detail="Only ACTIVE vendors can be deactivated")
 
     original_data = json.dumps(
@@ -199,5 +192,4 @@ def request_deactivate_vendor(
     approval_id = approval.approval_id
     log_audit(db, "VENDOR_MASTER", vendor_id, "DEACTIVATE_REQUEST", None, payload.reason, user.employee_id)
     db.commit()
-    db.close()
     return {"approval_id": approval_id}
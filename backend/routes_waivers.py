@@ -2,10 +2,11 @@ import json
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 
 from auth import AuthUser, require_roles
 from audit import log_audit
-from db import SessionLocal
+from db import get_db
 from models import ApprovalRequest, WaiverMaster
 from schemas import ApprovalDecision, WaiverRequest
 from utils_approval import append_comment_history, enforce_checker_rules, init_comment_history
@@ -16,11 +17,14 @@ router = APIRouter(prefix="/api/waivers", tags=["waivers"])
 
 
 @router.post("/requests")
-def request_waiver(payload: WaiverRequest, user: AuthUser = Depends(require_roles("MAKER", "ADMIN"))):
+def request_waiver(
+    payload: WaiverRequest,
+    user: AuthUser = Depends(require_roles("MAKER", "ADMIN")),
+    db: Session = Depends(get_db),
+):
     if payload.maker_id != user.employee_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Maker mismatch")
 
-    db = SessionLocal()
     enforce_month_unlocked(db, payload.waiver_from.strftime("%Y%m"))
     waiver = WaiverMaster(
         customer_id=payload.customer_id,
@@ -48,7 +52,6 @@ def request_waiver(payload: WaiverRequest, user: AuthUser = Depends(require_role
     db.add(approval)
     log_audit(db, "WAIVER", waiver.waiver_id, "REQUEST", None, payload.model_dump(), user.employee_id)
     db.commit()
-    db.close()
     return {"approval_id": approval.approval_id, "waiver_id": waiver.waiver_id}
 
 
@@ -57,17 +60,15 @@ def approve_waiver(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "WAIVER":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
     waiver = db.query(WaiverMaster).filter(WaiverMaster.waiver_id == approval.entity_id).first()
     if not waiver:
-        db.close()
         raise HTTPException(status_code=404, detail="Waiver not found")
 
     active = (
@@ -94,7 +95,6 @@ def approve_waiver(
 
     log_audit(db, "WAIVER", waiver.waiver_id, "APPROVE", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "APPROVED"}
 
 
@@ -103,11 +103,10 @@ def reject_waiver(
     approval_id: int,
     decision: ApprovalDecision,
     user: AuthUser = Depends(require_roles("CHECKER", "ADMIN")),
+    db: Session = Depends(get_db),
 ):
-    db = SessionLocal()
     approval = db.query(ApprovalRequest).filter(ApprovalRequest.approval_id == approval_id).first()
     if not approval or approval.entity_type != "WAIVER":
-        db.close()
         raise HTTPException(status_code=404, detail="Approval not found")
     enforce_checker_rules(user, approval.maker_id, decision.checker_id, decision.comment)
 
@@ -121,5 +120,4 @@ def reject_waiver(
 
     log_audit(db, "WAIVER", approval.entity_id, "REJECT", None, decision.comment, user.employee_id)
     db.commit()
-    db.close()
     return {"status": "REJECTED"}
@@ -291,3 +291,48 @@ class ExceptionResponse(BaseModel):
     recon_id: int
     exception_type: str
     status: str
+
+
+class SimulatedVendorCharge(BaseModel):
+    vendor_id: int
+    pickup_type: str
+    base_charge: float
+    effective_from: Optional[date] = None
+
+
+class SimulatedSlab(BaseModel):
+    amount_from: float
+    amount_to: float
+    charge_amount: float
+
+
+class SimulatedSlabSet(BaseModel):
+    vendor_id: int
+    slabs: list[SimulatedSlab]
+    effective_from: Optional[date] = None
+
+
+class SimulatedWaiver(BaseModel):
+    customer_id: str
+    waiver_type: str
+    waiver_percentage: Optional[float] = None
+    waiver_cap_amount: Optional[float] = None
+    waiver_from: Optional[date] = None
+    waiver_to: Optional[date] = None
+
+
+class ChargeSimulationRequest(BaseModel):
+    month_from: str
+    month_to: str
+    vendor_charges: list[SimulatedVendorCharge] = []
+    customer_charge_slabs: list[SimulatedSlabSet] = []
+    waivers: list[SimulatedWaiver] = []
+    approval_ids: list[int] = []
+
+
+class ReportJobRequest(BaseModel):
+    report: str
+    from_date: str
+    to_date: str
+    vendor_id: Optional[int] = None
+    customer_id: Optional[str] = None
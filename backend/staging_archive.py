@@ -0,0 +1,280 @@
+"""
+Staging archive. Once a batch is old (mis_date more than STAGING_ARCHIVE_AFTER_DAYS ago) or
+its month is locked, its raw staging and invalid rows are only needed to preview or
+download the file as uploaded. archive_staging() moves them out of the hot tables into one
+compressed file per batch:
+
+    STAGING_ARCHIVE_DIR/<source>/<YYYYMM>/<source>_<batch_id>.jsonl.gz
+
+one JSON line per row ({"kind": "STAGING"|"INVALID", "row_number", "reason", "row_payload"}),
+staging rows first in file order. The staging_archive table indexes the files; the upload
+preview and download endpoints read a batch from its file once it has an entry there.
+Deleting or re-uploading a batch discards its archive.
+
+Each batch is written, indexed and removed from the tables in its own transaction, so an
+interrupted run leaves every batch either archived or untouched. Run via
+`manage.py archive-staging`.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import and_, or_
+
+from audit import log_audit
+from db import SessionLocal
+from db_partitions import add_months, month_key_of
+from models import (
+    FinacleInvalidRecord,
+    FinacleRawStaging,
+    FinacleUploadBatch,
+    MonthLock,
+    StagingArchive,
+    VendorInvalidRecord,
+    VendorRawStaging,
+    VendorUploadBatch,
+)
+from report_export import keyset_iter
+
+logger = logging.getLogger(__name__)
+
+STAGING_ARCHIVE_AFTER_DAYS = int(os.getenv("STAGING_ARCHIVE_AFTER_DAYS", "90"))
+STAGING_ARCHIVE_DIR = os.getenv("STAGING_ARCHIVE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "staging_archive"
+)
+
+# source -> (batch, staging, invalid record) models
+SOURCES = {
+    "FINACLE": (FinacleUploadBatch, FinacleRawStaging, FinacleInvalidRecord),
+    "VENDOR": (VendorUploadBatch, VendorRawStaging, VendorInvalidRecord),
+}
+
+
+def _relative_path(source: str, batch) -> str:
+    prefix = source.lower()
+    return f"{prefix}/{month_key_of(batch.mis_date)}/{prefix}_{batch.batch_id}.jsonl.gz"
+
+
+def _absolute(relative: str) -> str:
+    return os.path.join(STAGING_ARCHIVE_DIR, *relative.split("/"))
+
+
+def archive_path(entry) -> str:
+    return _absolute(entry.file_path)
+
+
+def archive_entry(db, source: str, batch_id: int):
+    return db.get(StagingArchive, (source, batch_id))
+
+
+def _read(value):
+    return value.read() if hasattr(value, "read") else value
+
+
+def _batch_rows(db, source: str, batch):
+    """(kind, row) of a batch's staging rows in file order, then its invalid rows."""
+    _, staging_model, invalid_model = SOURCES[source]
+    staging = (
+        db.query(staging_model)
+        .filter(staging_model.batch_id == batch.batch_id)
+        .filter(staging_model.mis_date == batch.mis_date)
+    )
+    for row in keyset_iter(staging, [staging_model.row_number, staging_model.raw_id]):
+        yield "STAGING", row
+    invalid = db.query(invalid_model).filter(invalid_model.batch_id == batch.batch_id)
+    for row in keyset_iter(invalid, [invalid_model.row_number, invalid_model.invalid_id]):
+        yield "INVALID", row
+
+
+def _write(db, source: str, batch, path: str) -> tuple[int, int, str]:
+    """Write the batch's rows to path; returns (staging rows, invalid rows, sha256)."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, work_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}-", dir=directory)
+    counts = {"STAGING": 0, "INVALID": 0}
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as handle:
+            for kind, row in _batch_rows(db, source, batch):
+                line = {
+                    "kind": kind,
+                    "row_number": int(row.row_number),
+                    "reason": getattr(row, "reason", None),
+                    "row_payload": _read(row.row_payload),
+                }
+                handle.write((json.dumps(line) + "\n").encode("utf-8"))
+                counts[kind] += 1
+        digest = hashlib.sha256()
+        with open(work_path, "rb") as written:
+            for chunk in iter(lambda: written.read(1 << 20), b""):
+                digest.update(chunk)
+        os.replace(work_path, path)
+    except BaseException:
+        os.remove(work_path)
+        raise
+    return counts["STAGING"], counts["INVALID"], digest.hexdigest()
+
+
+def archive_batch(db, source: str, batch, archived_by: str):
+    """
+    Move one batch's staging and invalid rows to its archive file and index it. The caller
+    commits; until then the rows are still in the tables and a rerun rewrites the file.
+    """
+    _, staging_model, invalid_model = SOURCES[source]
+    relative = _relative_path(source, batch)
+    staging_rows, invalid_rows, sha256 = _write(db, source, batch, _absolute(relative))
+    entry = StagingArchive(
+        source=source,
+        batch_id=batch.batch_id,
+        mis_date=batch.mis_date,
+        file_path=relative,
+        staging_rows=staging_rows,
+        invalid_rows=invalid_rows,
+        file_sha256=sha256,
+        archived_by=archived_by,
+    )
+    db.add(entry)
+    db.query(staging_model).filter(staging_model.batch_id == batch.batch_id).filter(
+        staging_model.mis_date == batch.mis_date
+    ).delete(synchronize_session=False)
+    db.query(invalid_model).filter(invalid_model.batch_id == batch.batch_id).delete(synchronize_session=False)
+    return entry
+
+
+def archived_rows(entry, kind: str = "STAGING"):
+    """
+    Rows of kind from an archived batch, in file order, as dicts with row_number, reason and
+    row_payload. Raises FileNotFoundError straight away if the file is missing.
+    """
+    handle = gzip.open(archive_path(entry), "rt", encoding="utf-8")
+
+    def rows():
+        with handle:
+            for line in handle:
+                row = json.loads(line)
+                if row["kind"] == kind:
+                    yield row
+                elif kind == "STAGING":
+                    # Staging rows are written first
+                    return
+
+    return rows()
+
+
+def discard(db, source: str, batch_id: int) -> str | None:
+    """
+    Drop a batch's archive entry (batch deleted or re-uploaded). Returns the file to remove
+    with remove_files() once the transaction commits, or None if it wasn't archived.
+    """
+    entry = archive_entry(db, source, batch_id)
+    if entry is None:
+        return None
+    path = archive_path(entry)
+    db.delete(entry)
+    return path
+
+
+def discard_entries(db, limit: int) -> list[str]:
+    """Drop up to limit archive entries of any batch; returns their files, as discard() does."""
+    entries = db.query(StagingArchive).limit(limit).all()
+    for entry in entries:
+        db.delete(entry)
+    return [archive_path(entry) for entry in entries]
+
+
+def remove_files(paths) -> None:
+    for path in paths:
+        if not path:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning("Could not remove staging archive %s: %s", path, exc)
+
+
+def eligible_batches(db, older_than_days: int, today: date | None = None) -> list[tuple[str, object]]:
+    """(source, batch) not yet archived whose mis_date is older than the age or in a locked month."""
+    cutoff = (today or date.today()) - timedelta(days=older_than_days)
+    locked = [row[0] for row in db.query(MonthLock.month_key).filter(MonthLock.status == "LOCKED")]
+    batches = []
+    for source, (batch_model, _, _) in SOURCES.items():
+        conditions = [batch_model.mis_date < cutoff]
+        for month_key in locked:
+            first = date(int(month_key[:4]), int(month_key[4:]), 1)
+            conditions.append(and_(batch_model.mis_date >= first, batch_model.mis_date < add_months(first, 1)))
+        query = (
+            db.query(batch_model)
+            .outerjoin(
+                StagingArchive,
+                and_(StagingArchive.source == source, StagingArchive.batch_id == batch_model.batch_id),
+            )
+            .filter(StagingArchive.batch_id.is_(None))
+            .filter(or_(*conditions))
+            .order_by(batch_model.mis_date, batch_model.batch_id)
+        )
+        batches.extend((source, batch) for batch in query)
+    return batches
+
+
+def archive_staging(
+    older_than_days: int = STAGING_ARCHIVE_AFTER_DAYS,
+    dry_run: bool = False,
+    run_by: str = "SYSTEM",
+) -> list[dict]:
+    """Archive every eligible batch, committing after each. dry_run only lists them."""
+    if older_than_days < 0:
+        raise ValueError("older_than_days must not be negative")
+    results = []
+    db = SessionLocal()
+    try:
+        for source, batch in eligible_batches(db, older_than_days):
+            entry = {"source": source, "batch_id": int(batch.batch_id), "mis_date": batch.mis_date.isoformat()}
+            if not dry_run:
+                try:
+                    record = archive_batch(db, source, batch, run_by)
+                    archived = {
+                        "file_path": record.file_path,
+                        "staging_rows": record.staging_rows,
+                        "invalid_rows": record.invalid_rows,
+                    }
+                    db.commit()
+                except Exception as exc:
+                    db.rollback()
+                    logger.exception("Archiving %s batch %s failed", source, entry["batch_id"])
+                    entry["error"] = str(exc)
+                else:
+                    entry.update(archived)
+                    logger.info(
+                        "Archived %s batch %s: %s staging, %s invalid rows",
+                        source,
+                        entry["batch_id"],
+                        archived["staging_rows"],
+                        archived["invalid_rows"],
+                    )
+            results.append(entry)
+        archived = [entry for entry in results if "file_path" in entry]
+        if archived:
+            log_audit(
+                db,
+                "STAGING_ARCHIVE",
+                None,
+                "ARCHIVE",
+                None,
+                {
+                    "older_than_days": older_than_days,
+                    "batches": [f"{entry['source']}:{entry['batch_id']}" for entry in archived],
+                    "staging_rows": sum(entry["staging_rows"] for entry in archived),
+                    "invalid_rows": sum(entry["invalid_rows"] for entry in archived),
+                },
+                run_by,
+            )
+            db.commit()
+    finally:
+        db.close()
+    return results
@@ -0,0 +1,310 @@
+"""
+Login token stores. auth.py keeps bearer tokens in one of these, chosen by
+AUTH_TOKEN_STORE:
+
+- memory (default): a dict in this process. Tokens are lost on restart and only valid on
+  the worker that issued them, so the API must run as a single process.
+- db: the auth_token table, shared by every worker and kept across restarts. Each process
+  reads through a small cache (TOKEN_CACHE_TTL seconds), so a revoked token can stay
+  usable on other workers for at most that long.
+
+A token expires after TOKEN_IDLE_TIMEOUT seconds without use or TOKEN_MAX_AGE seconds
+after login, whichever comes first (0 disables either). Expired tokens are dropped when
+looked up and by a sweeper thread every TOKEN_SWEEP_INTERVAL seconds; the memory store
+also evicts its least recently used token beyond TOKEN_STORE_MAX.
+
+Stores hold the user as a dict of AuthUser fields (employee_id, name, role).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_
+
+from db import SessionLocal
+from models import AuthToken
+
+logger = logging.getLogger(__name__)
+
+AUTH_TOKEN_STORE = os.getenv("AUTH_TOKEN_STORE", "memory").lower()
+TOKEN_CACHE_TTL_SEC = float(os.getenv("TOKEN_CACHE_TTL", "5"))
+TOKEN_IDLE_TIMEOUT_SEC = int(os.getenv("TOKEN_IDLE_TIMEOUT", "3600"))
+TOKEN_MAX_AGE_SEC = int(os.getenv("TOKEN_MAX_AGE", "43200"))
+TOKEN_STORE_MAX = int(os.getenv("TOKEN_STORE_MAX", "10000"))
+TOKEN_SWEEP_INTERVAL_SEC = int(os.getenv("TOKEN_SWEEP_INTERVAL", "300"))
+# The db store records use at most this often per token
+TOKEN_TOUCH_INTERVAL_SEC = 60
+
+
+def _expired(issued_at: float, last_seen: float, now: float) -> bool:
+    if TOKEN_MAX_AGE_SEC and now - issued_at > TOKEN_MAX_AGE_SEC:
+        return True
+    return bool(TOKEN_IDLE_TIMEOUT_SEC) and now - last_seen > TOKEN_IDLE_TIMEOUT_SEC
+
+
+class TokenStore(ABC):
+    backend = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"issued": 0, "revoked": 0, "expired": 0, "evicted": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    @abstractmethod
+    def get(self, token: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def put(self, token: str, user: dict):
+        ...
+
+    @abstractmethod
+    def delete(self, token: str):
+        ...
+
+    @abstractmethod
+    def delete_user(self, employee_id: str):
+        """Revoke every token of employee_id."""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Remove expired tokens; returns how many."""
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    def stats(self) -> dict:
+        """Store size and this process's counters since start."""
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "backend": self.backend,
+            "tokens": self.size(),
+            "idle_timeout_sec": TOKEN_IDLE_TIMEOUT_SEC,
+            "max_age_sec": TOKEN_MAX_AGE_SEC,
+            **counters,
+        }
+
+
+class MemoryTokenStore(TokenStore):
+    backend = "memory"
+
+    def __init__(self, max_tokens: int = TOKEN_STORE_MAX):
+        super().__init__()
+        self._max_tokens = max_tokens
+        # token -> [user, issued_at, last_seen], least recently used first
+        self._tokens: OrderedDict[str, list] = OrderedDict()
+
+    def get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._tokens.get(token)
+            if entry is None:
+                return None
+            if _expired(entry[1], entry[2], now):
+                del self._tokens[token]
+                self._counters["expired"] += 1
+                return None
+            entry[2] = now
+            self._tokens.move_to_end(token)
+            return entry[0]
+
+    def put(self, token, user):
+        now = time.time()
+        with self._lock:
+            self._tokens[token] = [dict(user), now, now]
+            self._counters["issued"] += 1
+            while len(self._tokens) > self._max_tokens:
+                self._tokens.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def delete(self, token):
+        with self._lock:
+            if self._tokens.pop(token, None) is not None:
+                self._counters["revoked"] += 1
+
+    def delete_user(self, employee_id):
+        with self._lock:
+            for token in [t for t, entry in self._tokens.items() if entry[0]["employee_id"] == employee_id]:
+                del self._tokens[token]
+                self._counters["revoked"] += 1
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [t for t, entry in self._tokens.items() if _expired(entry[1], entry[2], now)]
+            for token in expired:
+                del self._tokens[token]
+            self._counters["expired"] += len(expired)
+        return len(expired)
+
+    def size(self):
+        return len(self._tokens)
+
+
+def _token_key(token: str) -> str:
+    # Only a hash is stored, so the table doesn't hold usable bearer tokens
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class DbTokenStore(TokenStore):
+    backend = "db"
+
+    def __init__(self, cache_ttl: float = TOKEN_CACHE_TTL_SEC):
+        super().__init__()
+        self._cache_ttl = cache_ttl
+        # token hash -> (user, issued_at, last_seen, cached_until)
+        self._cache: dict[str, tuple] = {}
+
+    def get(self, token):
+        key = _token_key(token)
+        now = time.time()
+        cached = self._cache.get(key)
+        if cached and cached[3] > now and not _expired(cached[1], cached[2], now):
+            return cached[0]
+        db = SessionLocal()
+        try:
+            row = db.query(AuthToken).filter(AuthToken.token_hash == key).first()
+            user = None
+            if row is not None:
+                issued_at, last_seen = row.issued_at.timestamp(), row.last_seen_at.timestamp()
+                if _expired(issued_at, last_seen, now):
+                    db.delete(row)
+                    self._count("expired")
+                else:
+                    user = {"employee_id": row.employee_id, "name": row.full_name, "role": row.role_code}
+                    if now - last_seen > TOKEN_TOUCH_INTERVAL_SEC:
+                        row.last_seen_at = datetime.fromtimestamp(now)
+                        last_seen = now
+                db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            if user is None:
+                self._cache.pop(key, None)
+            else:
+                self._cache[key] = (user, issued_at, last_seen, now + self._cache_ttl)
+        return user
+
+    def put(self, token, user):
+        now = datetime.now()
+        db = SessionLocal()
+        try:
+            db.add(
+                AuthToken(
+                    token_hash=_token_key(token),
+                    employee_id=user["employee_id"],
+                    full_name=user["name"],
+                    role_code=user["role"],
+                    issued_at=now,
+                    last_seen_at=now,
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+        self._count("issued")
+
+    def delete(self, token):
+        key = _token_key(token)
+        db = SessionLocal()
+        try:
+            deleted = db.query(AuthToken).filter(AuthToken.token_hash == key).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self._cache.pop(key, None)
+        self._count("revoked", deleted)
+
+    def delete_user(self, employee_id):
+        db = SessionLocal()
+        try:
+            deleted = (
+                db.query(AuthToken).filter(AuthToken.employee_id == employee_id).delete(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            for key in [k for k, cached in self._cache.items() if cached[0]["employee_id"] == employee_id]:
+                del self._cache[key]
+        self._count("revoked", deleted)
+
+    def sweep(self):
+        now = datetime.now()
+        conditions = []
+        if TOKEN_MAX_AGE_SEC:
+            conditions.append(AuthToken.issued_at < now - timedelta(seconds=TOKEN_MAX_AGE_SEC))
+        if TOKEN_IDLE_TIMEOUT_SEC:
+            conditions.append(AuthToken.last_seen_at < now - timedelta(seconds=TOKEN_IDLE_TIMEOUT_SEC))
+        deleted = 0
+        if conditions:
+            db = SessionLocal()
+            try:
+                deleted = db.query(AuthToken).filter(or_(*conditions)).delete(synchronize_session=False)
+                db.commit()
+            finally:
+                db.close()
+        cutoff = time.time()
+        with self._lock:
+            for key in [k for k, cached in self._cache.items() if cached[3] <= cutoff]:
+                del self._cache[key]
+        self._count("expired", deleted)
+        return deleted
+
+    def size(self):
+        db = SessionLocal()
+        try:
+            return db.query(func.count(AuthToken.token_hash)).scalar()
+        finally:
+            db.close()
+
+
+class TokenSweeper:
+    """Daemon thread running store.sweep() every TOKEN_SWEEP_INTERVAL seconds."""
+
+    def __init__(self, store: TokenStore, interval: float = TOKEN_SWEEP_INTERVAL_SEC):
+        self._store = store
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None or self._interval <= 0:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="token-sweeper", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                removed = self._store.sweep()
+                if removed:
+                    logger.info("Swept %s expired login tokens", removed)
+            except Exception:
+                logger.exception("Token sweep failed")
+
+    def stop(self):
+        self._stop.set()
+
+
+def create_store(kind: str = AUTH_TOKEN_STORE) -> TokenStore:
+    if kind == "memory":
+        return MemoryTokenStore()
+    if kind == "db":
+        return DbTokenStore()
+    raise ValueError(f"AUTH_TOKEN_STORE must be memory or db, not {kind!r}")
@@ -3,6 +3,7 @@ const exceptionMessage = document.querySelector("#exception-message");
 const resolutionForm = document.querySelector("#exception-resolution-form");
 const resolutionMessage = document.querySelector("#exception-resolution-message");
 const exceptionRows = document.querySelector("#exception-rows");
+const exceptionMore = document.querySelector("#exception-more");
 const API_BASE = window.API_BASE || "";
 
 const currentUser = () =>
@@ -62,16 +63,23 @@ resolutionForm.addEventListener("submit", async (event) => {
   }
 });
 
-const loadExceptions = async () => {
-  const response = await fetch(`${API_BASE}/api/exceptions?status_filter=OPEN`, {
+let nextCursor = null;
+
+// One page per call; the API returns the next page's cursor in X-Next-Cursor
+const loadExceptions = async (cursor = null) => {
+  const params = new URLSearchParams({ status_filter: "OPEN" });
+  if (cursor) params.set("cursor", cursor);
+  const response = await fetch(`${API_BASE}/api/exceptions?${params}`, {
     headers: window.getAuthHeaders(),
   });
   if (!response.ok) {
-    exceptionRows.innerHTML = "";
+    if (!cursor) exceptionRows.innerHTML = "";
     return;
   }
+  nextCursor = response.headers.get("X-Next-Cursor");
+  exceptionMore.hidden = !nextCursor;
   const items = await response.json();
-  exceptionRows.innerHTML = items
+  const html = items
     .map(
       (item) =>
         `<tr>
@@ -82,6 +90,15 @@ const loadExceptions = async () => {
         </tr>`,
     )
     .join("");
+  if (cursor) {
+    exceptionRows.insertAdjacentHTML("beforeend", html);
+  } else {
+    exceptionRows.innerHTML = html;
+  }
 };
 
+exceptionMore.addEventListener("click", () => {
+  if (nextCursor) loadExceptions(nextCursor);
+});
+
 loadExceptions();
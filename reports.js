@@ -210,7 +210,7 @@ const previewVendorReport = async () => {
     const response = await fetch(
       `${apiBase}/api/reports/vendor-pickups/preview?vendor_id=${encodeURIComponent(
         vendorId,
-      )}&from_date=${encodeURIComponent(fromDate)}&to_date=${encodeURIComponent(toDate)}`,
+      )}&from_date=${encodeURIComponent(fromDate)}&to_date=${encodeURIComponent(toDate)}&warm=true`,
       { headers: window.getAuthHeaders() },
     );
     if (!response.ok) {
@@ -277,7 +277,7 @@ const previewCustomerReport = async () => {
     const response = await fetch(
       `${apiBase}/api/reports/customer-pickups/preview?customer_id=${encodeURIComponent(
         customerId,
-      )}&from_date=${encodeURIComponent(fromDate)}&to_date=${encodeURIComponent(toDate)}`,
+      )}&from_date=${encodeURIComponent(fromDate)}&to_date=${encodeURIComponent(toDate)}&warm=true`,
       { headers: window.getAuthHeaders() },
     );
     if (!response.ok) {
@@ -306,7 +306,7 @@ const previewReconReport = async () => {
     const response = await fetch(
       `${apiBase}/api/reports/reconciliation-final/preview?from_date=${encodeURIComponent(
         fromDate,
-      )}&to_date=${encodeURIComponent(toDate)}`,
+      )}&to_date=${encodeURIComponent(toDate)}&warm=true`,
       { headers: window.getAuthHeaders() },
     );
     if (!response.ok) {